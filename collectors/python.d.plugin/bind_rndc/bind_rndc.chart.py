@@ -4,12 +4,19 @@
 # SPDX-License-Identifier: GPL-3.0-or-later
 
 import os
+import xml.etree.ElementTree as ET
 
 from collections import defaultdict
-from subprocess import Popen
+
+try:
+    from urllib.parse import urlparse
+except ImportError:
+    from urlparse import urlparse
 
 from bases.collection import find_binary
-from bases.FrameworkServices.SimpleService import SimpleService
+from bases.extractor import MetricExtractor
+from bases.forkserver import execute
+from bases.FrameworkServices.UrlService import UrlService
 
 
 update_every = 30
@@ -88,14 +95,53 @@ NMS = {
 
 STATS = ['Name Server Statistics', 'Incoming Queries', 'Outgoing Queries']
 
+# charted only with the named.stats file
+FILE_CHARTS = ['named_stats_size']
+
+# statistics channel counter names: named.stats descriptions
+NSSTATS = {
+    'Requestv4': 'IPv4 requests received',
+    'Requestv6': 'IPv6 requests received',
+    'ReqEdns0': 'requests with EDNS(0) received',
+    'ReqBadEDNSVer': 'requests with unsupported EDNS version received',
+    'ReqTCP': 'TCP requests received',
+    'AuthQryRej': 'auth queries rejected',
+    'RecQryRej': 'recursive queries rejected',
+    'Response': 'responses sent',
+    'TruncatedResp': 'truncated responses sent',
+    'RespEDNS0': 'responses with EDNS(0) sent',
+    'QrySuccess': 'queries resulted in successful answer',
+    'QryAuthAns': 'queries resulted in authoritative answer',
+    'QryNoauthAns': 'queries resulted in non authoritative answer',
+    'QryNxrrset': 'queries resulted in nxrrset',
+    'QrySERVFAIL': 'queries resulted in SERVFAIL',
+    'QryNXDOMAIN': 'queries resulted in NXDOMAIN',
+    'QryRecursion': 'queries caused recursion',
+    'QryDuplicate': 'duplicate queries received',
+    'QryDropped': 'queries dropped',
+    'QryFailure': 'other query failures',
+}
+
+# only these subtrees of the statistics channel JSON document are decoded
+JSON_EXTRACTOR = MetricExtractor(['nsstats', 'qtypes', 'views.*.resolver.qtypes'])
+
+# statistics channel XML (v3) counters: (parent element, counters type): named.stats section
+XML_COUNTERS = {
+    ('server', 'nsstat'): 'Name Server Statistics',
+    ('server', 'qtype'): 'Incoming Queries',
+    ('view', 'resqtype'): 'Outgoing Queries',
+}
+
+RNDC_TIMEOUT = 10
+
 
-class Service(SimpleService):
+class Service(UrlService):
     def __init__(self, configuration=None, name=None):
-        SimpleService.__init__(self, configuration=configuration, name=name)
+        UrlService.__init__(self, configuration=configuration, name=name)
         self.order = ORDER
         self.definitions = CHARTS
         self.named_stats_path = self.configuration.get('named_stats_path', '/var/log/bind/named.stats')
-        self.rndc = find_binary('rndc')
+        self.rndc = None
         self.data = dict(
             nms_requests=0,
             nms_responses=0,
@@ -112,6 +158,12 @@ class Service(SimpleService):
         )
 
     def check(self):
+        if self.url:
+            # statistics channel, no 'rndc stats' and no named.stats file
+            self.order = [chart for chart in ORDER if chart not in FILE_CHARTS]
+            return UrlService.check(self)
+
+        self.rndc = find_binary('rndc')
         if not self.rndc:
             self.error('Can\'t locate "rndc" binary or binary is not executable by netdata')
             return False
@@ -120,54 +172,67 @@ class Service(SimpleService):
             self.error('Cannot access file %s' % self.named_stats_path)
             return False
 
-        run_rndc = Popen([self.rndc, 'stats'], shell=False)
-        run_rndc.wait()
+        try:
+            run_rndc = execute([self.rndc, 'stats'], timeout=RNDC_TIMEOUT)
+        except OSError as error:
+            self.error('"{0} stats" failed : {1}'.format(self.rndc, error))
+            return False
 
-        if not run_rndc.returncode:
+        if run_rndc.returncode == 0:
             return True
         self.error('Not enough permissions to run "%s stats"' % self.rndc)
         return False
 
-    def _get_raw_data(self):
+    def _get_named_stats(self):
         """
-        Run 'rndc stats' and read last dump from named.stats
+        Run 'rndc stats' and parse the last dump from named.stats
         :return: dict
         """
-        result = dict()
         try:
             current_size = os.path.getsize(self.named_stats_path)
-            run_rndc = Popen([self.rndc, 'stats'], shell=False)
-            run_rndc.wait()
+            run_rndc = execute([self.rndc, 'stats'], timeout=RNDC_TIMEOUT)
 
-            if run_rndc.returncode:
+            if run_rndc.returncode != 0:
                 return None
             with open(self.named_stats_path) as named_stats:
                 named_stats.seek(current_size)
-                result['stats'] = named_stats.readlines()
-                result['size'] = current_size
-                return result
+                result = parse_stats(named_stats)
         except (OSError, IOError):
             return None
+        except ValueError as error:
+            self.error('Cannot parse {0} : {1}'.format(self.named_stats_path, error))
+            return None
+        result['size'] = current_size
+        return result
+
+    def _get_channel_stats(self):
+        """
+        Get the statistics channel document, JSON or XML depending on the url
+        :return: dict
+        """
+        if urlparse(self.url).path.startswith('/json'):
+            document = self._get_json(extractor=JSON_EXTRACTOR)
+            return parse_json_stats(document) if document is not None else None
+        return self._get_stream(parse=parse_xml_stats)
 
     def _get_data(self):
         """
-        Parse data from _get_raw_data()
+        Format the statistics of the named.stats dump or of the statistics channel
         :return: dict
         """
 
-        raw_data = self._get_raw_data()
+        parsed = self._get_channel_stats() if self.url else self._get_named_stats()
 
-        if raw_data is None:
+        if parsed is None:
             return None
-        parsed = dict()
-        for stat in STATS:
-            parsed[stat] = parse_stats(field=stat,
-                                       named_stats=raw_data['stats'])
 
         self.data.update(nms_mapper(data=parsed['Name Server Statistics']))
 
         for elem in zip(['Incoming Queries', 'Outgoing Queries'], ['incoming_queries', 'outgoing_queries']):
             parsed_key, chart_name = elem[0], elem[1]
+            # the statistics channel is queried on check too, before the charts are created
+            if not self.charts:
+                continue
             for dimension_id, value in queries_mapper(data=parsed[parsed_key],
                                                       add=chart_name[:9]).items():
 
@@ -178,19 +243,22 @@ class Service(SimpleService):
 
                 self.data[dimension_id] = value
 
-        self.data['stats_size'] = raw_data['size']
+        if 'size' in parsed:
+            self.data['stats_size'] = parsed['size']
         return self.data
 
 
-def parse_stats(field, named_stats):
+def parse_stats(named_stats, sections=STATS):
     """
-    :param field: str:
-    :param named_stats: list:
+    :param named_stats: iterable of lines
+    :param sections: list: names of the sections to parse
     :return: dict
 
+    All the sections are parsed in one pass over the lines, the sections not asked for are skipped.
+    The rest of the dump (per zone statistics, etc.) is not read once all the sections are parsed.
+
     Example:
-    filed: 'Incoming Queries'
-    names_stats (list of lines):
+    named_stats (lines):
     ++ Incoming Requests ++
              1405660 QUERY
                    3 NOTIFY
@@ -205,34 +273,114 @@ def parse_stats(field, named_stats):
               145974 AAAA
                  371 SRV
     ++ Outgoing Queries ++
+    [View: default]
+               91541 A
     ...
 
     result:
-    {'A', 1214961, 'NS': 75, 'CNAME': 2, 'SOA': 2897, ...}
+    {'Incoming Queries': {'A', 1214961, 'NS': 75, 'CNAME': 2, 'SOA': 2897, ...},
+     'Outgoing Queries': {'A': 91541, ...},
+     ...}
     """
-    data = dict()
-    ns = iter(named_stats)
-    for line in ns:
-        if field not in line:
-            continue
-        while True:
-            try:
-                line = next(ns)
-            except StopIteration:
+    data = dict((section, dict()) for section in sections)
+    remaining = set(sections)
+    counters = None
+    for line in named_stats:
+        if line.startswith('++'):
+            if not remaining:
                 break
-            if '++' not in line:
-                if '[' in line:
-                    continue
-                v, k = line.strip().split(' ', 1)
-                if k not in data:
-                    data[k] = 0
-                data[k] += int(v)
-                continue
-            break
-        break
+            # '++ Incoming Queries ++'
+            section = line.strip('+ \n')
+            counters = data[section] if section in remaining else None
+            remaining.discard(section)
+            continue
+        if counters is None:
+            continue
+        try:
+            v, k = line.strip().split(' ', 1)
+            counters[k] = counters.get(k, 0) + int(v)
+        except ValueError:
+            # views ('[View: default]') are summed, the dump end ('--- Statistics Dump --- (1543592404)')
+            continue
     return data
 
 
+def parse_json_stats(document, sections=STATS):
+    """
+    :param document: dict: statistics channel JSON document ('/json/v1/server')
+    :param sections: list
+    :return: dict: same as parse_stats
+    """
+    data = dict((section, dict()) for section in sections)
+    nss, incoming, outgoing = data['Name Server Statistics'], data['Incoming Queries'], data['Outgoing Queries']
+    for k, v in (document.get('nsstats') or dict()).items():
+        nss[NSSTATS.get(k, k)] = v
+    incoming.update(document.get('qtypes') or dict())
+    for view in (document.get('views') or dict()).values():
+        for k, v in (view.get('resolver', dict()).get('qtypes') or dict()).items():
+            outgoing[k] = outgoing.get(k, 0) + v
+    return data
+
+
+def parse_xml_stats(chunks):
+    """
+    :param chunks: iterable of bytes: statistics channel XML document ('/xml/v3/server')
+    :return: dict: same as parse_stats
+    """
+    target = XMLStatsTarget()
+    parser = ET.XMLParser(target=target)
+    for chunk in chunks:
+        parser.feed(chunk)
+    return parser.close()
+
+
+class XMLStatsTarget:
+    """
+    Parser target collecting the counters while the document is parsed, no element tree is built.
+
+    <statistics version="3.11">
+      <server>
+        <counters type="qtype">
+          <counter name="A">1214961</counter>
+          ...
+      <views>
+        <view name="_default">
+          <counters type="resqtype">
+          ...
+    """
+    def __init__(self, sections=STATS):
+        self.stats = dict((section, dict()) for section in sections)
+        self.path = list()
+        self.counters = None
+        self.counter = None
+        self.text = list()
+
+    def start(self, tag, attrib):
+        if tag == 'counter' and self.counters is not None:
+            self.counter = attrib.get('name')
+            self.text = list()
+        elif tag == 'counters' and self.path:
+            section = XML_COUNTERS.get((self.path[-1], attrib.get('type')))
+            self.counters = self.stats.get(section)
+        self.path.append(tag)
+
+    def end(self, tag):
+        self.path.pop()
+        if tag == 'counter' and self.counter is not None:
+            k = NSSTATS.get(self.counter, self.counter)
+            self.counters[k] = self.counters.get(k, 0) + int(''.join(self.text))
+            self.counter = None
+        elif tag == 'counters':
+            self.counters = None
+
+    def data(self, data):
+        if self.counter is not None:
+            self.text.append(data)
+
+    def close(self):
+        return self.stats
+
+
 def nms_mapper(data):
     """
     :param data: dict
@@ -6,15 +6,10 @@
 
 from collections import namedtuple, defaultdict
 from json import loads
-from threading import Thread
 from socket import gethostbyname, gaierror
 
-try:
-    from queue import Queue
-except ImportError:
-    from Queue import Queue
-
 from bases.FrameworkServices.UrlService import UrlService
+from bases.extractor import MetricExtractor
 
 
 update_every = 1
@@ -89,6 +84,10 @@ DB_STATS = [
     'sizes.active'
 ]
 
+OVERVIEW_EXTRACTOR = MetricExtractor(OVERVIEW_STATS)
+SYSTEM_EXTRACTOR = MetricExtractor(SYSTEM_STATS)
+DB_EXTRACTOR = MetricExtractor(DB_STATS)
+
 ORDER = [
     'activity',
     'request_methods',
@@ -264,16 +263,16 @@ class Service(UrlService):
         system = self.url + '/_node/{node}/_system'.format(node=self.node)
         self.methods = [METHODS(get_data=self._get_overview_stats,
                                 url=stats,
-                                stats=OVERVIEW_STATS),
+                                stats=OVERVIEW_EXTRACTOR),
                         METHODS(get_data=self._get_active_tasks_stats,
                                 url=active_tasks,
                                 stats=None),
                         METHODS(get_data=self._get_overview_stats,
                                 url=system,
-                                stats=SYSTEM_STATS),
+                                stats=SYSTEM_EXTRACTOR),
                         METHODS(get_data=self._get_dbs_stats,
                                 url=self.url,
-                                stats=DB_STATS)]
+                                stats=DB_EXTRACTOR)]
         # must initialise manager before using _get_raw_data
         self._manager = self._build_manager()
         self.dbs = [db for db in self.dbs
@@ -297,34 +296,26 @@ class Service(UrlService):
         return UrlService.check(self)
 
     def _get_data(self):
-        threads = list()
-        queue = Queue()
+        calls = [(method.get_data, (method.url, method.stats)) for method in self.methods]
         result = dict()
 
-        for method in self.methods:
-            th = Thread(target=method.get_data,
-                        args=(queue, method.url, method.stats))
-            th.start()
-            threads.append(th)
-
-        for thread in threads:
-            thread.join()
-            result.update(queue.get())
+        for data in self.run_concurrently(calls):
+            result.update(data or dict())
 
         # self.info('couchdb result = ' + str(result))
         return result or None
 
-    def _get_overview_stats(self, queue, url, stats):
+    def _get_overview_stats(self, url, stats):
         raw_data = self._get_raw_data(url)
         if not raw_data:
-            return queue.put(dict())
+            return dict()
         data = loads(raw_data)
-        to_netdata = self._fetch_data(raw_data=data, metrics=stats)
+        to_netdata = self._fetch_data(raw_data=data, extractor=stats)
         if 'message_queues' in data:
             to_netdata['peak_msg_queue'] = get_peak_msg_queue(data)
-        return queue.put(to_netdata)
+        return to_netdata
 
-    def _get_active_tasks_stats(self, queue, url, _):
+    def _get_active_tasks_stats(self, url, _):
         taskdict = defaultdict(int)
         taskdict["activetasks_indexer"] = 0
         taskdict["activetasks_database_compaction"] = 0
@@ -332,44 +323,28 @@ class Service(UrlService):
         taskdict["activetasks_view_compaction"] = 0
         raw_data = self._get_raw_data(url)
         if not raw_data:
-            return queue.put(dict())
+            return dict()
         data = loads(raw_data)
         for task in data:
             taskdict["activetasks_" + task["type"]] += 1
-        return queue.put(dict(taskdict))
+        return dict(taskdict)
 
-    def _get_dbs_stats(self, queue, url, stats):
+    def _get_dbs_stats(self, url, stats):
         to_netdata = {}
         for db in self.dbs:
             raw_data = self._get_raw_data(url + '/' + db)
             if not raw_data:
                 continue
             data = loads(raw_data)
-            for metric in stats:
-                value = data
-                metrics_list = metric.split('.')
-                try:
-                    for m in metrics_list:
-                        value = value[m]
-                except (KeyError, TypeError) as e:
-                    self.debug('cannot process ' + metric + ' for ' + db
-                               + ": " + str(e))
-                    continue
-                metric_name = 'db_{0}_{1}'.format(db, '_'.join(metrics_list))
-                to_netdata[metric_name] = value
-        return queue.put(to_netdata)
+            for key, value in stats.extract(data).items():
+                to_netdata['db_{0}_{1}'.format(db, key)] = value
+        return to_netdata
 
-    def _fetch_data(self, raw_data, metrics):
+    @staticmethod
+    def _fetch_data(raw_data, extractor):
         data = dict()
-        for metric in metrics:
-            value = raw_data
-            metrics_list = metric.split('.')
-            try:
-                for m in metrics_list:
-                    value = value[m]
-            except (KeyError, TypeError) as e:
-                self.debug('cannot process ' + metric + ': ' + str(e))
-                continue
+        for path, value in extractor.items(raw_data):
+            metrics_list = list(path)
             # strip off .value from end of stat
             if metrics_list[-1] == 'value':
                 metrics_list = metrics_list[:-1]
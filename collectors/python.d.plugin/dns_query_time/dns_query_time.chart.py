@@ -5,7 +5,6 @@
 
 from random import choice
 from socket import getaddrinfo, gaierror
-from threading import Thread
 
 try:
     import dns.message
@@ -15,15 +14,11 @@ try:
 except ImportError:
     DNS_PYTHON = False
 
-try:
-    from queue import Queue
-except ImportError:
-    from Queue import Queue
-
 from bases.FrameworkServices.SimpleService import SimpleService
 
 
 update_every = 5
+concurrency = 8
 
 
 class Service(SimpleService):
@@ -71,39 +66,27 @@ class Service(SimpleService):
         return True
 
     def _get_data(self, timeout=None):
-        return dns_request(self.server_list, timeout or self.timeout, self.domains)
-
-
-def dns_request(server_list, timeout, domains):
-    threads = list()
-    que = Queue()
-    result = dict()
-
-    def dns_req(ns, t, q):
-        domain = dns.name.from_text(choice(domains))
-        request = dns.message.make_query(domain, dns.rdatatype.A)
-
-        try:
-            resp = dns.query.udp(request, ns, timeout=t)
-            if (resp.rcode() == dns.rcode.NOERROR and resp.answer):
-                query_time = resp.time * 1000
-            else:
-                query_time = -100
-        except dns.exception.Timeout:
-            query_time = -100
-        finally:
-            q.put({'_'.join(['ns', ns.replace('.', '_')]): query_time})
-
-    for server in server_list:
-        th = Thread(target=dns_req, args=(server, timeout, que))
-        th.start()
-        threads.append(th)
-
-    for th in threads:
-        th.join()
-        result.update(que.get())
-
-    return result
+        timeout = timeout or self.timeout
+        calls = [(dns_request, (server, timeout, self.domains)) for server in self.server_list]
+        result = dict()
+
+        for server, query_time in zip(self.server_list, self.run_concurrently(calls)):
+            result['_'.join(['ns', server.replace('.', '_')])] = -100 if query_time is None else query_time
+
+        return result
+
+
+def dns_request(ns, timeout, domains):
+    domain = dns.name.from_text(choice(domains))
+    request = dns.message.make_query(domain, dns.rdatatype.A)
+
+    try:
+        resp = dns.query.udp(request, ns, timeout=timeout)
+        if resp.rcode() == dns.rcode.NOERROR and resp.answer:
+            return resp.time * 1000
+        return -100
+    except dns.exception.Timeout:
+        return -100
 
 
 def check_ns(ns):
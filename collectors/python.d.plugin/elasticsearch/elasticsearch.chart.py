@@ -3,18 +3,11 @@
 # Author: ilyam8
 # SPDX-License-Identifier: GPL-3.0-or-later
 
-import json
-import threading
-
 from collections import namedtuple
 from socket import gethostbyname, gaierror
 
-try:
-    from queue import Queue
-except ImportError:
-    from Queue import Queue
-
 from bases.FrameworkServices.UrlService import UrlService
+from bases.extractor import MetricExtractor
 
 # default module values (can be overridden per job in `config`)
 update_every = 5
@@ -109,6 +102,14 @@ HEALTH_STATS = [
     'active_shards_percent_as_number'
 ]
 
+NODE_EXTRACTOR = MetricExtractor(NODE_STATS)
+CLUSTER_EXTRACTOR = MetricExtractor(CLUSTER_STATS)
+HEALTH_EXTRACTOR = MetricExtractor(HEALTH_STATS)
+
+# parts of the responses the module needs, the rest is skipped when 'stream_json' is enabled
+NODES_DOCUMENT = MetricExtractor(['nodes.*.' + stat for stat in NODE_STATS])
+HEALTH_DOCUMENT = MetricExtractor(HEALTH_STATS + ['status'])
+
 LATENCY = {
     'query_latency': {
         'total': 'indices_search_query_total',
@@ -532,90 +533,62 @@ class Service(UrlService):
         return UrlService.check(self)
 
     def _get_data(self):
-        threads = list()
-        queue = Queue()
+        calls = [(method.get_data, (method.url,)) for method in self.methods if method.run]
         result = dict()
 
-        for method in self.methods:
-            if not method.run:
-                continue
-            th = threading.Thread(target=method.get_data,
-                                  args=(queue, method.url))
-            th.start()
-            threads.append(th)
-
-        for thread in threads:
-            thread.join()
-            result.update(queue.get())
+        for data in self.run_concurrently(calls):
+            result.update(data or dict())
 
         return result or None
 
-    def _get_cluster_health(self, queue, url):
+    def _get_cluster_health(self, url):
         """
         Format data received from http request
         :return: dict
         """
 
-        raw_data = self._get_raw_data(url)
-
-        if not raw_data:
-            return queue.put(dict())
-
-        data = self.json_reply(raw_data)
+        data = self._get_json(url, extractor=HEALTH_DOCUMENT)
 
         if not data:
-            return queue.put(dict())
+            return dict()
 
-        to_netdata = fetch_data_(raw_data=data,
-                                 metrics=HEALTH_STATS)
+        to_netdata = HEALTH_EXTRACTOR.extract(data)
 
         to_netdata.update({'status_green': 0, 'status_red': 0, 'status_yellow': 0,
                            'status_foo1': 0, 'status_foo2': 0, 'status_foo3': 0})
         current_status = 'status_' + data['status']
         to_netdata[current_status] = 1
 
-        return queue.put(to_netdata)
+        return to_netdata
 
-    def _get_cluster_stats(self, queue, url):
+    def _get_cluster_stats(self, url):
         """
         Format data received from http request
         :return: dict
         """
 
-        raw_data = self._get_raw_data(url)
-
-        if not raw_data:
-            return queue.put(dict())
-
-        data = self.json_reply(raw_data)
+        data = self._get_json(url, extractor=CLUSTER_EXTRACTOR)
 
         if not data:
-            return queue.put(dict())
+            return dict()
 
-        to_netdata = fetch_data_(raw_data=data,
-                                 metrics=CLUSTER_STATS)
+        to_netdata = CLUSTER_EXTRACTOR.extract(data)
 
-        return queue.put(to_netdata)
+        return to_netdata
 
-    def _get_node_stats(self, queue, url):
+    def _get_node_stats(self, url):
         """
         Format data received from http request
         :return: dict
         """
 
-        raw_data = self._get_raw_data(url)
-
-        if not raw_data:
-            return queue.put(dict())
-
-        data = self.json_reply(raw_data)
+        data = self._get_json(url, extractor=NODES_DOCUMENT)
 
         if not data:
-            return queue.put(dict())
+            return dict()
 
         node = list(data['nodes'].keys())[0]
-        to_netdata = fetch_data_(raw_data=data['nodes'][node],
-                                 metrics=NODE_STATS)
+        to_netdata = NODE_EXTRACTOR.extract(data['nodes'][node])
 
         # Search, index, flush, fetch performance latency
         for key in LATENCY:
@@ -629,14 +602,7 @@ class Service(UrlService):
             to_netdata['file_descriptors_used'] = round(float(to_netdata['process_open_file_descriptors'])
                                                         / to_netdata['process_max_file_descriptors'] * 1000)
 
-        return queue.put(to_netdata)
-
-    def json_reply(self, reply):
-        try:
-            return json.loads(reply)
-        except ValueError as err:
-            self.error(err)
-            return None
+        return to_netdata
 
     def find_avg(self, total, spent_time, key):
         if key not in self.latency:
@@ -651,17 +617,3 @@ class Service(UrlService):
             return latency
         self.latency[key]['spent_time'] = spent_time
         return 0
-
-
-def fetch_data_(raw_data, metrics):
-    data = dict()
-    for metric in metrics:
-        value = raw_data
-        metrics_list = metric.split('.')
-        try:
-            for m in metrics_list:
-                value = value[m]
-        except KeyError:
-            continue
-        data['_'.join(metrics_list)] = value
-    return data
@@ -3,21 +3,37 @@
 # Author: Pawel Krupa (paulfantom)
 # SPDX-License-Identifier: GPL-3.0-or-later
 
+import os
+
 from bases.FrameworkServices.ExecutableService import ExecutableService
+from bases.spool import SpoolScanner, is_readable_dir
 
 
 EXIM_COMMAND = 'exim -bpc'
+SPOOL_DIRECTORIES = ['/var/spool/exim4', '/var/spool/exim']
+# every message is a header (-H) and a data (-D) file, in the subdirectories with split_spool_directory
+HEADER_SUFFIX = '-H'
 
 ORDER = [
     'qemails',
+    'qsize',
 ]
 
+# collected only when the spool directory is scanned
+SPOOL_CHARTS = ['qsize']
+
 CHARTS = {
     'qemails': {
         'options': [None, 'Exim Queue Emails', 'emails', 'queue', 'exim.qemails', 'line'],
         'lines': [
             ['emails', None, 'absolute']
         ]
+    },
+    'qsize': {
+        'options': [None, 'Exim Queue Emails Size', 'KiB', 'queue', 'exim.qsize', 'area'],
+        'lines': [
+            ['size', None, 'absolute', 1, 1024]
+        ]
     }
 }
 
@@ -28,13 +44,44 @@ class Service(ExecutableService):
         self.order = ORDER
         self.definitions = CHARTS
         self.command = EXIM_COMMAND
+        self.spool_directory = self.configuration.get('spool_directory')
+        self.scan_queue = self.configuration.get('scan_queue', True)
+        self.scanner = None
+
+    def check(self):
+        if self.scan_queue:
+            directories = [self.spool_directory] if self.spool_directory else SPOOL_DIRECTORIES
+            for directory in directories:
+                path = os.path.join(directory, 'input')
+                if is_readable_dir(path):
+                    self.spool_directory = directory
+                    self.scanner = SpoolScanner(path, suffix=HEADER_SUFFIX)
+                    self.debug("scanning the spool directory '{0}'".format(path))
+                    return bool(self._get_data())
+            self.debug("can't read the spool directory in {0}, running '{1}'".format(directories, self.command))
+        self.order = [chart for chart in ORDER if chart not in SPOOL_CHARTS]
+        return ExecutableService.check(self)
 
     def _get_data(self):
         """
         Format data received from shell command
         :return: dict
         """
+        if self.scanner:
+            return self._get_spool_data()
         try:
             return {'emails': int(self._get_raw_data()[0])}
         except (ValueError, AttributeError):
             return None
+
+    def _get_spool_data(self):
+        """
+        Count the emails in the spool directory
+        :return: dict
+        """
+        try:
+            emails, size = self.scanner.scan()
+        except OSError as error:
+            self.error("can't scan the spool directory '{0}' : {1}".format(self.scanner.path, error))
+            return None
+        return {'emails': emails, 'size': size}
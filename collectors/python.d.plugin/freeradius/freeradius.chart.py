@@ -4,9 +4,9 @@
 # SPDX-License-Identifier: GPL-3.0-or-later
 
 import re
-from subprocess import Popen, PIPE
 
 from bases.collection import find_binary
+from bases.forkserver import execute
 from bases.FrameworkServices.SimpleService import SimpleService
 
 update_every = 15
@@ -107,9 +107,7 @@ class Service(SimpleService):
         self.do_acct = self.configuration.get('acct', DEFAULT_DO_ACCT)
         self.do_proxy_auth = self.configuration.get('proxy_auth', DEFAULT_DO_PROXY_AUTH)
         self.do_proxy_acct = self.configuration.get('proxy_acct', DEFAULT_DO_PROXY_ACCT)
-        self.echo = find_binary('echo')
         self.radclient = find_binary('radclient')
-        self.sub_echo = [self.echo, RADIUS_MSG]
         self.sub_radclient = radclient_status(
             self.radclient, RADCLIENT_RETRIES, RADCLIENT_TIMEOUT, self.host, self.port, self.secret,
         )
@@ -119,10 +117,6 @@ class Service(SimpleService):
             self.error("Can't locate 'radclient' binary or binary is not executable by netdata user")
             return False
 
-        if not self.echo:
-            self.error("Can't locate 'echo' binary or binary is not executable by netdata user")
-            return None
-
         if not self.secret:
             self.error("'secret' isn't set")
             return None
@@ -164,14 +158,15 @@ class Service(SimpleService):
         :return: str
         """
         try:
-            process_echo = Popen(self.sub_echo, stdout=PIPE, stderr=PIPE, shell=False)
-            process_rad = Popen(self.sub_radclient, stdin=process_echo.stdout, stdout=PIPE, stderr=PIPE, shell=False)
-            process_echo.stdout.close()
-            raw_result = process_rad.communicate()[0]
+            process_rad = execute(
+                self.sub_radclient,
+                input_data=(RADIUS_MSG + '\n').encode(),
+                timeout=RADCLIENT_TIMEOUT * (RADCLIENT_RETRIES + 1) + 1,
+            )
         except OSError:
             return None
 
-        if process_rad.returncode is 0:
-            return raw_result.decode()
+        if process_rad.returncode == 0:
+            return process_rad.stdout.decode()
 
         return None
@@ -9,6 +9,7 @@ import json
 from collections import namedtuple
 
 from bases.FrameworkServices.UrlService import UrlService
+from bases.extractor import MetricExtractor
 
 
 MEMSTATS_ORDER = [
@@ -84,17 +85,6 @@ EXPVAR = namedtuple(
 )
 
 
-def flatten(d, top='', sep='.'):
-    items = []
-    for key, val in d.items():
-        nkey = top + sep + key if top else key
-        if isinstance(val, dict):
-            items.extend(flatten(val, nkey, sep=sep).items())
-        else:
-            items.append((nkey, val))
-    return dict(items)
-
-
 class Service(UrlService):
     def __init__(self, configuration=None, name=None):
         UrlService.__init__(self, configuration=configuration, name=name)
@@ -185,6 +175,8 @@ class Service(UrlService):
             self.order.append(chart_id)
             self.definitions[chart_id] = chart_dict
 
+        self.extractor = MetricExtractor([ev.key for ev in self.expvars], key_sep='.')
+
     def _get_data(self):
         """
         Format data received from http request
@@ -202,15 +194,16 @@ class Service(UrlService):
             expvars.update(self._parse_memstats(data))
 
         if self.configuration.get('extra_charts'):
-            # the memstats part of the data has been already parsed, so we remove it before flattening and checking
-            #   the rest of the data, thus avoiding needless iterating over the multiply nested memstats dict.
-            del (data['memstats'])
-            flattened = flatten(data)
+            values = self.extractor.extract(data)
 
             for ev in self.expvars:
-                v = flattened.get(ev.key)
+                # expvar names may contain dots (Ex. expvar.NewInt("server.requests")), a top level name is
+                # looked up as it is, the extractor finds the nested paths
+                v = data.get(ev.key)
+                if v is None or isinstance(v, (dict, list)):
+                    v = values.get(ev.key)
 
-                if v is None:
+                if v is None or isinstance(v, (dict, list)):
                     continue
 
                 try:
@@ -293,13 +293,14 @@ class Service(UrlService, SocketService):
         return match.groupdict() if match else dict()
 
     @staticmethod
-    def _check_raw_data(data):
+    def _check_received(data, start):
         """
-        Check if all data has been gathered from socket
-        :param data: str
+        The stat socket is closed after the response is sent, keep receiving until that happens
+        :param data: bytearray
+        :param start: int
         :return: boolean
         """
-        return not bool(data)
+        return False
 
     def create_charts(self):
         for front in self.data['frontend']:
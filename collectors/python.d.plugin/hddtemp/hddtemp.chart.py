@@ -97,5 +97,5 @@ class Service(SocketService):
         return True
 
     @staticmethod
-    def _check_raw_data(data):
-        return not bool(data)
+    def _check_received(data, start):
+        return False
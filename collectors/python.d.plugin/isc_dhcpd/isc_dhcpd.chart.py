@@ -3,6 +3,7 @@
 # Author: ilyam8
 # SPDX-License-Identifier: GPL-3.0-or-later
 
+import calendar
 import os
 import re
 import time
@@ -14,6 +15,7 @@ try:
 except ImportError:
     HAVE_IP_ADDRESS = False
 
+from bisect import bisect_left, bisect_right
 from collections import defaultdict
 from copy import deepcopy
 
@@ -47,11 +49,35 @@ CHARTS = {
 }
 
 
+# starts with a new line, the regex engine looks for the declarations only at the lines starts
+RE_LEASE = re.compile(
+    r'\n[ \t]*(?:'
+    r'(?:lease|iaaddr) ([^ \t\n]+) \{'
+    r'|ends ([^;\n]*);'
+    r'|binding state ([^;\n]*);'
+    r')'
+)
+
+NEVER = float('inf')
+
+
 class DhcpdLeasesFile:
+    """
+    dhcpd appends lease declarations to the leases file and periodically rewrites it (writes a new file and renames
+    it over the old one). Only the bytes appended since the last read are parsed, the whole file is parsed again
+    after a rewrite. The last declaration of an address wins.
+    """
     def __init__(self, path):
         self.path = path
         self.mod_time = 0
         self.size = 0
+        self.inode = None
+        self.position = 0
+        self.address = None
+        # address: [<float> ends, <str> binding state]
+        self.leases = dict()
+        # 'year/month/day': unix time of the day start
+        self.days = dict()
 
     def is_valid(self):
         return os.path.isfile(self.path) and os.access(self.path, os.R_OK)
@@ -65,56 +91,105 @@ class DhcpdLeasesFile:
         return False
 
     def get_data(self):
+        """
+        :return: <dict> address: [<float> ends, <str> binding state], None if a value is missing or not supported
+        """
         try:
-            with open(self.path) as leases:
-                result = defaultdict(dict)
-                for row in leases:
-                    row = row.strip()
-                    if row.startswith('lease'):
-                        address = row[6:-2]
-                    elif row.startswith('iaaddr'):
-                        address = row[7:-2]
-                    elif row.startswith('ends'):
-                        result[address]['ends'] = row[5:-1]
-                    elif row.startswith('binding state'):
-                        result[address]['state'] = row[14:-1]
-                return dict((k, v) for k, v in result.items() if len(v) == 2)
+            with open(self.path, 'rb') as leases:
+                stat = os.fstat(leases.fileno())
+                if stat.st_ino != self.inode or stat.st_size < self.position:
+                    self.inode = stat.st_ino
+                    self.position = 0
+                    self.address = None
+                    self.leases = dict()
+                leases.seek(self.position)
+                data = leases.read()
         except (OSError, IOError):
             return None
 
+        # a partially written line is parsed on the next read
+        end = data.rfind(b'\n') + 1
+        self.position += end
+        self.parse(data[:end].decode('utf-8', 'replace'))
+        return self.leases
+
+    def parse(self, text):
+        leases = self.leases
+        address = self.address
+        for new_address, ends, state in RE_LEASE.findall('\n' + text):
+            if new_address:
+                address = new_address
+                continue
+            if address is None:
+                continue
+            lease = leases.get(address)
+            if lease is None:
+                lease = leases[address] = [None, None]
+            if state:
+                lease[1] = state
+            else:
+                lease[0] = self.parse_ends(ends)
+        self.address = address
+
+    def parse_ends(self, ends):
+        """
+        :param ends: <str> 'never', 'epoch <seconds>' or '<weekday> <year>/<month>/<day> <hour>:<minute>:<second>'
+        :return: <float> lease end time (unix time), None if the format is not supported
+        """
+        # max. int for lease-time causes lease to expire in year 2038.
+        # dhcpd puts 'never' in the ends section of active lease
+        if ends == 'never':
+            return NEVER
+        # lease_end_time might be epoch
+        if ends.startswith('epoch'):
+            try:
+                return float(ends.split()[1])
+            except (IndexError, ValueError):
+                return None
+        # Will work only with 'default' db-time-format (weekday year/month/day hour:minute:second), UTC
+        # TODO: update algorithm to parse correctly 'local' db-time-format
+        try:
+            _, date, clock = ends.split(' ')
+            # leases end in a few distinct days
+            midnight = self.days.get(date)
+            if midnight is None:
+                year, month, day = date.split('/')
+                midnight = self.days[date] = calendar.timegm((int(year), int(month), int(day), 0, 0, 0))
+            hour, minute, second = clock.split(':')
+            return float(midnight + int(hour) * 3600 + int(minute) * 60 + int(second))
+        except ValueError:
+            return None
+
 
 class Pool:
     def __init__(self, name, network):
         self.id = re.sub(r'[:/.-]+', '_', name)
         self.name = name
         self.network = ipaddress.ip_network(address=u'%s' % network)
+        self.version = self.network.version
+        self.first = int(self.network.network_address)
+        self.last = int(self.network.broadcast_address)
 
     def num_hosts(self):
         return self.network.num_addresses - 2
 
-    def __contains__(self, item):
-        return item.address in self.network
+    def count(self, addresses):
+        """
+        :param addresses: <list> sorted integer addresses of the pool ip version
+        :return: <int> number of the addresses in the pool
+        """
+        return bisect_right(addresses, self.last) - bisect_left(addresses, self.first)
 
 
-class Lease:
-    def __init__(self, address, ends, state):
-        self.address = ipaddress.ip_address(address=u'%s' % address)
-        self.ends = ends
-        self.state = state
-
-    def is_active(self, current_time):
-        # lease_end_time might be epoch
-        if self.ends.startswith('epoch'):
-            epoch = int(self.ends.split()[1].replace(';', ''))
-            return epoch - current_time > 0
-        # max. int for lease-time causes lease to expire in year 2038.
-        # dhcpd puts 'never' in the ends section of active lease
-        elif self.ends == 'never':
-            return True
-        return time.mktime(time.strptime(self.ends, '%w %Y/%m/%d %H:%M:%S')) - current_time > 0
-
-    def is_valid(self):
-        return self.state == 'active'
+def lease_address(address):
+    """
+    :return: (<int> ip version, <int> address), None if address is not valid
+    """
+    try:
+        address = ipaddress.ip_address(address=u'%s' % address)
+    except ValueError:
+        return None
+    return address.version, int(address)
 
 
 class Service(SimpleService):
@@ -125,11 +200,10 @@ class Service(SimpleService):
         lease_path = self.configuration.get('leases_path', '/var/lib/dhcp/dhcpd.leases')
         self.dhcpd_leases = DhcpdLeasesFile(path=lease_path)
         self.pools = list()
+        # lease address: (ip version, integer address)
+        self.addresses = dict()
         self.data = dict()
 
-        # Will work only with 'default' db-time-format (weekday year/month/day hour:minute:second)
-        # TODO: update algorithm to parse correctly 'local' db-time-format
-
     def check(self):
         if not HAVE_IP_ADDRESS:
             self.error("'python-ipaddress' package is needed")
@@ -167,25 +241,30 @@ class Service(SimpleService):
             self.data = dict()
             return None
 
-        active_leases = list()
-        current_time = time.mktime(time.gmtime())
+        # sorted integer addresses of the active leases per ip version, a pool is a range in them
+        active_leases = defaultdict(list)
+        current_time = time.time()
 
-        for address in raw_leases:
-            try:
-                new_lease = Lease(address, **raw_leases[address])
-            except ValueError:
+        for address, (ends, state) in raw_leases.items():
+            if state != 'active' or ends is None or ends <= current_time:
                 continue
-            else:
-                if new_lease.is_active(current_time) and new_lease.is_valid():
-                    active_leases.append(new_lease)
+            try:
+                version_address = self.addresses[address]
+            except KeyError:
+                version_address = self.addresses[address] = lease_address(address)
+            if version_address is not None:
+                active_leases[version_address[0]].append(version_address[1])
+
+        for addresses in active_leases.values():
+            addresses.sort()
 
         for pool in self.pools:
-            count = len([ip for ip in active_leases if ip in pool])
+            count = pool.count(active_leases[pool.version])
             self.data[pool.id + '_active_leases'] = count
             self.data[pool.id + '_utilization'] = float(count) / pool.num_hosts() * 10000
 
         self.data['leases_size'] = self.dhcpd_leases.size
-        self.data['leases_total'] = len(active_leases)
+        self.data['leases_total'] = sum(len(v) for v in active_leases.values())
 
         return self.data
 
@@ -17,6 +17,7 @@ except ImportError:
     PYMONGO = False
 
 from bases.FrameworkServices.SimpleService import SimpleService
+from bases.refresh import QueryCache
 
 
 REPL_SET_STATES = [
@@ -140,6 +141,11 @@ DBSTATS = [
     'objects'
 ]
 
+# the slow changing commands are refreshed every number of seconds, not on every update
+REFRESH_EVERY = {
+    'dbStats': 60,
+}
+
 # charts order (can be overridden if you want less charts, or different order)
 ORDER = [
     'read_operations',
@@ -449,6 +455,7 @@ class Service(SimpleService):
         self.connection = None
         self.do_replica = None
         self.databases = list()
+        self.query_cache = QueryCache(self.update_every, REFRESH_EVERY, self.configuration.get('refresh_every'))
 
     def check(self):
         if not PYMONGO:
@@ -609,7 +616,13 @@ class Service(SimpleService):
         raw_data['dbStats'] = dict()
         try:
             for dbase in self.databases:
-                raw_data['dbStats'][dbase] = self.connection[dbase].command('dbStats')
+                # every database is refreshed on its own update
+                name = '_'.join(['dbStats', dbase])
+                db_stats = self.query_cache.get(name)
+                if db_stats is None:
+                    db_stats = self.connection[dbase].command('dbStats')
+                    self.query_cache.put(name, db_stats, group='dbStats')
+                raw_data['dbStats'][dbase] = db_stats
             return raw_data
         except PyMongoError:
             return None
@@ -13,6 +13,11 @@ QUERY_SLAVE = 'SHOW SLAVE STATUS;'
 QUERY_VARIABLES = 'SHOW GLOBAL VARIABLES LIKE \'max_connections\';'
 QUERY_USER_STATISTICS = 'SHOW USER_STATISTICS;'
 
+# the slow changing queries are refreshed every number of seconds, not on every update
+REFRESH_EVERY = {
+    'variables': 60,
+}
+
 GLOBAL_STATS = [
     'Bytes_received',
     'Bytes_sent',
@@ -674,6 +679,7 @@ class Service(MySQLService):
             variables=QUERY_VARIABLES,
             user_statistics=QUERY_USER_STATISTICS,
         )
+        self.refresh_every = dict(REFRESH_EVERY)
         self.repl_channels = [DEFAULT_REPL_CHANNEL]
 
     def _get_data(self):
@@ -7,7 +7,6 @@ import re
 
 from collections import defaultdict
 from copy import deepcopy
-from json import loads
 
 try:
     from collections import OrderedDict
@@ -15,6 +14,7 @@ except ImportError:
     from third_party.ordereddict import OrderedDict
 
 from bases.FrameworkServices.UrlService import UrlService
+from bases.extractor import MetricExtractor
 
 
 ORDER = [
@@ -312,6 +312,9 @@ METRICS = {
 
 BAD_SYMBOLS = re.compile(r'[:/.-]+')
 
+# parts of the status the module needs, the rest is skipped when 'stream_json' is enabled
+DOCUMENT = MetricExtractor(METRICS['SERVER'] + ['server_zones', 'upstreams', 'caches', 'slabs'])
+
 
 class Cache:
     key = 'caches'
@@ -434,13 +437,8 @@ class Service(UrlService):
         if not self._manager:
             return None
 
-        raw_data = self._get_raw_data()
-        if not raw_data:
-            return None
-
-        try:
-            response = loads(raw_data)
-        except ValueError:
+        response = self._get_json(extractor=DOCUMENT)
+        if not response:
             return None
 
         for obj_cls in [WebZone, WebUpstream, Cache]:
@@ -459,10 +457,9 @@ class Service(UrlService):
         Format data received from http request
         :return: dict
         """
-        raw_data = self._get_raw_data()
-        if not raw_data:
+        response = self._get_json(extractor=DOCUMENT)
+        if not response:
             return None
-        response = loads(raw_data)
 
         data = parse_json(response, METRICS['SERVER'])
         data['ssl_memory_usage'] = data['slabs_SSL_pages_used'] / float(data['slabs_SSL_pages_free']) * 1e4
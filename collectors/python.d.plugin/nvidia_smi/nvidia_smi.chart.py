@@ -3,12 +3,9 @@
 # Original Author: Steven Noonan (tycho)
 # Author: Ilya Mashchenko (ilyam8)
 
-import subprocess
-import threading
 import xml.etree.ElementTree as et
 
-from bases.collection import find_binary
-from bases.FrameworkServices.SimpleService import SimpleService
+from bases.FrameworkServices.ExecutableService import ExecutableService
 
 disabled_by_default = True
 
@@ -17,8 +14,6 @@ NVIDIA_SMI = 'nvidia-smi'
 
 BAD_VALUE = 'N/A'
 
-EMPTY_ROW = ''
-EMPTY_ROW_LIMIT = 500
 POLLER_BREAK_ROW = '</nvidia_smi_log>'
 
 PCI_BANDWIDTH = 'pci_bandwidth'
@@ -128,84 +123,6 @@ def gpu_charts(gpu):
     return order, charts
 
 
-class NvidiaSMI:
-    def __init__(self):
-        self.command = find_binary(NVIDIA_SMI)
-        self.active_proc = None
-
-    def run_once(self):
-        proc = subprocess.Popen([self.command, '-x', '-q'], stdout=subprocess.PIPE)
-        stdout, _ = proc.communicate()
-        return stdout
-
-    def run_loop(self, interval):
-        if self.active_proc:
-            self.kill()
-        proc = subprocess.Popen([self.command, '-x', '-q', '-l', str(interval)], stdout=subprocess.PIPE)
-        self.active_proc = proc
-        return proc.stdout
-
-    def kill(self):
-        if self.active_proc:
-            self.active_proc.kill()
-            self.active_proc = None
-
-
-class NvidiaSMIPoller(threading.Thread):
-    def __init__(self, poll_interval):
-        threading.Thread.__init__(self)
-        self.daemon = True
-
-        self.smi = NvidiaSMI()
-        self.interval = poll_interval
-
-        self.lock = threading.RLock()
-        self.last_data = str()
-        self.exit = False
-        self.empty_rows = 0
-        self.rows = list()
-
-    def has_smi(self):
-        return bool(self.smi.command)
-
-    def run_once(self):
-        return self.smi.run_once()
-
-    def run(self):
-        out = self.smi.run_loop(self.interval)
-
-        for row in out:
-            if self.exit or self.empty_rows > EMPTY_ROW_LIMIT:
-                break
-            self.process_row(row)
-        self.smi.kill()
-
-    def process_row(self, row):
-        row = row.decode()
-        self.empty_rows += (row == EMPTY_ROW)
-        self.rows.append(row)
-
-        if POLLER_BREAK_ROW in row:
-            self.lock.acquire()
-            self.last_data = '\n'.join(self.rows)
-            self.lock.release()
-
-            self.rows = list()
-            self.empty_rows = 0
-
-    def is_started(self):
-        return self.ident is not None
-
-    def shutdown(self):
-        self.exit = True
-
-    def data(self):
-        self.lock.acquire()
-        data = self.last_data
-        self.lock.release()
-        return data
-
-
 def handle_attr_error(method):
     def on_call(*args, **kwargs):
         try:
@@ -337,27 +254,24 @@ class GPU:
         )
 
 
-class Service(SimpleService):
+class Service(ExecutableService):
     def __init__(self, configuration=None, name=None):
         super(Service, self).__init__(configuration=configuration, name=name)
         self.order = list()
         self.definitions = dict()
         poll = int(configuration.get('poll_seconds', 1))
-        self.poller = NvidiaSMIPoller(poll)
+        self.command = '{0} -x -q'.format(NVIDIA_SMI)
+        # the tool runs in its loop mode, a record is one xml document
+        self.stream_command = '{0} -x -q -l {1}'.format(NVIDIA_SMI, poll)
+        self.stream_delimiter = POLLER_BREAK_ROW
+        self.stream_period = poll
 
     def get_data(self):
-        if not self.poller.is_started():
-            self.poller.start()
-
-        if not self.poller.is_alive():
-            self.debug('poller is off')
-            return None
-
-        last_data = self.poller.data()
-        if not last_data:
+        raw_data = self._get_raw_data()
+        if not raw_data:
             return None
 
-        parsed = self.parse_xml(last_data)
+        parsed = self.parse_xml(''.join(raw_data).strip())
         if parsed is None:
             return None
 
@@ -385,16 +299,15 @@ class Service(SimpleService):
                 chart.del_dimension(dim.id, hide=False)
 
     def check(self):
-        if not self.poller.has_smi():
-            self.error("couldn't find '{0}' binary".format(NVIDIA_SMI))
+        if not self.prepare_commands():
             return False
 
-        raw_data = self.poller.run_once()
+        raw_data = self._get_raw_data()
         if not raw_data:
             self.error("failed to invoke '{0}' binary".format(NVIDIA_SMI))
             return False
 
-        parsed = self.parse_xml(raw_data)
+        parsed = self.parse_xml(''.join(raw_data).strip())
         if parsed is None:
             return False
 
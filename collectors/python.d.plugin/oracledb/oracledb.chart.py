@@ -6,6 +6,7 @@
 from copy import deepcopy
 
 from bases.FrameworkServices.SimpleService import SimpleService
+from bases.refresh import QueryCache
 
 try:
     import cx_Oracle
@@ -277,6 +278,11 @@ SYS_METRICS = {
     'Global Cache Blocks Lost': 'global_cache_blocks_lost',
 }
 
+# the slow changing queries are refreshed every number of seconds, not on every update
+REFRESH_EVERY = {
+    'tablespace': 60,
+}
+
 
 class Service(SimpleService):
     def __init__(self, configuration=None, name=None):
@@ -290,6 +296,7 @@ class Service(SimpleService):
         self.alive = False
         self.conn = None
         self.active_tablespaces = set()
+        self.query_cache = QueryCache(self.update_every, REFRESH_EVERY, configuration.get('refresh_every'))
 
     def connect(self):
         if self.conn:
@@ -380,7 +387,7 @@ class Service(SimpleService):
 
         # TABLESPACE
         try:
-            rv = self.gather_tablespace_metrics()
+            rv = self.query_cache.fetch('tablespace', self.gather_tablespace_metrics)
         except cx_Oracle.Error as error:
             self.error(error)
             self.alive = False
@@ -3,15 +3,26 @@
 # Author: Pawel Krupa (paulfantom)
 # SPDX-License-Identifier: GPL-3.0-or-later
 
+import os
+
 from bases.FrameworkServices.ExecutableService import ExecutableService
+from bases.spool import SpoolScanner, is_readable_dir
 
 POSTQUEUE_COMMAND = 'postqueue -p'
+QUEUE_DIRECTORY = '/var/spool/postfix'
+# the queues listed by 'postqueue -p', maildrop is not readable by other users
+QUEUES = ['incoming', 'active', 'deferred', 'hold']
 
 ORDER = [
     'qemails',
     'qsize',
+    'queue_emails',
+    'queue_size',
 ]
 
+# collected only when the queue directories are scanned
+QUEUE_CHARTS = ['queue_emails', 'queue_size']
+
 CHARTS = {
     'qemails': {
         'options': [None, 'Postfix Queue Emails', 'emails', 'queue', 'postfix.qemails', 'line'],
@@ -24,7 +35,15 @@ CHARTS = {
         'lines': [
             ['size', None, 'absolute']
         ]
-    }
+    },
+    'queue_emails': {
+        'options': [None, 'Postfix Emails Per Queue', 'emails', 'queue', 'postfix.queue_emails', 'stacked'],
+        'lines': [['{0}_emails'.format(queue), queue, 'absolute'] for queue in QUEUES]
+    },
+    'queue_size': {
+        'options': [None, 'Postfix Emails Size Per Queue', 'KiB', 'queue', 'postfix.queue_size', 'stacked'],
+        'lines': [['{0}_size'.format(queue), queue, 'absolute', 1, 1024] for queue in QUEUES]
+    },
 }
 
 
@@ -34,12 +53,29 @@ class Service(ExecutableService):
         self.order = ORDER
         self.definitions = CHARTS
         self.command = POSTQUEUE_COMMAND
+        self.queue_directory = self.configuration.get('queue_directory', QUEUE_DIRECTORY)
+        self.scan_queue = self.configuration.get('scan_queue', True)
+        self.scanners = None
+
+    def check(self):
+        if self.scan_queue:
+            paths = [os.path.join(self.queue_directory, queue) for queue in QUEUES]
+            if all(is_readable_dir(path) for path in paths):
+                self.scanners = [(queue, SpoolScanner(path)) for queue, path in zip(QUEUES, paths)]
+                self.debug("scanning the queue directories in '{0}'".format(self.queue_directory))
+                return bool(self._get_data())
+            self.debug("can't read the queue directories in '{0}', running '{1}'".format(
+                self.queue_directory, self.command))
+        self.order = [chart for chart in ORDER if chart not in QUEUE_CHARTS]
+        return ExecutableService.check(self)
 
     def _get_data(self):
         """
         Format data received from shell command
         :return: dict
         """
+        if self.scanners:
+            return self._get_queues_data()
         try:
             raw = self._get_raw_data()[-1].split(' ')
             if raw[0] == 'Mail' and raw[1] == 'queue':
@@ -50,3 +86,22 @@ class Service(ExecutableService):
                     'size': raw[1]}
         except (ValueError, AttributeError):
             return None
+
+    def _get_queues_data(self):
+        """
+        Count the emails in the queue directories
+        :return: dict
+        """
+        data = dict(emails=0, size=0)
+        try:
+            for queue, scanner in self.scanners:
+                emails, size = scanner.scan()
+                data['{0}_emails'.format(queue)] = emails
+                data['{0}_size'.format(queue)] = size
+                data['emails'] += emails
+                data['size'] += size
+        except OSError as error:
+            self.error("can't scan the queue directories in '{0}' : {1}".format(self.queue_directory, error))
+            return None
+        data['size'] //= 1024
+        return data
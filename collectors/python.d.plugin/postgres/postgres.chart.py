@@ -15,6 +15,7 @@ except ImportError:
     PSYCOPG2 = False
 
 from bases.FrameworkServices.SimpleService import SimpleService
+from bases.refresh import QueryCache
 
 
 DEFAULT_PORT = 5432
@@ -44,6 +45,7 @@ QUERY_NAME_BACKENDS = 'BACKENDS'
 QUERY_NAME_TABLE_STATS = 'TABLE_STATS'
 QUERY_NAME_INDEX_STATS = 'INDEX_STATS'
 QUERY_NAME_DATABASE = 'DATABASE'
+QUERY_NAME_DATABASE_SIZE = 'DATABASE_SIZE'
 QUERY_NAME_BGWRITER = 'BGWRITER'
 QUERY_NAME_LOCKS = 'LOCKS'
 QUERY_NAME_DATABASES = 'DATABASES'
@@ -71,7 +73,9 @@ METRICS = {
         'tup_deleted',
         'conflicts',
         'temp_files',
-        'temp_bytes',
+        'temp_bytes'
+    ],
+    QUERY_NAME_DATABASE_SIZE: [
         'size'
     ],
     QUERY_NAME_BACKENDS: [
@@ -273,7 +277,6 @@ SELECT
     tup_updated AS tup_updated,
     tup_deleted AS tup_deleted,
     conflicts AS conflicts,
-    pg_database_size(datname) AS size,
     temp_files AS temp_files,
     temp_bytes AS temp_bytes
 FROM pg_stat_database
@@ -281,6 +284,16 @@ WHERE datname IN %(databases)s ;
 """,
 }
 
+QUERY_DATABASE_SIZE = {
+    DEFAULT: """
+SELECT
+    datname AS database_name,
+    pg_database_size(datname) AS size
+FROM pg_database
+WHERE datname IN %(databases)s ;
+""",
+}
+
 QUERY_BGWRITER = {
     DEFAULT: """
 SELECT
@@ -541,6 +554,8 @@ def query_factory(name, version=NO_VERSION):
         return QUERY_INDEX_STATS[DEFAULT]
     elif name == QUERY_NAME_DATABASE:
         return QUERY_DATABASE[DEFAULT]
+    elif name == QUERY_NAME_DATABASE_SIZE:
+        return QUERY_DATABASE_SIZE[DEFAULT]
     elif name == QUERY_NAME_BGWRITER:
         return QUERY_BGWRITER[DEFAULT]
     elif name == QUERY_NAME_LOCKS:
@@ -581,6 +596,13 @@ def query_factory(name, version=NO_VERSION):
     raise ValueError('unknown query')
 
 
+# the slow changing queries are refreshed every number of seconds, not on every update
+REFRESH_EVERY = {
+    QUERY_NAME_DATABASE_SIZE: 60,
+    QUERY_NAME_TABLE_STATS: 60,
+    QUERY_NAME_INDEX_STATS: 60,
+}
+
 ORDER = [
     'db_stat_temp_files',
     'db_stat_temp_bytes',
@@ -817,6 +839,7 @@ class Service(SimpleService):
         self.secondaries = list()
         self.replication_slots = list()
         self.queries = dict()
+        self.query_cache = QueryCache(self.update_every, REFRESH_EVERY, configuration.get('refresh_every'))
         self.data = dict()
 
     def reconnect(self):
@@ -909,8 +932,8 @@ class Service(SimpleService):
 
             self.data.update(zero_lock_types(self.databases))
 
-            for query, metrics in self.queries.items():
-                self.query_stats(cursor, query, metrics)
+            for name, (query, metrics) in self.queries.items():
+                self.query_stats(cursor, name, query, metrics)
 
         except OperationalError:
             self.alive = False
@@ -920,10 +943,14 @@ class Service(SimpleService):
 
         return self.data
 
-    def query_stats(self, cursor, query, metrics):
-        cursor.execute(query, dict(databases=tuple(self.databases)))
+    def query_stats(self, cursor, name, query, metrics):
+        rows = self.query_cache.get(name)
+        if rows is None:
+            cursor.execute(query, dict(databases=tuple(self.databases)))
+            rows = cursor.fetchall()
+            self.query_cache.put(name, rows)
 
-        for row in cursor:
+        for row in rows:
             for metric in metrics:
                 #  databases
                 if 'database_name' in row:
@@ -970,29 +997,38 @@ class Service(SimpleService):
         cursor.close()
 
     def populate_queries(self):
-        self.queries[query_factory(QUERY_NAME_DATABASE)] = METRICS[QUERY_NAME_DATABASE]
-        self.queries[query_factory(QUERY_NAME_BACKENDS)] = METRICS[QUERY_NAME_BACKENDS]
-        self.queries[query_factory(QUERY_NAME_LOCKS)] = METRICS[QUERY_NAME_LOCKS]
-        self.queries[query_factory(QUERY_NAME_BGWRITER)] = METRICS[QUERY_NAME_BGWRITER]
-        self.queries[query_factory(QUERY_NAME_DIFF_LSN, self.server_version)] = METRICS[QUERY_NAME_WAL_WRITES]
-        self.queries[query_factory(QUERY_NAME_STANDBY_DELTA, self.server_version)] = METRICS[QUERY_NAME_STANDBY_DELTA]
+        self.add_query(QUERY_NAME_DATABASE)
+        self.add_query(QUERY_NAME_DATABASE_SIZE)
+        self.add_query(QUERY_NAME_BACKENDS)
+        self.add_query(QUERY_NAME_LOCKS)
+        self.add_query(QUERY_NAME_BGWRITER)
+        self.add_query(QUERY_NAME_DIFF_LSN, self.server_version, QUERY_NAME_WAL_WRITES)
+        self.add_query(QUERY_NAME_STANDBY_DELTA, self.server_version)
 
         if self.do_index_stats:
-            self.queries[query_factory(QUERY_NAME_INDEX_STATS)] = METRICS[QUERY_NAME_INDEX_STATS]
+            self.add_query(QUERY_NAME_INDEX_STATS)
         if self.do_table_stats:
-            self.queries[query_factory(QUERY_NAME_TABLE_STATS)] = METRICS[QUERY_NAME_TABLE_STATS]
+            self.add_query(QUERY_NAME_TABLE_STATS)
 
         if self.is_superuser:
-            self.queries[query_factory(QUERY_NAME_ARCHIVE, self.server_version)] = METRICS[QUERY_NAME_ARCHIVE]
+            self.add_query(QUERY_NAME_ARCHIVE, self.server_version)
 
             if self.server_version >= 90400:
-                self.queries[query_factory(QUERY_NAME_WAL, self.server_version)] = METRICS[QUERY_NAME_WAL]
+                self.add_query(QUERY_NAME_WAL, self.server_version)
 
             if self.server_version >= 100000:
-                self.queries[query_factory(QUERY_NAME_REPSLOT_FILES, self.server_version)] = METRICS[QUERY_NAME_REPSLOT_FILES]
+                self.add_query(QUERY_NAME_REPSLOT_FILES, self.server_version)
 
         if self.server_version >= 90400:
-            self.queries[query_factory(QUERY_NAME_AUTOVACUUM)] = METRICS[QUERY_NAME_AUTOVACUUM]
+            self.add_query(QUERY_NAME_AUTOVACUUM)
+
+    def add_query(self, name, version=NO_VERSION, metrics=None):
+        """
+        :param name: str: query name, the name of its refresh interval
+        :param version: int: server version
+        :param metrics: str: name of the query metrics, the query name by default
+        """
+        self.queries[name] = query_factory(name, version), METRICS[metrics or name]
 
     def create_dynamic_charts(self):
         for database_name in self.databases[::-1]:
@@ -6,75 +6,151 @@
 
 import os
 
-from subprocess import Popen, PIPE
+from io import BytesIO
+
+from third_party.monotonic import monotonic
 
 from bases.FrameworkServices.SimpleService import SimpleService
 from bases.collection import find_binary
+from bases.forkserver import execute, DEFAULT_OUTPUT_LIMIT
+from bases.stream import CommandStream
+
+DEFAULT_COMMAND_TIMEOUT = 30
+# the latest record of a stream older than this number of updates (or records periods) is not used
+STREAM_MAX_AGE = 3
 
 
 class ExecutableService(SimpleService):
     def __init__(self, configuration=None, name=None):
         SimpleService.__init__(self, configuration=configuration, name=name)
         self.command = None
+        self.command_timeout = self.configuration.get('command_timeout', DEFAULT_COMMAND_TIMEOUT)
+        self.command_output_limit = self.configuration.get('command_output_limit', DEFAULT_OUTPUT_LIMIT)
+        # long running command (loop or follow mode of a tool), its output is split into records by the delimiter
+        self.stream_command = None
+        self.stream_delimiter = None
+        # seconds between the records of the stream (Ex. the tool loop interval), update_every if not set
+        self.stream_period = None
+        # True - only the latest record is used on update, False - all the records received since the last update
+        self.stream_latest = True
+        self.streaming = self.configuration.get('stream', True)
+        self.__stream = None
 
     def _get_raw_data(self, stderr=False, command=None):
         """
         Get raw data from executed command
         :return: <list>
         """
+        if self.__stream is not None and not (stderr or command):
+            return self._get_stream_data()
+
+        started = monotonic()
+        command = command or self.command
         try:
-            p = Popen(command if command else self.command, stdout=PIPE, stderr=PIPE)
+            result = execute(command, timeout=self.command_timeout, limit=self.command_output_limit)
         except Exception as error:
-            self.error('Executing command {command} resulted in error: {error}'.format(command=command or self.command,
+            self.error('Executing command {command} resulted in error: {error}'.format(command=command,
                                                                                        error=error))
             return None
-        data = list()
-        std = p.stderr if stderr else p.stdout
-        for line in std:
-            try:
-                data.append(line.decode('utf-8'))
-            except TypeError:
-                continue
+        if result.timed_out:
+            self.error('Command {command} timed out after {timeout} seconds'.format(command=command,
+                                                                                    timeout=self.command_timeout))
+            return None
 
-        return data
+        output = result.stderr if stderr else result.stdout
+        if result.truncated:
+            self.warning('Command {command} output is over {limit} bytes, truncated'.format(
+                command=command, limit=self.command_output_limit))
+            output = output[:output.rfind(b'\n') + 1]
 
-    def check(self):
+        self._telemetry.add_io(started, len(output))
+        return decode_lines(output)
+
+    def _get_stream_data(self):
         """
-        Parse basic configuration, check if command is whitelisted and is returning values
-        :return: <boolean>
+        Get raw data from the records of the long running command
+        :return: <list>
         """
-        # Preference: 1. "command" from configuration file 2. "command" from plugin (if specified)
-        if 'command' in self.configuration:
-            self.command = self.configuration['command']
+        started = monotonic()
+        if self.stream_latest:
+            period = max(self.update_every, self.stream_period or 0)
+            output = self.__stream.take_latest(max_age=STREAM_MAX_AGE * period)
+            if output is None:
+                self.debug('no recent record from {0}'.format(self.stream_command))
+                return None
+        else:
+            output = b''.join(self.__stream.take())
+
+        self._telemetry.add_io(started, len(output))
+        return decode_lines(output)
 
+    def parse_command(self, command):
+        """
+        :param command: <str> command and options
+        :return: <list> absolute path of the binary and options, None if the command is not valid
+        """
         # "command" must be: 1.not None 2. type <str>
-        if not (self.command and isinstance(self.command, str)):
+        if not (command and isinstance(command, str)):
             self.error('Command is not defined or command type is not <str>')
-            return False
+            return None
 
         # Split "command" into: 1. command <str> 2. options <list>
-        command, opts = self.command.split()[0], self.command.split()[1:]
+        binary, opts = command.split()[0], command.split()[1:]
 
         # Check for "bad" symbols in options. No pipes, redirects etc.
         opts_list = ['&', '|', ';', '>', '<']
         bad_opts = set(''.join(opts)) & set(opts_list)
         if bad_opts:
             self.error("Bad command argument(s): {opts}".format(opts=bad_opts))
-            return False
+            return None
 
         # Find absolute path ('echo' => '/bin/echo')
-        if '/' not in command:
-            command = find_binary(command)
-            if not command:
-                self.error('Can\'t locate "{command}" binary'.format(command=self.command))
-                return False
+        if '/' not in binary:
+            binary = find_binary(binary)
+            if not binary:
+                self.error('Can\'t locate "{command}" binary'.format(command=command))
+                return None
         # Check if binary exist and executable
         else:
-            if not os.access(command, os.X_OK):
-                self.error('"{binary}" is not executable'.format(binary=command))
+            if not os.access(binary, os.X_OK):
+                self.error('"{binary}" is not executable'.format(binary=binary))
+                return None
+
+        return [binary] + opts if opts else [binary]
+
+    def prepare_commands(self):
+        """
+        Parse "command" and "stream_command"
+        :return: <boolean>
+        """
+        # Preference: 1. "command" from configuration file 2. "command" from plugin (if specified)
+        if 'command' in self.configuration:
+            self.command = self.configuration['command']
+        if 'stream_command' in self.configuration:
+            self.stream_command = self.configuration['stream_command']
+
+        self.command = self.parse_command(self.command)
+        if not self.command:
+            return False
+
+        if self.stream_command and self.streaming:
+            self.stream_command = self.parse_command(self.stream_command)
+            if not self.stream_command:
+                return False
+            if not self.stream_delimiter:
+                self.error('"stream_command" needs "stream_delimiter"')
                 return False
+        else:
+            self.stream_command = None
+        return True
 
-        self.command = [command] + opts if opts else [command]
+    def check(self):
+        """
+        Parse basic configuration, check if command is whitelisted and is returning values
+        :return: <boolean>
+        """
+        if not self.prepare_commands():
+            return False
 
         try:
             data = self._get_data()
@@ -87,3 +163,28 @@ class ExecutableService(SimpleService):
             return True
         self.error('Command "{command}" returned no data'.format(command=self.command))
         return False
+
+    def create(self):
+        status = SimpleService.create(self)
+        if status and self.stream_command:
+            # "command" is used on check, the records of "stream_command" on update
+            delimiter = self.stream_delimiter
+            if not isinstance(delimiter, bytes):
+                delimiter = delimiter.encode('utf-8')
+            self.__stream = CommandStream(self.stream_command, delimiter, '{0} stream'.format(self.name))
+            self.__stream.start()
+        return status
+
+
+def decode_lines(output):
+    """
+    :param output: <bytes> command output
+    :return: <list> of decoded lines
+    """
+    data = list()
+    for line in BytesIO(output):
+        try:
+            data.append(line.decode('utf-8'))
+        except TypeError:
+            continue
+    return data
@@ -5,10 +5,24 @@
 # SPDX-License-Identifier: GPL-3.0-or-later
 
 from glob import glob
+import io
+import locale
 import sys
 import os
 
+from third_party.monotonic import monotonic
+
+from bases.charts import LOG_LAG_CHARTS_CREATE
 from bases.FrameworkServices.SimpleService import SimpleService
+from bases.tail import TAIL_ENGINE, DEFAULT_READ_LIMIT
+
+LOG_LAG_CHARTS_UPDATE = 'BEGIN netdata.log_lag_bytes_{job_name} {since_last}\n' \
+                        'SET backlog = {backlog}\n' \
+                        'SET dropped = {dropped}\n' \
+                        'END\n' \
+                        'BEGIN netdata.log_lag_seconds_{job_name} {since_last}\n' \
+                        'SET lag = {lag}\n' \
+                        'END\n'
 
 
 class LogService(SimpleService):
@@ -16,37 +30,58 @@ class LogService(SimpleService):
         SimpleService.__init__(self, configuration=configuration, name=name)
         self.log_path = self.configuration.get('path')
         self.__glob_path = self.log_path
-        self._last_position = 0
+        self.__tail = None
         self.__re_find = dict(current=0, run=0, maximum=60)
-        self.__open_args = {'errors': 'replace'} if sys.version_info[0] > 2 else {}
+        self.read_limit = self.configuration.get('read_limit', DEFAULT_READ_LIMIT)
+        self.read_lines_limit = self.configuration.get('read_lines_limit', 0)
+        self.backlog_skip_bytes = self.configuration.get('backlog_skip_bytes', 0)
+        self.backlog_skip_seconds = self.configuration.get('backlog_skip_seconds', 0)
+        self.backlog_chart = self.configuration.get('backlog_chart', True)
 
     def _get_raw_data(self):
         """
         Get log lines since last poll
         :return: list
         """
-        lines = list()
-        try:
-            if self.__re_find['current'] == self.__re_find['run']:
-                self._find_recent_log_file()
-            size = os.path.getsize(self.log_path)
-            if size == self._last_position:
-                self.__re_find['current'] += 1
-                return list()  # return empty list if nothing has changed
-            elif size < self._last_position:
-                self._last_position = 0  # read from beginning if file has shrunk
-
-            with open(self.log_path, **self.__open_args) as fp:
-                fp.seek(self._last_position)
-                for line in fp:
-                    lines.append(line)
-                self._last_position = fp.tell()
-                self.__re_find['current'] = 0
-        except (OSError, IOError) as error:
+        started = monotonic()
+        if self.__re_find['current'] == self.__re_find['run']:
+            self._find_recent_log_file()
+        if self.__tail is None or self.__tail.path != os.path.abspath(self.log_path):
+            # not created yet or a new log file, read from the beginning
+            self._follow(from_end=False)
+        if self.backlog_skip_bytes or self.backlog_skip_seconds:
+            self._skip_backlog()
+
+        data = self.__tail.read()
+        if data is None:
+            self.__re_find['current'] += 1
+            self.error("can't read '{0}'".format(self.log_path))
+            return None
+        if not data:
             self.__re_find['current'] += 1
-            self.error(str(error))
+            return list()  # return empty list if nothing has changed
 
-        return lines or None
+        self._telemetry.add_io(started, len(data))
+        self.__re_find['current'] = 0
+        return split_lines(data)
+
+    def _follow(self, from_end):
+        if self.__tail is not None:
+            self.__tail.close()
+        self.__tail = TAIL_ENGINE.subscribe(self.log_path, from_end=from_end, read_limit=self.read_limit,
+                                            lines_limit=self.read_lines_limit)
+
+    def _skip_backlog(self):
+        """
+        Skips to the end of the log file if the lines not processed yet are over the backlog limits
+        :return:
+        """
+        size, lag = self.__tail.lag()
+        if (self.backlog_skip_bytes and size > self.backlog_skip_bytes) or \
+                (self.backlog_skip_seconds and lag > self.backlog_skip_seconds):
+            self.__tail.skip()
+            self.warning("'{0}' backlog is {1} bytes, {2:.1f} seconds behind, skipped to the end".format(
+                self.log_path, size, lag))
 
     def _find_recent_log_file(self):
         """
@@ -77,6 +112,38 @@ class LogService(SimpleService):
 
     def create(self):
         # set cursor at last byte of log file
-        self._last_position = os.path.getsize(self.log_path)
+        self._follow(from_end=True)
         status = SimpleService.create(self)
+        if status and self.backlog_chart:
+            self._protocol.write(LOG_LAG_CHARTS_CREATE.format(job_name=self.name, update_every=self.update_every))
+            self._protocol.flush()
         return status
+
+    def update(self, interval):
+        updated = SimpleService.update(self, interval)
+        if self.backlog_chart and self.__tail is not None:
+            # flushed with the job charts
+            backlog, lag = self.__tail.lag()
+            self._protocol.write(LOG_LAG_CHARTS_UPDATE.format(
+                job_name=self.name,
+                since_last=interval,
+                backlog=backlog,
+                dropped=self.__tail.pop_dropped(),
+                lag=int(lag * 1e3),
+            ))
+        return updated
+
+
+if sys.version_info[0] > 2:
+    # the encoding of the files opened in the text mode
+    ENCODING = locale.getpreferredencoding(False)
+
+    def split_lines(data):
+        """
+        :param data: <bytes> complete lines
+        :return: <list> of lines decoded like the lines of a file opened in the text mode
+        """
+        return io.TextIOWrapper(io.BytesIO(data), encoding=ENCODING, errors='replace').readlines()
+else:
+    def split_lines(data):
+        return io.BytesIO(data).readlines()
@@ -17,7 +17,10 @@ except ImportError:
     except ImportError:
         PY_MYSQL = False
 
+from third_party.monotonic import monotonic
+
 from bases.FrameworkServices.SimpleService import SimpleService
+from bases.refresh import QueryCache
 
 
 class MySQLService(SimpleService):
@@ -28,6 +31,9 @@ class MySQLService(SimpleService):
         self.extra_conn_properties = dict()
         self.__queries = self.configuration.get('queries', dict())
         self.queries = dict()
+        # query name: refresh interval in seconds, the queries not in it are run on every update
+        self.refresh_every = dict()
+        self.query_cache = None
 
     def __connect(self):
         try:
@@ -100,6 +106,9 @@ class MySQLService(SimpleService):
         if not self.queries:
             return None
 
+        # Preference: 1. "refresh_every" from the configuration file 2. "refresh_every" from the module
+        self.query_cache = QueryCache(self.update_every, self.refresh_every, self.configuration.get('refresh_every'))
+
         # Get connection properties
         self.__conn_properties = get_connection_properties(self.configuration, self.extra_conn_properties)
         if not self.__conn_properties:
@@ -128,7 +137,13 @@ class MySQLService(SimpleService):
         Get raw data from MySQL server
         :return: dict: fetchall() or (fetchall(), description)
         """
+        started = monotonic()
+        try:
+            return self.__get_raw_data(description)
+        finally:
+            self._telemetry.add_io(started)
 
+    def __get_raw_data(self, description):
         if not self.__connection:
             self.__connection, error = self.__connect()
             if error:
@@ -139,6 +154,10 @@ class MySQLService(SimpleService):
         try:
             cursor = self.__connection.cursor()
             for name, query in queries.items():
+                cached = self.query_cache.get(name)
+                if cached is not None:
+                    raw_data[name] = cached
+                    continue
                 try:
                     cursor.execute(query)
                 except (MySQLdb.ProgrammingError, MySQLdb.OperationalError) as error:
@@ -152,6 +171,7 @@ class MySQLService(SimpleService):
                     continue
                 else:
                     raw_data[name] = (cursor.fetchall(), cursor.description) if description else cursor.fetchall()
+                    self.query_cache.put(name, raw_data[name])
             cursor.close()
             self.__connection.commit()
         except (MySQLdb.MySQLError, RuntimeError, TypeError, AttributeError):
@@ -4,19 +4,46 @@
 # Author: Ilya Mashchenko (ilyam8)
 # SPDX-License-Identifier: GPL-3.0-or-later
 
+import threading
 
 from time import sleep, time
 
 from third_party.monotonic import monotonic
 
 from bases.charts import Charts, ChartError, create_runtime_chart
-from bases.collection import safe_print
+from bases.collection import ProtocolBuffer
+from bases.executor import EXECUTOR
 from bases.loggers import PythonDLimitedLogger
 
 RUNTIME_CHART_UPDATE = 'BEGIN netdata.runtime_{job_name} {since_last}\n' \
                        'SET run_time = {elapsed}\n' \
                        'END\n'
 
+CHANGES_ONLY_CHART_UPDATE = 'BEGIN netdata.changes_only_{job_name} {since_last}\n' \
+                            'SET sent = {sent}\n' \
+                            'SET saved = {saved}\n' \
+                            'END\n'
+
+TELEMETRY_CHARTS_UPDATE = 'BEGIN netdata.telemetry_time_{job_name} {since_last}\n' \
+                          'SET io = {io}\n' \
+                          'SET parse = {parse}\n' \
+                          'SET format = {format}\n' \
+                          'END\n' \
+                          'BEGIN netdata.telemetry_lag_{job_name} {since_last}\n' \
+                          'SET lag = {lag}\n' \
+                          'END\n' \
+                          'BEGIN netdata.telemetry_bytes_{job_name} {since_last}\n' \
+                          'SET read = {read}\n' \
+                          'SET sent = {sent}\n' \
+                          'END\n' \
+                          'BEGIN netdata.telemetry_dimensions_{job_name} {since_last}\n' \
+                          'SET updated = {dimensions}\n' \
+                          'END\n' \
+                          'BEGIN netdata.telemetry_retries_{job_name} {since_last}\n' \
+                          'SET retries = {retries}\n' \
+                          'SET penalty = {penalty}\n' \
+                          'END\n'
+
 PENALTY_EVERY = 5
 MAX_PENALTY = 10 * 60  # 10 minutes
 
@@ -35,12 +62,21 @@ class RuntimeCounters:
         self.penalty = 0
         self.elapsed = 0
         self.prev_update = 0
+        self.next_run = 0
+        # seconds the update started after it was scheduled
+        self.lag = 0
 
         self.runs = 1
 
+    def start(self):
+        self.start_mono = monotonic()
+        self.start_real = time()
+        self.lag = max(self.start_mono - self.next_run, 0) if self.next_run else 0
+
     def calc_next(self):
         self.start_mono = monotonic()
-        return self.start_mono - (self.start_mono % self.update_every) + self.update_every + self.penalty
+        self.next_run = self.start_mono - (self.start_mono % self.update_every) + self.update_every + self.penalty
+        return self.next_run
 
     def sleep_until_next(self):
         next_time = self.calc_next()
@@ -55,6 +91,36 @@ class RuntimeCounters:
             self.penalty = round(min(self.retries * self.update_every / 2, MAX_PENALTY))
 
 
+class JobTelemetry:
+    """
+    Per update costs of a job, sent on the telemetry charts if the job 'telemetry' option is enabled.
+
+    I/O time and bytes are added by the framework services '_get_raw_data' methods, also from the executor threads.
+    """
+    def __init__(self, enabled=False):
+        self.enabled = enabled
+        self.lock = threading.Lock()
+        self.io_time = 0
+        self.collect_time = 0
+        self.dimensions = 0
+        self.bytes_read = 0
+
+    def reset(self):
+        self.io_time = 0
+        self.collect_time = 0
+        self.dimensions = 0
+
+    def add_io(self, started, size=0):
+        """
+        :param started: <float> monotonic time the I/O started
+        :param size: <int> bytes read
+        """
+        elapsed = monotonic() - started
+        with self.lock:
+            self.io_time += elapsed
+            self.bytes_read += size
+
+
 class SimpleService(PythonDLimitedLogger, object):
     """
     Prototype of Service class.
@@ -76,11 +142,18 @@ class SimpleService(PythonDLimitedLogger, object):
         self.fake_name = None
 
         self._runtime_counters = RuntimeCounters(configuration=configuration)
+        self._protocol = ProtocolBuffer()
+        self._telemetry = JobTelemetry(enabled=configuration.pop('telemetry', False))
+        self.concurrency = int(configuration.pop('concurrency', 4))
+        changes_only = configuration.pop('changes_only', False)
+        full_refresh_every = int(configuration.pop('full_refresh_every', 2))
         self.charts = Charts(job_name=self.actual_name,
                              priority=configuration.pop('priority'),
                              cleanup=configuration.pop('chart_cleanup'),
                              get_update_every=self.get_update_every,
-                             module_name=self.module_name)
+                             module_name=self.module_name,
+                             protocol=self._protocol,
+                             refresh_every=full_refresh_every if changes_only else 0)
 
     def __repr__(self):
         return '<{cls_bases}: {name}>'.format(cls_bases=', '.join(c.__name__ for c in self.__class__.__bases__),
@@ -181,38 +254,86 @@ class SimpleService(PythonDLimitedLogger, object):
 
         while True:
             job.sleep_until_next()
+            self.run_once()
 
-            since = 0
-            if job.prev_update:
-                since = int((job.start_real - job.prev_update) * 1e6)
+    def next_run(self):
+        """
+        Calculates the next update time, takes into account the penalty.
+        :return: <float> monotonic time
+        """
+        return self._runtime_counters.calc_next()
 
-            try:
-                updated = self.update(interval=since)
-            except Exception as error:
-                self.error('update() unhandled exception: {error}'.format(error=error))
-                updated = False
-
-            job.runs += 1
-
-            if not updated:
-                job.handle_retries()
-            else:
-                job.elapsed = int((monotonic() - job.start_mono) * 1e3)
-                job.prev_update = job.start_real
-                job.retries, job.penalty = 0, 0
-                safe_print(RUNTIME_CHART_UPDATE.format(job_name=self.name,
-                                                       since_last=since,
-                                                       elapsed=job.elapsed))
-            self.debug('update => [{status}] (elapsed time: {elapsed}, failed retries in a row: {retries})'.format(
-                status='OK' if updated else 'FAILED',
-                elapsed=job.elapsed if updated else '-',
-                retries=job.retries))
+    def run_once(self):
+        """
+        Runs one update cycle: updates the charts, the runtime chart and the retries state.
+        Used by run() and by the python.d.plugin scheduler.
+        :return: None
+        """
+        job = self._runtime_counters
+        job.start()
+        self._telemetry.reset()
+
+        since = 0
+        if job.prev_update:
+            since = int((job.start_real - job.prev_update) * 1e6)
+
+        try:
+            updated = self.update(interval=since)
+        except Exception as error:
+            self.error('update() unhandled exception: {error}'.format(error=error))
+            updated = False
+
+        job.runs += 1
+
+        if not updated:
+            job.handle_retries()
+        else:
+            job.elapsed = int((monotonic() - job.start_mono) * 1e3)
+            job.prev_update = job.start_real
+            job.retries, job.penalty = 0, 0
+            self._protocol.write(RUNTIME_CHART_UPDATE.format(job_name=self.name,
+                                                             since_last=since,
+                                                             elapsed=job.elapsed))
+            if self.charts.refresh_every:
+                self._protocol.write(CHANGES_ONLY_CHART_UPDATE.format(job_name=self.name,
+                                                                      since_last=since,
+                                                                      sent=self._protocol.bytes,
+                                                                      saved=self._protocol.saved))
+        if self._telemetry.enabled:
+            self.write_telemetry(since)
+        # all the job charts are sent with one write
+        self._protocol.flush()
+        self.debug('update => [{status}] (elapsed time: {elapsed}, failed retries in a row: {retries})'.format(
+            status='OK' if updated else 'FAILED',
+            elapsed=job.elapsed if updated else '-',
+            retries=job.retries))
+
+    def write_telemetry(self, since):
+        telemetry, job = self._telemetry, self._runtime_counters
+        total = monotonic() - job.start_mono
+        # I/O of concurrent calls overlaps, the sum can be greater than the collection time
+        io = min(telemetry.io_time, telemetry.collect_time)
+        self._protocol.write(TELEMETRY_CHARTS_UPDATE.format(
+            job_name=self.name,
+            since_last=since,
+            io=int(io * 1e6),
+            parse=int((telemetry.collect_time - io) * 1e6),
+            format=int(max(total - telemetry.collect_time, 0) * 1e6),
+            lag=int(job.lag * 1e6),
+            read=telemetry.bytes_read,
+            sent=self._protocol.bytes,
+            dimensions=telemetry.dimensions,
+            retries=job.retries,
+            penalty=job.penalty,
+        ))
 
     def update(self, interval):
         """
         :return:
         """
+        started = monotonic()
         data = self.get_data()
+        self._telemetry.collect_time = monotonic() - started
         if not data:
             self.debug('get_data() returned no data')
             return False
@@ -236,12 +357,30 @@ class SimpleService(PythonDLimitedLogger, object):
             ok = chart.update(data, interval)
             if ok:
                 updated = True
+                self._telemetry.dimensions += chart.updated_dimensions
 
         if not updated:
             self.debug('none of the charts has been updated')
 
         return updated
 
+    def run_concurrently(self, calls, timeout=None):
+        """
+        Runs the calls in the plugin wide executor, at most 'concurrency' of the job calls at once.
+
+        Waits until all the calls are done or the timeout (default is update_every) is over.
+        :param calls: <list> of (<callable>, <tuple> args)
+        :param timeout: <float> seconds
+        :return: <list> of results, None for failed, expired and not finished calls
+        """
+        batch = EXECUTOR.run(calls, self.concurrency, timeout or self.update_every)
+        for index, error in batch.errors.items():
+            self.error('concurrent call {0} failed : {1}'.format(getattr(calls[index][0], '__name__', index), error))
+        if batch.left or batch.expired:
+            self.warning('{0} of {1} concurrent call(s) not finished in time'.format(
+                batch.left + batch.expired, len(calls)))
+        return batch.results
+
     def get_data(self):
         return self._get_data()
 
@@ -5,6 +5,7 @@
 # SPDX-License-Identifier: GPL-3.0-or-later
 
 import errno
+import logging
 import socket
 
 try:
@@ -14,12 +15,15 @@ except ImportError:
 else:
     _TLS_SUPPORT = True
 
+from third_party.monotonic import monotonic
+
 from bases.FrameworkServices.SimpleService import SimpleService
 
 
 DEFAULT_CONNECT_TIMEOUT = 2.0
 DEFAULT_READ_TIMEOUT = 2.0
 DEFAULT_WRITE_TIMEOUT = 2.0
+DEFAULT_RECEIVE_BUFFER_SIZE = 65536
 
 
 class SocketService(SimpleService):
@@ -36,10 +40,12 @@ class SocketService(SimpleService):
         self.key = None
         self.__socket_config = None
         self.__empty_request = "".encode()
+        self.__receive_buffer = None
         SimpleService.__init__(self, configuration=configuration, name=name)
         self.connect_timeout = configuration.get('connect_timeout', DEFAULT_CONNECT_TIMEOUT)
         self.read_timeout = configuration.get('read_timeout', DEFAULT_READ_TIMEOUT)
         self.write_timeout = configuration.get('write_timeout', DEFAULT_WRITE_TIMEOUT)
+        self.receive_buffer_size = configuration.get('receive_buffer_size', DEFAULT_RECEIVE_BUFFER_SIZE)
 
     def _socket_error(self, message=None):
         if self.unix_socket is not None:
@@ -207,37 +213,44 @@ class SocketService(SimpleService):
     def _receive(self, raw=False):
         """
         Receive data from socket
+
+        Chunks are received into a reusable buffer and appended to a bytearray,
+        the response is decoded once, when it is complete.
         :param raw: set `True` to return bytes
         :type raw: bool
         :return: decoded str or raw bytes
         :rtype: str/bytes
         """
-        data = "" if not raw else b""
+        if self.__receive_buffer is None or len(self.__receive_buffer) != self.receive_buffer_size:
+            self.__receive_buffer = memoryview(bytearray(self.receive_buffer_size))
+        buf = self.__receive_buffer
+        data = bytearray()
+
         while True:
-            self.debug('receiving response')
             try:
-                self.debug('set socket read timeout to: {0}'.format(self._sock.gettimeout()))
                 self._sock.settimeout(self.read_timeout)
-                buf = self._sock.recv(4096)
+                size = self._sock.recv_into(buf)
             except Exception as error:
                 self._socket_error('failed to receive response: {0}'.format(error))
                 self._disconnect()
                 break
 
-            if buf is None or len(buf) == 0:  # handle server disconnect
-                if data == "" or data == b"":
+            if not size:  # handle server disconnect
+                if not data:
                     self._socket_error('unexpectedly disconnected')
                 else:
                     self.debug('server closed the connection')
                 self._disconnect()
                 break
 
-            self.debug('received data')
-            data += buf.decode('utf-8', 'ignore') if not raw else buf
-            if self._check_raw_data(data):
+            start = len(data)
+            data += buf[:size]
+            if self._check_received(data, start):
                 break
 
-        self.debug('final response: {0}'.format(data))
+        data = bytes(data) if raw else data.decode('utf-8', 'ignore')
+        if self.logger.severity <= logging.DEBUG:
+            self.debug('final response: {0}'.format(data))
         return data
 
     def _get_raw_data(self, raw=False, request=None):
@@ -248,21 +261,38 @@ class SocketService(SimpleService):
         :return: decoded data (str) or raw data (bytes)
         :rtype: str/bytes
         """
-        if self._sock is None:
-            self._connect()
+        started = monotonic()
+        data = None
+        try:
             if self._sock is None:
+                self._connect()
+                if self._sock is None:
+                    return None
+
+            # Send request if it is needed
+            if not self._send(request):
                 return None
 
-        # Send request if it is needed
-        if not self._send(request):
-            return None
+            data = self._receive(raw)
 
-        data = self._receive(raw)
+            if not self._keep_alive:
+                self._disconnect()
 
-        if not self._keep_alive:
-            self._disconnect()
+            return data
+        finally:
+            self._telemetry.add_io(started, len(data) if data else 0)
 
-        return data
+    def _check_received(self, data, start):
+        """
+        Check if all data has been gathered from socket, called after every received chunk.
+
+        The default implementation passes the decoded data to `_check_raw_data`.
+        Override it to check only the new bytes without decoding the whole response on every chunk.
+        :param data: bytearray: all received data, must not be modified
+        :param start: int: offset of the last received chunk in data
+        :return: boolean
+        """
+        return self._check_raw_data(data.decode('utf-8', 'ignore'))
 
     @staticmethod
     def _check_raw_data(data):
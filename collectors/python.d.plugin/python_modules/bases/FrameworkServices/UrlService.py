@@ -6,8 +6,11 @@
 
 import urllib3
 
+from json import loads
 from distutils.version import StrictVersion as version
 
+from third_party.monotonic import monotonic
+
 from bases.FrameworkServices.SimpleService import SimpleService
 
 try:
@@ -22,6 +25,8 @@ URLLIB3_MIN_REQUIRED_VERSION = '1.9'
 URLLIB3_VERSION = urllib3.__version__
 URLLIB3 = 'urllib3'
 
+STREAM_CHUNK_SIZE = 65536
+
 
 def version_check():
     if version(URLLIB3_VERSION) >= version(URLLIB3_MIN_REQUIRED_VERSION):
@@ -54,6 +59,7 @@ class UrlService(SimpleService):
         self.tls_ca_file = self.configuration.get('tls_ca_file')
         self.tls_key_file = self.configuration.get('tls_key_file')
         self.tls_cert_file = self.configuration.get('tls_cert_file')
+        self.stream_json = self.configuration.get('stream_json', False)
         self._manager = None
 
     def __make_headers(self, **header_kw):
@@ -133,13 +139,96 @@ class UrlService(SimpleService):
         Get status and response body content from http request. Does not catch exceptions
         :return: int, str
         """
+        started = monotonic()
+        response = self._request(url, manager, retries, redirect, **kwargs)
+        self._telemetry.add_io(started, len(response.data or ''))
+        if isinstance(response.data, str):
+            return response.status, response.data
+        return response.status, response.data.decode()
+
+    def _get_json(self, url=None, manager=None, extractor=None, **kwargs):
+        """
+        Get decoded JSON document from http request.
+        With 'stream_json' enabled and the extractor passed only the extractor paths subtrees are decoded,
+        the response body is not read in full.
+        :param extractor: <MetricExtractor>
+        :return: decoded document
+        """
+        try:
+            if self.stream_json and extractor:
+                status, data = self._get_stream_with_status(url, manager, extractor.load, **kwargs)
+            else:
+                status, data = self._get_raw_data_with_status(url, manager, **kwargs)
+                if status == 200:
+                    data = loads(data)
+        except Exception as error:
+            self.error('Url: {url}. Error: {error}'.format(url=url or self.url, error=error))
+            return None
+
+        if status == 200:
+            return data
+        else:
+            self.debug('Url: {url}. Http response status code: {code}'.format(url=url or self.url, code=status))
+            return None
+
+    def _get_stream(self, url=None, manager=None, parse=None, **kwargs):
+        """
+        Get the response body parsed while it is received, the response body is not read in full.
+        :param parse: <function> taking an iterable of <bytes> chunks, returns the parsed document
+        :return: parsed document
+        """
+        try:
+            status, data = self._get_stream_with_status(url, manager, parse, **kwargs)
+        except Exception as error:
+            self.error('Url: {url}. Error: {error}'.format(url=url or self.url, error=error))
+            return None
+
+        if status == 200:
+            return data
+        else:
+            self.debug('Url: {url}. Http response status code: {code}'.format(url=url or self.url, code=status))
+            return None
+
+    def _get_stream_with_status(self, url, manager, parse, retries=1, redirect=True, **kwargs):
+        """
+        Get status and the response body parsed while it is received. Does not catch exceptions
+        :return: int, parsed document
+        """
+        started = monotonic()
+        response = self._request(url, manager, retries, redirect, preload_content=False, **kwargs)
+        read = [0]
+
+        def chunks():
+            for chunk in response.stream(STREAM_CHUNK_SIZE):
+                read[0] += len(chunk)
+                yield chunk
+
+        try:
+            if response.status != 200:
+                response.close()
+                return response.status, None
+            try:
+                document = parse(chunks())
+                # a keep-alive connection goes back to the pool only with the body read to the end
+                for _ in chunks():
+                    pass
+            except Exception:
+                response.close()
+                raise
+            response.release_conn()
+            return response.status, document
+        finally:
+            # the response is decoded while it is received, decoding is counted as I/O
+            self._telemetry.add_io(started, read[0])
+
+    def _request(self, url, manager, retries, redirect, **kwargs):
         url = url or self.url
         manager = manager or self._manager
         retry = urllib3.Retry(retries)
         if hasattr(retry, 'respect_retry_after_header'):
             retry.respect_retry_after_header = bool(self.respect_retry_after_header)
 
-        response = manager.request(
+        return manager.request(
             method=self.method,
             url=url,
             timeout=self.request_timeout,
@@ -148,9 +237,6 @@ class UrlService(SimpleService):
             redirect=redirect,
             **kwargs
         )
-        if isinstance(response.data, str):
-            return response.status, response.data
-        return response.status, response.data.decode()
 
     def check(self):
         """
@@ -3,8 +3,6 @@
 # Author: Ilya Mashchenko (ilyam8)
 # SPDX-License-Identifier: GPL-3.0-or-later
 
-from bases.collection import safe_print
-
 CHART_PARAMS = ['type', 'id', 'name', 'title', 'units', 'family', 'context', 'chart_type', 'hidden']
 DIMENSION_PARAMS = ['id', 'name', 'algorithm', 'multiplier', 'divisor', 'hidden']
 VARIABLE_PARAMS = ['id', 'value']
@@ -12,7 +10,7 @@ VARIABLE_PARAMS = ['id', 'value']
 CHART_TYPES = ['line', 'area', 'stacked']
 DIMENSION_ALGORITHMS = ['absolute', 'incremental', 'percentage-of-absolute-row', 'percentage-of-incremental-row']
 
-CHART_BEGIN = 'BEGIN {type}.{id} {since_last}\n'
+CHART_BEGIN_PREFIX = 'BEGIN {type}.{id} '
 CHART_CREATE = "CHART {type}.{id} '{name}' '{title}' '{units}' '{family}' '{context}' " \
                "{chart_type} {priority} {update_every} '{hidden}' 'python.d.plugin' '{module_name}'\n"
 CHART_OBSOLETE = "CHART {type}.{id} '{name}' '{title}' '{units}' '{family}' '{context}' " \
@@ -21,13 +19,48 @@ CHART_OBSOLETE = "CHART {type}.{id} '{name}' '{title}' '{units}' '{family}' '{co
 
 DIMENSION_CREATE = "DIMENSION '{id}' '{name}' {algorithm} {multiplier} {divisor} '{hidden} {obsolete}'\n"
 DIMENSION_SET = "SET '{id}' = {value}\n"
+DIMENSION_SET_PREFIX = "SET '{id}' = "
 
 CHART_VARIABLE_SET = "VARIABLE CHART '{id}' = {value}\n"
+CHART_VARIABLE_SET_PREFIX = "VARIABLE CHART '{id}' = "
 
 RUNTIME_CHART_CREATE = "CHART netdata.runtime_{job_name} '' 'Execution time for {job_name}' 'ms' 'python.d' " \
                        "netdata.pythond_runtime line 145000 {update_every}\n" \
                        "DIMENSION run_time 'run time' absolute 1 1\n"
 
+CHANGES_ONLY_CHART_CREATE = "CHART netdata.changes_only_{job_name} '' 'Protocol traffic for {job_name}' 'bytes/s' " \
+                            "'python.d' netdata.pythond_changes_only line 145001 {update_every}\n" \
+                            "DIMENSION sent '' incremental 1 1\n" \
+                            "DIMENSION saved '' incremental 1 1\n"
+
+TELEMETRY_CHARTS_CREATE = "CHART netdata.telemetry_time_{job_name} '' 'Update time breakdown for {job_name}' 'ms' " \
+                          "'python.d' netdata.pythond_telemetry_time stacked 145002 {update_every}\n" \
+                          "DIMENSION io '' absolute 1 1000\n" \
+                          "DIMENSION parse '' absolute 1 1000\n" \
+                          "DIMENSION format '' absolute 1 1000\n" \
+                          "CHART netdata.telemetry_lag_{job_name} '' 'Scheduling lag for {job_name}' 'ms' " \
+                          "'python.d' netdata.pythond_telemetry_lag line 145003 {update_every}\n" \
+                          "DIMENSION lag '' absolute 1 1000\n" \
+                          "CHART netdata.telemetry_bytes_{job_name} '' 'Data read and sent by {job_name}' 'bytes/s' " \
+                          "'python.d' netdata.pythond_telemetry_bytes line 145004 {update_every}\n" \
+                          "DIMENSION read '' incremental 1 1\n" \
+                          "DIMENSION sent '' incremental 1 1\n" \
+                          "CHART netdata.telemetry_dimensions_{job_name} '' 'Dimensions updated by {job_name}' " \
+                          "'dimensions' 'python.d' netdata.pythond_telemetry_dimensions line 145005 {update_every}\n" \
+                          "DIMENSION updated '' absolute 1 1\n" \
+                          "CHART netdata.telemetry_retries_{job_name} '' 'Failed updates in a row for {job_name}' " \
+                          "'updates' 'python.d' netdata.pythond_telemetry_retries line 145006 {update_every}\n" \
+                          "DIMENSION retries '' absolute 1 1\n" \
+                          "DIMENSION penalty 'penalty, seconds' absolute 1 1\n"
+
+LOG_LAG_CHARTS_CREATE = "CHART netdata.log_lag_bytes_{job_name} '' 'Log lines not processed by {job_name}' 'bytes' " \
+                        "'python.d' netdata.pythond_log_lag_bytes line 145007 {update_every}\n" \
+                        "DIMENSION backlog '' absolute 1 1\n" \
+                        "DIMENSION dropped '' absolute 1 1\n" \
+                        "CHART netdata.log_lag_seconds_{job_name} '' 'Log lines lag for {job_name}' 'seconds' " \
+                        "'python.d' netdata.pythond_log_lag_seconds line 145008 {update_every}\n" \
+                        "DIMENSION lag '' absolute 1 1000\n"
+
 
 def create_runtime_chart(func):
     """
@@ -44,8 +77,19 @@ def create_runtime_chart(func):
         self = args[0]
         ok = func(*args, **kwargs)
         if ok:
-            safe_print(RUNTIME_CHART_CREATE.format(job_name=self.name,
-                                                   update_every=self._runtime_counters.update_every))
+            self._protocol.write(RUNTIME_CHART_CREATE.format(job_name=self.name,
+                                                             update_every=self._runtime_counters.update_every))
+            if self.charts.refresh_every:
+                self._protocol.write(CHANGES_ONLY_CHART_CREATE.format(
+                    job_name=self.name,
+                    update_every=self._runtime_counters.update_every,
+                ))
+            if self._telemetry.enabled:
+                self._protocol.write(TELEMETRY_CHARTS_CREATE.format(
+                    job_name=self.name,
+                    update_every=self._runtime_counters.update_every,
+                ))
+        self._protocol.flush()
         return ok
     return wrapper
 
@@ -72,17 +116,21 @@ class Charts:
     All charts stored in a dict.
     Chart is a instance of Chart class.
     Charts adding must be done using Charts.add_chart() method only"""
-    def __init__(self, job_name, priority, cleanup, get_update_every, module_name):
+    def __init__(self, job_name, priority, cleanup, get_update_every, module_name, protocol, refresh_every=0):
         """
         :param job_name: <bound method>
         :param priority: <int>
         :param get_update_every: <bound method>
+        :param protocol: <ProtocolBuffer>
+        :param refresh_every: <int>: send unchanged charts only every Nth update, 0 disables the changes only mode
         """
         self.job_name = job_name
         self.priority = priority
         self.cleanup = cleanup
         self.get_update_every = get_update_every
         self.module_name = module_name
+        self.protocol = protocol
+        self.refresh_every = refresh_every
         self.charts = dict()
 
     def __len__(self):
@@ -121,11 +169,12 @@ class Charts:
         :return:
         """
         params = [self.job_name()] + params
-        new_chart = Chart(params)
+        new_chart = Chart(params, self.protocol)
 
         new_chart.params['update_every'] = self.get_update_every()
         new_chart.params['priority'] = self.priority
         new_chart.params['module_name'] = self.module_name
+        new_chart.refresh_every = self.refresh_every
 
         self.priority += 1
         self.charts[new_chart.id] = new_chart
@@ -138,9 +187,10 @@ class Charts:
 
 class Chart:
     """Represent a chart"""
-    def __init__(self, params):
+    def __init__(self, params, protocol):
         """
         :param params: <list>
+        :param protocol: <ProtocolBuffer>
         """
         if not isinstance(params, list):
             raise ItemTypeError("'chart' must be a list type")
@@ -159,6 +209,14 @@ class Chart:
         self.variables = set()
         self.flags = ChartFlags()
         self.penalty = 0
+        self.protocol = protocol
+        self.plan = None
+        self.refresh_every = 0
+        self.last_sent = None
+        self.skipped = 0
+        self.skipped_interval = 0
+        # number of dimensions set by the last update
+        self.updated_dimensions = 0
 
     def __getattr__(self, item):
         try:
@@ -185,6 +243,7 @@ class Chart:
         :return:
         """
         self.variables.add(ChartVariable(variable))
+        self.plan = None
 
     def add_dimension(self, dimension):
         """
@@ -198,6 +257,7 @@ class Chart:
                                                                                             chart=self.name))
         self.refresh()
         self.dimensions.append(dim)
+        self.plan = None
         return dim
 
     def del_dimension(self, dimension_id, hide=True):
@@ -210,6 +270,7 @@ class Chart:
         dimension.params['obsolete'] = 'obsolete'
         self.create()
         self.dimensions.remove(dimension)
+        self.plan = None
 
     def hide_dimension(self, dimension_id, reverse=False):
         if dimension_id not in self:
@@ -230,35 +291,50 @@ class Chart:
         self.flags.push = False
         self.flags.created = True
 
-        safe_print(chart + dimensions + variables)
+        self.protocol.write(chart, dimensions, variables)
+
+    def compile(self):
+        """
+        Builds the chart update plan, it is rebuilt only after dimensions or variables change.
+        :return: <UpdatePlan>
+        """
+        self.plan = UpdatePlan(self)
+        return self.plan
 
     def can_be_updated(self, data):
-        for dim in self.dimensions:
-            if dim.get_value(data) is not None:
+        plan = self.plan or self.compile()
+        for key, _ in plan.dimensions:
+            if get_int(data, key) is not None:
                 return True
         return False
 
     def update(self, data, interval):
-        updated_dimensions, updated_variables = str(), str()
-
-        for dim in self.dimensions:
-            value = dim.get_value(data)
-            if value is not None:
-                updated_dimensions += dim.set(value)
-
-        for var in self.variables:
-            value = var.get_value(data)
-            if value is not None:
-                updated_variables += var.set(value)
+        plan = self.plan or self.compile()
+        updated_dimensions = plan.render_dimensions(data)
+        self.updated_dimensions = updated_dimensions.count('\n')
 
         if updated_dimensions:
-            since_last = interval if self.flags.updated else 0
+            updated_variables = plan.render_variables(data)
+
+            if self.is_unchanged(updated_dimensions, updated_variables):
+                self.skipped += 1
+                self.skipped_interval += interval
+                # BEGIN line + SET and VARIABLE lines + 'END' line + the message line separator
+                self.protocol.saved += len(plan.begin) + len(str(interval)) + 1 + \
+                    len(updated_dimensions) + len(updated_variables) + 4 + 1
+                self.penalty = 0
+                return True
+
+            since_last = interval + self.skipped_interval if self.flags.updated else 0
 
             if self.flags.push:
                 self.create()
 
-            chart_begin = CHART_BEGIN.format(type=self.type, id=self.id, since_last=since_last)
-            safe_print(chart_begin, updated_dimensions, updated_variables, 'END\n')
+            self.protocol.write(plan.begin, str(since_last), '\n', updated_dimensions, updated_variables, 'END\n')
+
+            if self.refresh_every:
+                self.last_sent = (updated_dimensions, updated_variables)
+                self.skipped, self.skipped_interval = 0, 0
 
             self.flags.updated = True
             self.penalty = 0
@@ -268,13 +344,31 @@ class Chart:
 
         return bool(updated_dimensions)
 
+    def is_unchanged(self, updated_dimensions, updated_variables):
+        """
+        Changes only mode: an update can be skipped if values are the same as the last sent.
+
+        Netdata stores an empty value for a dimension that is not SET in an update, so only the whole chart
+        update can be skipped. Netdata interpolates skipped updates only if less than
+        'gap when lost iterations above' updates in a row were lost, that is why every Nth update is sent anyway.
+        :return: <bool>
+        """
+        return bool(
+            self.refresh_every
+            and self.flags.updated
+            and not self.flags.push
+            and self.skipped + 1 < self.refresh_every
+            and self.last_sent == (updated_dimensions, updated_variables)
+        )
+
     def obsolete(self):
         self.flags.obsoleted = True
         if self.flags.created:
-            safe_print(CHART_OBSOLETE.format(**self.params))
+            self.protocol.write(CHART_OBSOLETE.format(**self.params))
 
     def refresh(self):
         self.penalty = 0
+        self.last_sent = None
         self.flags.push = True
         self.flags.obsoleted = False
 
@@ -399,6 +493,45 @@ class ChartVariable:
             return None
 
 
+def get_int(data, key):
+    try:
+        return int(data[key])
+    except (KeyError, TypeError):
+        return None
+
+
+def render_set(items, data):
+    """
+    :param items: <list> of (key, pre-rendered line prefix) pairs
+    :param data: <dict>
+    :return: <str>
+    """
+    lines = list()
+    for key, prefix in items:
+        try:
+            lines.append(prefix + str(int(data[key])) + '\n')
+        except (KeyError, TypeError):
+            continue
+    return ''.join(lines)
+
+
+class UpdatePlan:
+    """Pre-rendered parts of the chart update, per update cost is one pass over the dimensions data keys"""
+    def __init__(self, chart):
+        """
+        :param chart: <Chart>
+        """
+        self.begin = CHART_BEGIN_PREFIX.format(type=chart.type, id=chart.id)
+        self.dimensions = [(dim.id, DIMENSION_SET_PREFIX.format(id=dim.id)) for dim in chart.dimensions]
+        self.variables = [(var.id, CHART_VARIABLE_SET_PREFIX.format(id=var.id)) for var in chart.variables]
+
+    def render_dimensions(self, data):
+        return render_set(self.dimensions, data)
+
+    def render_variables(self, data):
+        return render_set(self.variables, data)
+
+
 class ChartFlags:
     def __init__(self):
         self.push = True
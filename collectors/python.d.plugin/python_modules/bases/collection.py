@@ -4,6 +4,8 @@
 # SPDX-License-Identifier: GPL-3.0-or-later
 
 import os
+import sys
+import threading
 
 PATH = os.getenv('PATH', '/usr/local/sbin:/usr/local/bin:/usr/sbin:/usr/bin:/sbin:/bin').split(':')
 
@@ -52,13 +54,80 @@ def static_vars(**kwargs):
     return decorate
 
 
+class ProtocolWriter:
+    """
+    Writes netdata plugin protocol messages to stdout.
+
+    Every message is written and flushed as a whole under a lock, so messages of different jobs never interleave.
+    """
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.bytes = 0
+        self.flushes = 0
+
+    def write(self, data):
+        with self.lock:
+            sys.stdout.write(data)
+            sys.stdout.flush()
+            self.bytes += len(data)
+            self.flushes += 1
+
+
+PROTOCOL_WRITER = ProtocolWriter()
+
+
 @on_try_except_finally(on_except=(exit, 1))
+def safe_write(data, writer=PROTOCOL_WRITER):
+    """
+    :param data: <str>
+    :param writer: <ProtocolWriter>
+    :return:
+    """
+    writer.write(data)
+
+
 def safe_print(*msg):
     """
     :param msg:
     :return:
     """
-    print(''.join(msg))
+    safe_write(''.join(msg) + '\n')
+
+
+class ProtocolBuffer:
+    """
+    Collects netdata plugin protocol messages of a job, flush() sends all of them with one write.
+
+    Every job has its own buffer, it is not shared between threads.
+    """
+    def __init__(self, writer=PROTOCOL_WRITER):
+        self.writer = writer
+        self.chunks = list()
+        self.bytes = 0
+        self.flushes = 0
+        # not sent in the changes only mode
+        self.saved = 0
+
+    def __len__(self):
+        return len(self.chunks)
+
+    def write(self, *msg):
+        """
+        Same as safe_print(), but the message is sent on flush().
+        :param msg:
+        :return:
+        """
+        self.chunks.extend(msg)
+        self.chunks.append('\n')
+
+    def flush(self):
+        if not self.chunks:
+            return
+        data = ''.join(self.chunks)
+        del self.chunks[:]
+        self.bytes += len(data)
+        self.flushes += 1
+        safe_write(data, self.writer)
 
 
 def find_binary(binary):
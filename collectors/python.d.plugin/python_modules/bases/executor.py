@@ -0,0 +1,225 @@
+# -*- coding: utf-8 -*-
+# Description:
+# SPDX-License-Identifier: GPL-3.0-or-later
+
+import os
+import threading
+import time
+
+from collections import deque
+
+try:
+    from queue import Queue
+except ImportError:
+    from Queue import Queue
+
+from third_party.monotonic import monotonic
+
+from bases.collection import safe_print
+from bases.loggers import PythonDLogger
+from bases.profiler import tag_thread, thread_tag, untag_thread
+
+DEFAULT_WORKERS = 8
+
+EXECUTOR_CHARTS_CREATE = "CHART netdata.pythond_executor_tasks{suffix} '' 'Shared executor tasks' 'tasks' " \
+                         "'python.d' netdata.pythond_executor_tasks line 144002 1\n" \
+                         "DIMENSION queued '' absolute 1 1\n" \
+                         "DIMENSION busy '' absolute 1 1\n" \
+                         "DIMENSION expired '' incremental 1 1\n" \
+                         "CHART netdata.pythond_executor_saturation{suffix} '' 'Shared executor saturation' " \
+                         "'percentage' 'python.d' netdata.pythond_executor_saturation line 144003 1\n" \
+                         "DIMENSION saturation '' absolute 1 1\n"
+
+EXECUTOR_CHARTS_UPDATE = "BEGIN netdata.pythond_executor_tasks{suffix}\n" \
+                         "SET queued = {queued}\n" \
+                         "SET busy = {busy}\n" \
+                         "SET expired = {expired}\n" \
+                         "END\n" \
+                         "BEGIN netdata.pythond_executor_saturation{suffix}\n" \
+                         "SET saturation = {saturation}\n" \
+                         "END\n"
+
+
+class Batch:
+    """
+    Calls of one job, at most 'limit' of them are queued or running at once.
+
+    Calls that are not started before the deadline are skipped.
+    """
+    def __init__(self, executor, calls, limit, deadline):
+        self.executor = executor
+        self.deadline = deadline
+        # calls are profiled as the job ones
+        self.tag = thread_tag()
+        self.pending = deque(enumerate(calls))
+        self.results = [None] * len(calls)
+        self.errors = dict()
+        self.expired = 0
+        self.left = len(calls)
+        self.cond = threading.Condition()
+        for _ in range(min(max(int(limit), 1), len(calls))):
+            self.submit_next()
+
+    def submit_next(self):
+        with self.cond:
+            if not self.pending:
+                return
+            index, call = self.pending.popleft()
+        self.executor.submit(self, index, call)
+
+    def run(self, index, call):
+        if monotonic() > self.deadline:
+            self.done(expired=True)
+            return False
+        try:
+            func, args = call
+            self.results[index] = func(*args)
+        except Exception as error:
+            self.errors[index] = error
+        self.done()
+        return True
+
+    def done(self, expired=False):
+        with self.cond:
+            self.left -= 1
+            self.expired += expired
+            self.cond.notify()
+        self.submit_next()
+
+    def wait(self):
+        """
+        :return: <bool> True if all the calls are done before the deadline
+        """
+        with self.cond:
+            while self.left:
+                timeout = self.deadline - monotonic()
+                if timeout <= 0:
+                    # not started calls are dropped, running calls finish in the background
+                    dropped = len(self.pending)
+                    self.pending.clear()
+                    self.left -= dropped
+                    self.expired += dropped
+                    self.executor.add_expired(dropped)
+                    return False
+                self.cond.wait(timeout)
+        return True
+
+
+class ExecutorWorker(threading.Thread):
+    def __init__(self, executor):
+        threading.Thread.__init__(self)
+        self.daemon = True
+        self.executor = executor
+
+    def run(self):
+        executor = self.executor
+        while True:
+            batch, index, call = executor.tasks.get()
+            with executor.lock:
+                executor.busy += 1
+            begin = monotonic()
+            started = False
+            if batch.tag:
+                tag_thread(batch.tag)
+            try:
+                started = batch.run(index, call)
+            finally:
+                untag_thread()
+                with executor.lock:
+                    executor.busy -= 1
+                    executor.busy_time += monotonic() - begin
+                    executor.expired += not started
+
+
+class Executor:
+    """
+    Bounded pool of worker threads shared by all the jobs of a plugin process, used for concurrent sub-requests.
+
+    Workers are started on demand, up to 'workers', and are never stopped. Jobs submit their calls as a Batch,
+    batches limit the job concurrency and drop the calls not started before the job deadline.
+
+    Executor charts are reported only by the process that configured the executor, i.e. the one that runs the jobs.
+    """
+    def __init__(self, workers=DEFAULT_WORKERS, name=''):
+        self.log = PythonDLogger()
+        self.max_workers = workers
+        self.name = name
+        self.lock = threading.Lock()
+        self.report_pid = None
+        self.pid = None
+        self.tasks = None
+        self.workers = None
+        self.busy = 0
+        self.busy_time = 0
+        self.expired = 0
+
+    def configure(self, workers, name=''):
+        self.max_workers = workers
+        self.name = name
+        self.report_pid = os.getpid()
+
+    def setup(self):
+        # threads do not survive fork, a child process starts from scratch
+        if self.pid == os.getpid():
+            return
+        self.pid = os.getpid()
+        self.tasks = Queue()
+        self.workers = list()
+        self.busy = 0
+        self.busy_time = 0
+        self.expired = 0
+        self.log.job_name = '_'.join(filter(None, ['executor', self.name]))
+        if self.report_pid == self.pid:
+            reporter = threading.Thread(target=self.report)
+            reporter.daemon = True
+            reporter.start()
+
+    def submit(self, batch, index, call):
+        with self.lock:
+            self.setup()
+            idle = len(self.workers) - self.busy - self.tasks.qsize()
+            if idle <= 0 and len(self.workers) < max(int(self.max_workers), 1):
+                worker = ExecutorWorker(self)
+                worker.start()
+                self.workers.append(worker)
+                self.log.debug('started worker {0}'.format(len(self.workers)))
+            self.tasks.put((batch, index, call))
+
+    def add_expired(self, num):
+        with self.lock:
+            self.expired += num
+
+    def run(self, calls, limit, timeout):
+        """
+        :param calls: <list> of (<callable>, <tuple> args)
+        :param limit: <int> max number of the calls queued or running at once
+        :param timeout: <float> seconds
+        :return: <Batch>
+        """
+        batch = Batch(self, calls, limit, monotonic() + timeout)
+        batch.wait()
+        return batch
+
+    def report(self):
+        suffix = '_' + self.name if self.name else ''
+        safe_print(EXECUTOR_CHARTS_CREATE.format(suffix=suffix))
+        prev_time, prev_busy_time = monotonic(), 0
+
+        while True:
+            time.sleep(1)
+            now = monotonic()
+            with self.lock:
+                busy, busy_time, expired = self.busy, self.busy_time, self.expired
+            # share of the workers capacity spent running calls since the last report
+            saturation = (busy_time - prev_busy_time) / ((now - prev_time) * max(int(self.max_workers), 1))
+            prev_time, prev_busy_time = now, busy_time
+            safe_print(EXECUTOR_CHARTS_UPDATE.format(
+                suffix=suffix,
+                queued=self.tasks.qsize(),
+                busy=busy,
+                expired=expired,
+                saturation=min(int(saturation * 100), 100),
+            ))
+
+
+EXECUTOR = Executor()
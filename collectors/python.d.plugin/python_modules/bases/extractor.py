@@ -0,0 +1,416 @@
+# -*- coding: utf-8 -*-
+# Description:
+# SPDX-License-Identifier: GPL-3.0-or-later
+
+import re
+
+from codecs import getincrementaldecoder
+from json import JSONDecoder
+from json.decoder import scanstring
+
+WILDCARD = '*'
+
+WHITESPACE = re.compile(r'[ \t\n\r]*')
+# everything up to the next bracket, brackets in strings included
+SKIP = re.compile(r'(?:[^"{}\[\]]+|"[^"\\]*(?:\\.[^"\\]*)*")*')
+SCALAR = re.compile(r'[^ \t\n\r,:\]}]*')
+# an object in the buffer with fewer bytes per wanted path is decoded at once, the wanted values are tokenized otherwise
+DECODE_BYTES_PER_PATH = 256
+# an object key without escapes and the colon after it
+KEY = re.compile(r'[ \t\n\r]*"([^"\\]*)"[ \t\n\r]*:')
+# an object member with a string or a scalar value and the comma after it, the key is filled in
+# with a negative lookahead of the wanted keys. Keys with escapes are not matched, they are compared decoded.
+MEMBER = r'[ \t\n\r]*"{0}[^"\\]*"[ \t\n\r]*:[ \t\n\r]*(?:"[^"\\]*(?:\\.[^"\\]*)*"|[^ \t\n\r,:\[\]{{}}"]+)[ \t\n\r]*,'
+
+DECODER = JSONDecoder()
+MISSING = object()
+
+
+class PathNode:
+    __slots__ = ('children', 'wildcard', 'leaf', 'key', 'static', 'skip', 'paths')
+
+    def __init__(self):
+        self.children = dict()
+        self.wildcard = None
+        self.leaf = False
+        self.key = None
+        # no wildcard in the subtree, result keys are precomputed
+        self.static = True
+        # streaming only, regex of the members that are not wanted (see MEMBER)
+        self.skip = None
+        # streaming only, number of the paths in the subtree, None if it has a wildcard
+        self.paths = None
+
+
+class MetricExtractor:
+    """
+    Extracts values of metric paths (Ex. 'indices.search.query_total') from a decoded JSON document.
+
+    Paths are compiled once into a tree, all the values are taken in one traversal of the document.
+    A '*' path element matches every key of a dict (Ex. 'nodes.*.fd_used'), the matched key takes its place
+    in the result key. Missing paths are skipped.
+    """
+    def __init__(self, paths, sep='.', key_sep='_'):
+        """
+        :param paths: <list> of <str>
+        :param sep: <str> path elements separator
+        :param key_sep: <str> result key elements separator
+        """
+        self.key_sep = key_sep
+        self.root = PathNode()
+        # the tree the streamed documents are selected with, built on the first load
+        self.stream_root = None
+        for path in paths:
+            self.add(path.split(sep))
+
+    def add(self, parts):
+        self.stream_root = None
+        node = self.root
+        wildcard = WILDCARD in parts
+        for part in parts:
+            node.static = node.static and not wildcard
+            if part == WILDCARD:
+                if node.wildcard is None:
+                    node.wildcard = PathNode()
+                node = node.wildcard
+            else:
+                node = node.children.setdefault(part, PathNode())
+        node.leaf = True
+        node.static = node.static and not wildcard
+        if not wildcard:
+            node.key = self.key_sep.join(parts)
+
+    def load(self, chunks):
+        """
+        Decodes only the subtrees of the metric paths, the rest of the document is skipped without decoding.
+        The returned document can be passed to 'extract' and 'items'.
+
+        :param chunks: iterable of <bytes> or <str>, JSON text
+        :return: decoded document, None if it is not a JSON object
+        """
+        if self.stream_root is None:
+            self.stream_root = stream_tree(self.root)
+        stream = JSONStream(chunks)
+        document = stream.select(self.stream_root)
+        if not stream.at_end():
+            raise ValueError('extra data after the JSON document')
+        return None if document is MISSING else document
+
+    def items(self, document):
+        """
+        :param document: decoded JSON document
+        :return: <list> of (<tuple> path elements, value)
+        """
+        found = list()
+        walk(self.root, document, list(), found)
+        return found
+
+    def extract(self, document):
+        """
+        :param document: decoded JSON document
+        :return: <dict> result key: value
+        """
+        data = dict()
+        walk_data(self.root, document, list(), data, self.key_sep)
+        return data
+
+
+def union(a, b):
+    if a is None:
+        return b
+    if b is None:
+        return a
+    node = PathNode()
+    node.leaf = a.leaf or b.leaf
+    for name in set(a.children) | set(b.children):
+        node.children[name] = union(a.children.get(name), b.children.get(name))
+    node.wildcard = union(a.wildcard, b.wildcard)
+    return node
+
+
+def stream_tree(node):
+    # a streamed key is selected with one node, a key with its own path also takes the paths of the wildcard
+    # (Ex. 'nodes.*.fd' and 'nodes.local.jvm': 'nodes.local' selects both 'fd' and 'jvm')
+    result = PathNode()
+    result.leaf = node.leaf
+    if node.wildcard is not None:
+        result.wildcard = stream_tree(node.wildcard)
+    for name, child in node.children.items():
+        result.children[name] = stream_tree(union(child, node.wildcard))
+    if result.leaf:
+        # the value is decoded whole
+        result.paths = 1
+    elif result.wildcard is None:
+        # the members with scalar values of the other keys are skipped in one match, not one by one
+        wanted = '(?!(?:{0})")'.format('|'.join(re.escape(name) for name in result.children))
+        result.skip = re.compile('(?:{0})*'.format(MEMBER.format(wanted)))
+        counts = [child.paths for child in result.children.values()]
+        if None not in counts:
+            result.paths = sum(counts)
+    return result
+
+
+def prune(node, value):
+    """
+    :return: the decoded value with only the node paths subtrees, MISSING if it has none of them (see JSONStream.select)
+    """
+    if node.leaf:
+        return value
+    if not isinstance(value, dict):
+        return MISSING
+    result = dict()
+    if node.wildcard is None:
+        for name, child in node.children.items():
+            if name in value:
+                child_value = prune(child, value[name])
+                if child_value is not MISSING:
+                    result[name] = child_value
+        return result
+    for name, child_value in value.items():
+        child_value = prune(node.children.get(name, node.wildcard), child_value)
+        if child_value is not MISSING:
+            result[name] = child_value
+    return result
+
+
+def walk(node, value, parts, found):
+    if node.leaf:
+        found.append((tuple(parts), value))
+
+    for name, child in node.children.items():
+        try:
+            child_value = value[name]
+        except (KeyError, IndexError, TypeError):
+            continue
+        parts.append(name)
+        walk(child, child_value, parts, found)
+        parts.pop()
+
+    if node.wildcard is not None and isinstance(value, dict):
+        for name, child_value in value.items():
+            parts.append(name)
+            walk(node.wildcard, child_value, parts, found)
+            parts.pop()
+
+
+def walk_data(node, value, parts, data, key_sep):
+    if node.static:
+        if node.leaf:
+            data[node.key] = value
+        walk_static(node, value, data)
+        return
+
+    if node.leaf:
+        data[key_sep.join(parts)] = value
+
+    for name, child in node.children.items():
+        try:
+            child_value = value[name]
+        except (KeyError, IndexError, TypeError):
+            continue
+        parts.append(name)
+        walk_data(child, child_value, parts, data, key_sep)
+        parts.pop()
+
+    if node.wildcard is not None and isinstance(value, dict):
+        for name, child_value in value.items():
+            parts.append(name)
+            walk_data(node.wildcard, child_value, parts, data, key_sep)
+            parts.pop()
+
+
+def walk_static(node, value, data):
+    # no wildcard below, result keys are precomputed
+    for name, child in node.children.items():
+        try:
+            child_value = value[name]
+        except (KeyError, IndexError, TypeError):
+            continue
+        if child.leaf:
+            data[child.key] = child_value
+        if child.children:
+            walk_static(child, child_value, data)
+
+
+class JSONStream:
+    """
+    Pull parser of JSON text chunks.
+
+    Only the last chunk and the value being decoded are kept in memory, skipped values are scanned, not decoded.
+    """
+    def __init__(self, chunks):
+        self.chunks = iter(chunks)
+        self.decoder = getincrementaldecoder('utf-8')()
+        self.buf = ''
+        self.pos = 0
+        # start of the value being decoded, kept on fill
+        self.mark = None
+        # <list> of <str> parts of the value being decoded that were before the current buffer
+        self.marked = list()
+
+    def fill(self):
+        for chunk in self.chunks:
+            if isinstance(chunk, bytes):
+                chunk = self.decoder.decode(chunk)
+            if not chunk:
+                continue
+            if self.mark is not None:
+                # joined once when the value is decoded, the buffer is not copied on every chunk
+                self.marked.append(self.buf[self.mark:self.pos])
+                self.mark = 0
+            self.buf = self.buf[self.pos:] + chunk
+            self.pos = 0
+            return True
+        return False
+
+    def at_end(self):
+        while True:
+            self.pos = WHITESPACE.match(self.buf, self.pos).end()
+            if self.pos < len(self.buf):
+                return False
+            if not self.fill():
+                return True
+
+    def peek(self):
+        pos = self.pos
+        if pos < len(self.buf) and self.buf[pos] not in ' \t\n\r':
+            return self.buf[pos]
+        if self.at_end():
+            raise ValueError('unexpected end of the JSON document')
+        return self.buf[self.pos]
+
+    def expect(self, chars):
+        c = self.peek()
+        if c not in chars:
+            raise ValueError('expecting one of {0!r}, got {1!r}'.format(chars, c))
+        self.pos += 1
+        return c
+
+    def string(self):
+        if self.peek() != '"':
+            raise ValueError('expecting a string, got {0!r}'.format(self.buf[self.pos]))
+        while True:
+            try:
+                value, end = scanstring(self.buf, self.pos + 1)
+            except ValueError:
+                # unterminated, the rest of the string is in the next chunks
+                if not self.fill():
+                    raise
+                continue
+            self.pos = end
+            return value
+
+    def scalar(self):
+        while True:
+            end = SCALAR.match(self.buf, self.pos).end()
+            if end < len(self.buf) or not self.fill():
+                break
+        token = self.buf[self.pos:end]
+        if not token:
+            raise ValueError('expecting a value, got {0!r}'.format(self.buf[self.pos]))
+        self.pos = end
+        return token
+
+    def skip(self):
+        c = self.peek()
+        if c == '"':
+            self.string()
+            return
+        if c not in '{[':
+            self.scalar()
+            return
+        depth = 0
+        while True:
+            self.pos = SKIP.match(self.buf, self.pos).end()
+            if self.pos == len(self.buf) or self.buf[self.pos] == '"':
+                # the rest (of the string) is in the next chunks
+                if not self.fill():
+                    raise ValueError('unexpected end of the JSON document')
+                continue
+            depth += 1 if self.buf[self.pos] in '{[' else -1
+            self.pos += 1
+            if not depth:
+                return
+
+    def scan(self, limit=None):
+        """
+        :param limit: <int> max length
+        :return: end of the object or the array, None if it does not end in the buffer (or within the limit)
+        """
+        buf, pos = self.buf, self.pos
+        endpos = len(buf) if limit is None else min(len(buf), pos + limit)
+        depth = 0
+        while True:
+            pos = SKIP.match(buf, pos, endpos).end()
+            if pos == endpos or buf[pos] == '"':
+                return None
+            depth += 1 if buf[pos] in '{[' else -1
+            pos += 1
+            if not depth:
+                return pos
+
+    def value(self):
+        c = self.peek()
+        if c == '"':
+            return self.string()
+        if c not in '{[':
+            token = self.scalar()
+            try:
+                value, end = DECODER.scan_once(token, 0)
+            except StopIteration:
+                end = None
+            if end != len(token):
+                raise ValueError('expecting a value, got {0!r}'.format(token))
+            return value
+        # find the end first, the value is decoded once
+        self.mark = self.pos
+        try:
+            self.skip()
+            self.marked.append(self.buf[self.mark:self.pos])
+            text = ''.join(self.marked)
+        finally:
+            self.mark = None
+            self.marked = list()
+        return DECODER.decode(text)
+
+    def select(self, node):
+        """
+        :param node: <PathNode>
+        :return: the value with only the node paths subtrees, MISSING if it has none of them
+        """
+        if node.leaf:
+            return self.value()
+        if self.peek() != '{':
+            self.skip()
+            return MISSING
+        limit = None if node.paths is None else DECODE_BYTES_PER_PATH * node.paths
+        if self.scan(limit) is not None:
+            # mostly wanted, decoded by the stdlib decoder at once and only the node paths are kept
+            value, self.pos = DECODER.raw_decode(self.buf, self.pos)
+            return prune(node, value)
+        self.pos += 1
+        result = dict()
+        if self.peek() == '}':
+            self.pos += 1
+            return result
+        skip = node.skip
+        while True:
+            if skip is not None:
+                self.pos = skip.match(self.buf, self.pos).end()
+            match = KEY.match(self.buf, self.pos)
+            if match:
+                key = match.group(1)
+                self.pos = match.end()
+            else:
+                # escapes or the end of the chunk
+                key = self.string()
+                self.expect(':')
+            child = node.children.get(key, node.wildcard)
+            if child is None:
+                self.skip()
+            else:
+                value = self.select(child)
+                if value is not MISSING:
+                    result[key] = value
+            if self.expect(',}') == '}':
+                return result
@@ -0,0 +1,381 @@
+# -*- coding: utf-8 -*-
+# Description:
+# SPDX-License-Identifier: GPL-3.0-or-later
+
+import base64
+import json
+import os
+import sys
+import tempfile
+
+from collections import defaultdict, deque
+from glob import glob
+from io import BytesIO
+
+import bases.collection
+from bases.forkserver import Completed
+
+FIXTURE_VERSION = 1
+
+# framework service class name: fixture kind
+KINDS = (
+    ('UrlService', 'url'),
+    ('SocketService', 'socket'),
+    ('ExecutableService', 'executable'),
+    ('LogService', 'log'),
+)
+
+
+class FixtureError(Exception):
+    pass
+
+
+def service_kind(service_cls):
+    """
+    :param service_cls: module Service class
+    :return: <str> fixture kind, None if the framework service is not supported
+    """
+    names = [cls.__name__ for cls in service_cls.__mro__]
+    for name, kind in KINDS:
+        if name in names:
+            return kind
+    return None
+
+
+def encode(data):
+    return base64.b64encode(data).decode('ascii')
+
+
+def decode(data):
+    return base64.b64decode(data)
+
+
+def command_key(command):
+    # binaries are found in different directories on different hosts
+    command = list(command)
+    return ' '.join([os.path.basename(command[0])] + command[1:])
+
+
+def executable_module():
+    return sys.modules.get('bases.FrameworkServices.ExecutableService')
+
+
+def replay_find_binary():
+    """
+    Makes find_binary() find binaries that are not installed, commands are replayed and never executed.
+    Must be called before loading the modules.
+    """
+    find_binary = bases.collection.find_binary
+
+    def replay(binary):
+        return find_binary(binary) or os.path.join('/usr/bin', binary)
+
+    bases.collection.find_binary = replay
+    module = executable_module()
+    if module is not None:
+        module.find_binary = replay
+
+
+class Fixture:
+    """
+    Recorded I/O of one job, read and written as JSON.
+
+    Records of the fixture kinds:
+      - url: {"url": <str>, "status": <int>, "body": <base64>}, one per http request
+      - socket: {"request": <base64>, "response": [<base64>, ...]}, one per request, response chunks as received
+      - executable: {"command": <str>, "returncode": <int>, "stdout": <base64>, "stderr": <base64>}, one per command
+      - log: {"lines": [<str>, ...]}, lines read on every update, 'head' is the last line of the log before them
+    """
+    def __init__(self, kind, records=None, head=None):
+        self.kind = kind
+        self.records = records or list()
+        self.head = head or list()
+
+    @classmethod
+    def load(cls, path):
+        with open(path) as fp:
+            raw = json.load(fp)
+        if raw.get('version') != FIXTURE_VERSION:
+            raise FixtureError('unsupported fixture version {0}, expected {1}'.format(
+                raw.get('version'), FIXTURE_VERSION))
+        return cls(raw['kind'], raw['records'], raw.get('head'))
+
+    def save(self, path):
+        directory = os.path.dirname(path)
+        if directory and not os.path.isdir(directory):
+            os.makedirs(directory)
+        with open(path, 'w') as fp:
+            json.dump(dict(version=FIXTURE_VERSION, kind=self.kind, records=self.records, head=self.head), fp, indent=1)
+
+
+class Recorder:
+    """
+    Records the I/O of a job while it runs against the live service.
+    """
+    def __init__(self, kind):
+        self.fixture = Fixture(kind)
+        self.service = None
+        self.execute = None
+
+    def attach(self, service):
+        """
+        :param service: initialized job, not checked yet
+        """
+        self.service = service
+        getattr(self, 'attach_' + self.fixture.kind)(service)
+
+    def detach(self):
+        if self.execute is not None:
+            executable_module().execute = self.execute
+            self.execute = None
+
+    def save(self, path):
+        self.fixture.save(path)
+
+    def attach_url(self, service):
+        request = service._request
+
+        def recording(url, manager, retries, redirect, preload_content=True, **kwargs):
+            response = request(url, manager, retries, redirect, **kwargs)
+            body = response.data or b''
+            if not isinstance(body, bytes):
+                body = body.encode()
+            self.fixture.records.append(dict(url=url or service.url, status=response.status, body=encode(body)))
+            return http_response(response.status, body, preload_content)
+
+        service._request = recording
+
+    def attach_socket(self, service):
+        connect = service._connect
+
+        def recording():
+            connect()
+            if service._sock is not None:
+                service._sock = RecordingSocket(service._sock, self.fixture.records)
+
+        service._connect = recording
+
+    def attach_executable(self, service):
+        # the records of a long running command are not recorded, the command is run on every update
+        service.streaming = False
+        module = executable_module()
+        self.execute = execute = module.execute
+        records = self.fixture.records
+
+        def recording(command, **kwargs):
+            result = execute(command, **kwargs)
+            records.append(dict(
+                command=command_key(command),
+                returncode=result.returncode,
+                stdout=encode(result.stdout),
+                stderr=encode(result.stderr),
+            ))
+            return result
+
+        module.execute = recording
+
+    def attach_log(self, service):
+        paths = glob(service.log_path or '')
+        if paths:
+            try:
+                self.fixture.head = [bases.collection.read_last_line(max(paths))]
+            except (OSError, IOError):
+                pass
+
+        get_raw_data = service._get_raw_data
+
+        def recording():
+            lines = get_raw_data()
+            self.fixture.records.append(dict(lines=lines or list()))
+            return lines
+
+        service._get_raw_data = recording
+
+
+class Replayer:
+    """
+    Replays a fixture, the job runs with no live service.
+
+    Records of the same request (url, socket request, command) are replayed in the recorded order and then again
+    from the first one, log lines are appended to a temporary log file before every update.
+    """
+    def __init__(self, fixture):
+        self.fixture = fixture
+        self.replies = defaultdict(deque)
+        self.execute = None
+        self.log_path = None
+        self.log_chunks = deque()
+        self.index()
+
+    def index(self):
+        kind = self.fixture.kind
+        for record in self.fixture.records:
+            if kind == 'url':
+                self.replies[record['url']].append((record['status'], decode(record['body'])))
+            elif kind == 'socket':
+                self.replies[decode(record['request'])].append([decode(chunk) for chunk in record['response']])
+            elif kind == 'executable':
+                self.replies[record['command']].append(
+                    (record['returncode'], decode(record['stdout']), decode(record['stderr'])))
+            elif kind == 'log':
+                self.log_chunks.append(''.join(record['lines']))
+
+    def reply(self, key, default):
+        replies = self.replies.get(key)
+        if not replies:
+            return default
+        reply = replies.popleft()
+        replies.append(reply)
+        return reply
+
+    def prepare(self, config):
+        """
+        :param config: job configuration, before the job init
+        """
+        if self.fixture.kind != 'log':
+            return
+        fd, self.log_path = tempfile.mkstemp(prefix='python.d.bench.', suffix='.log')
+        with os.fdopen(fd, 'w') as fp:
+            fp.write(''.join(self.fixture.head))
+        config['path'] = self.log_path
+
+    def attach(self, service):
+        """
+        :param service: initialized job, not checked yet
+        """
+        kind = self.fixture.kind
+        if kind == 'url':
+            service._request = self.http_request(service)
+        elif kind == 'socket':
+            service._connect = self.socket_connect(service)
+        elif kind == 'executable':
+            service.streaming = False
+            module = executable_module()
+            self.execute = module.execute
+            module.execute = self.replay_command
+        elif kind == 'log':
+            service.log_path = self.log_path
+
+    def detach(self):
+        if self.execute is not None:
+            executable_module().execute = self.execute
+            self.execute = None
+        if self.log_path is not None:
+            os.remove(self.log_path)
+            self.log_path = None
+
+    def before_update(self):
+        if not (self.log_path and self.log_chunks):
+            return
+        chunk = self.log_chunks.popleft()
+        self.log_chunks.append(chunk)
+        with open(self.log_path, 'a') as fp:
+            fp.write(chunk)
+
+    def http_request(self, service):
+        def replay(url, manager, retries, redirect, preload_content=True, **kwargs):
+            status, body = self.reply(url or service.url, (404, b''))
+            return http_response(status, body, preload_content)
+        return replay
+
+    def socket_connect(self, service):
+        def replay():
+            service._sock = ReplaySocket(self)
+        return replay
+
+    def replay_command(self, command, **kwargs):
+        returncode, stdout, stderr = self.reply(command_key(command), (127, b'', b''))
+        return Completed(returncode, stdout, stderr, False, False)
+
+
+def http_response(status, body, preload_content):
+    from urllib3.response import HTTPResponse
+    return HTTPResponse(body=BytesIO(body), status=status, preload_content=preload_content)
+
+
+class RecordingSocket:
+    def __init__(self, sock, records):
+        self.sock = sock
+        self.records = records
+        self.record = None
+
+    def __getattr__(self, name):
+        return getattr(self.sock, name)
+
+    def send(self, data, *args):
+        self.record = dict(request=encode(data), response=list())
+        self.records.append(self.record)
+        return self.sock.send(data, *args)
+
+    def sendall(self, data, *args):
+        self.record = dict(request=encode(data), response=list())
+        self.records.append(self.record)
+        return self.sock.sendall(data, *args)
+
+    def received(self, data):
+        if self.record is None:
+            # nothing was sent, the service talks first
+            self.record = dict(request=encode(b''), response=list())
+            self.records.append(self.record)
+        if data:
+            self.record['response'].append(encode(data))
+
+    def recv_into(self, buf, *args):
+        size = self.sock.recv_into(buf, *args)
+        self.received(bytes(buf[:size]))
+        return size
+
+    def recv(self, *args):
+        data = self.sock.recv(*args)
+        self.received(data)
+        return data
+
+
+class ReplaySocket:
+    def __init__(self, replayer):
+        self.replayer = replayer
+        self.chunks = None
+        self.timeout = None
+
+    def send(self, data, *args):
+        self.chunks = deque(self.replayer.reply(data, list()))
+        return len(data)
+
+    def sendall(self, data, *args):
+        self.send(data)
+
+    def next_chunk(self, size):
+        if self.chunks is None:
+            self.chunks = deque(self.replayer.reply(b'', list()))
+        if not self.chunks:
+            # the response is over, the service closes the connection
+            self.chunks = None
+            return b''
+        chunk = self.chunks.popleft()
+        if size and len(chunk) > size:
+            self.chunks.appendleft(chunk[size:])
+            chunk = chunk[:size]
+        return chunk
+
+    def recv_into(self, buf, nbytes=0, *args):
+        chunk = self.next_chunk(nbytes or len(buf))
+        buf[:len(chunk)] = chunk
+        return len(chunk)
+
+    def recv(self, size, *args):
+        return self.next_chunk(size)
+
+    def settimeout(self, timeout):
+        self.timeout = timeout
+
+    def gettimeout(self):
+        return self.timeout
+
+    def setblocking(self, flag):
+        pass
+
+    def shutdown(self, how):
+        pass
+
+    def close(self):
+        pass
@@ -0,0 +1,495 @@
+# -*- coding: utf-8 -*-
+# Description:
+# SPDX-License-Identifier: GPL-3.0-or-later
+
+import errno
+import fcntl
+import os
+import pickle
+import select
+import shutil
+import signal
+import socket
+import struct
+import tempfile
+import threading
+
+from collections import namedtuple
+from subprocess import Popen, PIPE
+
+from third_party.monotonic import monotonic
+
+from bases.loggers import PythonDLogger
+
+DEFAULT_OUTPUT_LIMIT = 16 << 20
+# the forkserver replies after the command timeout, the client waits a bit longer
+CLIENT_GRACE = 5
+LISTEN_BACKLOG = 64
+READ_SIZE = 65536
+
+HEADER = struct.Struct('!I')
+
+Completed = namedtuple('Completed', ['returncode', 'stdout', 'stderr', 'timed_out', 'truncated'])
+
+
+class ForkServerError(Exception):
+    pass
+
+
+def set_cloexec(fd):
+    fcntl.fcntl(fd, fcntl.F_SETFD, fcntl.fcntl(fd, fcntl.F_GETFD) | fcntl.FD_CLOEXEC)
+
+
+def send_message(sock, message):
+    data = pickle.dumps(message, 2)
+    sock.sendall(HEADER.pack(len(data)) + data)
+
+
+def recv_exactly(sock, size):
+    chunks = list()
+    while size:
+        chunk = sock.recv(min(size, READ_SIZE))
+        if not chunk:
+            raise ForkServerError('connection closed')
+        chunks.append(chunk)
+        size -= len(chunk)
+    return b''.join(chunks)
+
+
+def recv_message(sock):
+    size = HEADER.unpack(recv_exactly(sock, HEADER.size))[0]
+    return pickle.loads(recv_exactly(sock, size))
+
+
+def run_command(command, input_data=None, timeout=None, limit=DEFAULT_OUTPUT_LIMIT, started=None, finished=None):
+    """
+    Runs a command, collects its output and reaps it. Output over the limit is read and discarded,
+    the command is killed after the timeout.
+
+    :param command: <list> command and arguments
+    :param input_data: <bytes> written to the command stdin, the stdin is inherited if None
+    :param timeout: <float> seconds, no timeout if None
+    :param limit: <int> max bytes collected of stdout and of stderr
+    :param started: <callable> called with the process after it is spawned
+    :param finished: <callable> called with the process after it is reaped
+    :return: <Completed>, returncode is None if the command timed out
+    """
+    process = Popen(command, stdin=PIPE if input_data is not None else None, stdout=PIPE, stderr=PIPE,
+                    close_fds=True)
+    if started:
+        started(process)
+
+    stdout, stderr = process.stdout.fileno(), process.stderr.fileno()
+    try:
+        outputs = {stdout: list(), stderr: list()}
+        sizes = dict.fromkeys(outputs, 0)
+        poller = select.poll()
+        for fd in outputs:
+            poller.register(fd, select.POLLIN)
+        if input_data:
+            poller.register(process.stdin.fileno(), select.POLLOUT)
+        elif process.stdin:
+            process.stdin.close()
+
+        deadline = monotonic() + timeout if timeout else None
+        opened = len(outputs) + (1 if input_data else 0)
+        timed_out = truncated = False
+
+        while opened:
+            wait = None
+            if deadline is not None:
+                wait = deadline - monotonic()
+                if wait <= 0:
+                    timed_out = True
+                    break
+                wait *= 1000
+            try:
+                events = poller.poll(wait)
+            except (IOError, OSError, select.error) as error:
+                if error.args[0] == errno.EINTR:
+                    continue
+                raise
+
+            for fd, event in events:
+                if fd not in outputs:
+                    try:
+                        written = os.write(fd, input_data[:READ_SIZE])
+                    except OSError as error:
+                        if error.errno != errno.EPIPE:
+                            raise
+                        # the command exited or closed its stdin
+                        written = len(input_data)
+                    input_data = input_data[written:]
+                    if not input_data:
+                        poller.unregister(fd)
+                        process.stdin.close()
+                        opened -= 1
+                    continue
+
+                data = os.read(fd, READ_SIZE)
+                if not data:
+                    poller.unregister(fd)
+                    opened -= 1
+                    continue
+                left = limit - sizes[fd]
+                if left > 0:
+                    outputs[fd].append(data[:left])
+                if len(data) > left:
+                    truncated = True
+                sizes[fd] += len(data)
+
+        if timed_out:
+            process.kill()
+        returncode = process.wait()
+    finally:
+        for pipe in (process.stdin, process.stdout, process.stderr):
+            if pipe:
+                pipe.close()
+        if finished:
+            finished(process)
+
+    return Completed(
+        None if timed_out else returncode,
+        b''.join(outputs[stdout]),
+        b''.join(outputs[stderr]),
+        timed_out,
+        truncated,
+    )
+
+
+class FollowedCommand:
+    """
+    Output of a long running command, read by the plugin process until the command exits.
+
+    The command runs in the forkserver and its stdout is relayed over the connection, or it runs in the calling
+    process if the forkserver is not running.
+    """
+    def __init__(self, sock=None, process=None):
+        self.sock = sock
+        self.process = process
+
+    def read(self, size=READ_SIZE):
+        """
+        :return: <bytes> the output, empty at the end of it
+        """
+        if self.sock is not None:
+            return self.sock.recv(size)
+        return os.read(self.process.stdout.fileno(), size)
+
+    def interrupt(self):
+        """
+        Stops the command, a blocked read returns. Can be called from another thread.
+        """
+        try:
+            if self.sock is not None:
+                self.sock.shutdown(socket.SHUT_RDWR)
+            elif self.process.poll() is None:
+                self.process.kill()
+        except (OSError, socket.error):
+            pass
+
+    def close(self):
+        if self.sock is not None:
+            # the forkserver kills the command when the connection is closed
+            self.sock.close()
+            return
+        if self.process.poll() is None:
+            self.process.kill()
+        self.process.wait()
+        self.process.stdout.close()
+
+
+class Server:
+    """
+    The forkserver process side: runs every requested command in a thread, until the plugin exits.
+    """
+    def __init__(self, listener, parent_fd):
+        self.listener = listener
+        self.parent_fd = parent_fd
+        self.lock = threading.Lock()
+        self.processes = set()
+
+    def serve(self):
+        poller = select.poll()
+        poller.register(self.listener.fileno(), select.POLLIN)
+        poller.register(self.parent_fd, select.POLLIN)
+        try:
+            while True:
+                try:
+                    events = poller.poll()
+                except (IOError, OSError, select.error) as error:
+                    if error.args[0] == errno.EINTR:
+                        continue
+                    raise
+                if any(fd == self.parent_fd for fd, _ in events):
+                    # the write end is closed when the plugin processes exit
+                    return
+                try:
+                    conn = self.listener.accept()[0]
+                except socket.error:
+                    continue
+                thread = threading.Thread(target=self.handle, args=(conn,))
+                thread.daemon = True
+                thread.start()
+        finally:
+            self.kill_all()
+
+    def handle(self, conn):
+        try:
+            request = recv_message(conn)
+            if request.get('follow'):
+                self.relay(conn, request['command'])
+                return
+            try:
+                reply = tuple(run_command(
+                    request['command'],
+                    request['input'],
+                    request['timeout'],
+                    request['limit'],
+                    started=self.started,
+                    finished=self.finished,
+                ))
+            except (OSError, IOError) as error:
+                reply = dict(errno=error.errno, error=error.strerror or str(error))
+            except Exception as error:
+                reply = dict(errno=None, error=str(error))
+            send_message(conn, reply)
+        except Exception:
+            # the client went away
+            pass
+        finally:
+            conn.close()
+
+    def relay(self, conn, command):
+        """
+        Runs a long running command, its stdout is passed to the connection until the command exits.
+        The command is killed when the client closes the connection.
+        """
+        try:
+            process = Popen(command, stdout=PIPE, close_fds=True)
+        except (OSError, IOError) as error:
+            send_message(conn, dict(errno=error.errno, error=error.strerror or str(error)))
+            return
+        self.started(process)
+        try:
+            send_message(conn, process.pid)
+            stdout = process.stdout.fileno()
+            poller = select.poll()
+            poller.register(stdout, select.POLLIN)
+            poller.register(conn.fileno(), select.POLLIN)
+            while True:
+                try:
+                    events = poller.poll()
+                except (IOError, OSError, select.error) as error:
+                    if error.args[0] == errno.EINTR:
+                        continue
+                    raise
+                if any(fd != stdout for fd, _ in events):
+                    # the client sends nothing, it closed the connection
+                    return
+                data = os.read(stdout, READ_SIZE)
+                if not data:
+                    return
+                conn.sendall(data)
+        finally:
+            if process.poll() is None:
+                process.kill()
+            process.wait()
+            process.stdout.close()
+            self.finished(process)
+
+    def started(self, process):
+        with self.lock:
+            self.processes.add(process)
+
+    def finished(self, process):
+        with self.lock:
+            self.processes.discard(process)
+
+    def kill_all(self):
+        with self.lock:
+            processes = list(self.processes)
+        for process in processes:
+            try:
+                process.kill()
+            except OSError:
+                pass
+
+
+class ForkServer:
+    """
+    Runs the commands of the jobs in a small helper process, the plugin process is not forked on every command
+    (long running commands included, the helper relays their output).
+
+    The helper is forked at the plugin start, before the modules are loaded and the threads are started, and keeps
+    the size of the interpreter at that moment. The helper listens on a unix socket in a private temporary directory,
+    every command is a connection: the threads and the child processes of the plugin (shards, checkers) use it
+    at the same time. The helper exits when all the plugin processes have exited.
+
+    If the helper is not running the command runs in the calling process.
+    """
+    def __init__(self):
+        self.log = PythonDLogger()
+        self.log.job_name = 'forkserver'
+        self.path = None
+        self.directory = None
+        self.pid = None
+        self.owner = None
+        self.parent_fd = None
+
+    def is_running(self):
+        return self.path is not None
+
+    def start(self):
+        """
+        Forks the helper process, must be called before any thread is started.
+
+        :return: <bool> True if the helper is running
+        """
+        if self.is_running() or not hasattr(socket, 'AF_UNIX') or not hasattr(select, 'poll'):
+            return self.is_running()
+
+        directory = tempfile.mkdtemp(prefix='python.d.forkserver.')
+        path = os.path.join(directory, 'socket')
+        try:
+            listener = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+            listener.bind(path)
+            listener.listen(LISTEN_BACKLOG)
+            read_fd, write_fd = os.pipe()
+            pid = os.fork()
+        except (OSError, socket.error) as error:
+            self.log.warning('failed to start : {0}, commands run in the plugin process'.format(error))
+            shutil.rmtree(directory, ignore_errors=True)
+            return False
+
+        if pid == 0:
+            code = 0
+            try:
+                os.close(write_fd)
+                # the plugin stdout is the netdata pipe
+                devnull = os.open(os.devnull, os.O_WRONLY)
+                os.dup2(devnull, 1)
+                os.close(devnull)
+                signal.signal(signal.SIGINT, signal.SIG_IGN)
+                # the profiler handler is installed after the fork, SIGUSR1 sent to every plugin process
+                # (Ex. pkill -USR1 -f python.d.plugin) would kill the helper
+                signal.signal(signal.SIGUSR1, signal.SIG_IGN)
+                Server(listener, read_fd).serve()
+            except BaseException:
+                code = 1
+            finally:
+                shutil.rmtree(directory, ignore_errors=True)
+                os._exit(code)
+
+        listener.close()
+        os.close(read_fd)
+        # inherited by the plugin child processes, not by the commands
+        set_cloexec(write_fd)
+        self.path = path
+        self.directory = directory
+        self.pid = pid
+        self.owner = os.getpid()
+        self.parent_fd = write_fd
+        self.log.debug('started, pid {0}'.format(pid))
+        return True
+
+    def stop(self):
+        if not self.is_running():
+            return
+        self.path = None
+        if os.getpid() != self.owner:
+            return
+        os.close(self.parent_fd)
+        self.parent_fd = None
+        try:
+            os.waitpid(self.pid, 0)
+        except OSError:
+            pass
+        self.log.debug('stopped')
+
+    def run(self, command, input_data=None, timeout=None, limit=DEFAULT_OUTPUT_LIMIT):
+        """
+        :return: <Completed>, see run_command
+        """
+        path = self.path
+        if path is None:
+            return run_command(command, input_data, timeout, limit)
+
+        sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        try:
+            sock.settimeout(timeout + CLIENT_GRACE if timeout else None)
+            try:
+                sock.connect(path)
+            except socket.error as error:
+                # the helper is gone
+                if self.path is not None:
+                    self.path = None
+                    self.log.warning('not running ({0}), commands run in the plugin process'.format(error))
+                return run_command(command, input_data, timeout, limit)
+            send_message(sock, dict(command=list(command), input=input_data, timeout=timeout, limit=limit))
+            reply = recv_message(sock)
+        except socket.timeout:
+            return Completed(None, b'', b'', True, False)
+        except (socket.error, ForkServerError) as error:
+            raise OSError(getattr(error, 'errno', None), 'forkserver : {0}'.format(error))
+        finally:
+            sock.close()
+
+        if isinstance(reply, dict):
+            raise OSError(reply['errno'], reply['error'])
+        return Completed(*reply)
+
+    def follow(self, command):
+        """
+        :return: <FollowedCommand>
+        """
+        path = self.path
+        if path is None:
+            return FollowedCommand(process=Popen(command, stdout=PIPE, close_fds=True))
+
+        sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        try:
+            try:
+                sock.connect(path)
+            except socket.error as error:
+                sock.close()
+                if self.path is not None:
+                    self.path = None
+                    self.log.warning('not running ({0}), commands run in the plugin process'.format(error))
+                return FollowedCommand(process=Popen(command, stdout=PIPE, close_fds=True))
+            send_message(sock, dict(command=list(command), follow=True))
+            reply = recv_message(sock)
+        except (socket.error, ForkServerError) as error:
+            sock.close()
+            raise OSError(getattr(error, 'errno', None), 'forkserver : {0}'.format(error))
+
+        if isinstance(reply, dict):
+            sock.close()
+            raise OSError(reply['errno'], reply['error'])
+        return FollowedCommand(sock=sock)
+
+
+FORKSERVER = ForkServer()
+
+
+def execute(command, input_data=None, timeout=None, limit=DEFAULT_OUTPUT_LIMIT):
+    """
+    Runs a command in the forkserver.
+
+    :param command: <list> command and arguments
+    :param input_data: <bytes> written to the command stdin
+    :param timeout: <float> seconds, the command is killed after it
+    :param limit: <int> max bytes collected of stdout and of stderr
+    :return: <Completed>, returncode is None if the command timed out
+    """
+    return FORKSERVER.run(command, input_data, timeout, limit)
+
+
+def follow(command):
+    """
+    Starts a long running command in the forkserver.
+
+    :param command: <list> command and arguments
+    :return: <FollowedCommand>, its output is read until the command exits
+    """
+    return FORKSERVER.follow(command)
@@ -0,0 +1,281 @@
+# -*- coding: utf-8 -*-
+# Description:
+# SPDX-License-Identifier: GPL-3.0-or-later
+
+import os
+import signal
+import sys
+import tempfile
+import threading
+import time
+
+from collections import defaultdict
+
+from third_party.monotonic import monotonic
+
+from bases.loggers import PythonDLogger
+
+DEFAULT_SECONDS = 30
+DEFAULT_FREQUENCY = 100
+DEFAULT_TRIGGER_FILE = 'python.d.profile'
+MAX_SECONDS = 600
+
+# thread ident: 'module[job]' of the job the thread is running
+THREAD_TAGS = dict()
+
+
+def tag_thread(tag):
+    THREAD_TAGS[threading.current_thread().ident] = tag
+
+
+def untag_thread():
+    THREAD_TAGS.pop(threading.current_thread().ident, None)
+
+
+def thread_tag():
+    return THREAD_TAGS.get(threading.current_thread().ident)
+
+
+def default_dir():
+    return os.getenv('NETDATA_LOG_DIR') or tempfile.gettempdir()
+
+
+def default_trigger_file():
+    return os.path.join(os.getenv('NETDATA_CACHE_DIR') or tempfile.gettempdir(), DEFAULT_TRIGGER_FILE)
+
+
+def parse_seconds(value, default):
+    try:
+        seconds = int(float(value))
+    except (TypeError, ValueError):
+        return default
+    return min(seconds, MAX_SECONDS) if seconds > 0 else default
+
+
+class ThreadStates:
+    """
+    Tells the running threads from the waiting ones, threads waiting for I/O, a lock, the GIL or sleeping
+    are not counted in the cpu profile.
+
+    Needs /proc and Thread.native_id (python 3.8+), otherwise every thread is counted (wall clock profile).
+    """
+    def __init__(self):
+        self.fds = dict()
+        self.native_ids = dict()
+        self.enabled = os.path.isdir('/proc/self/task') and hasattr(threading.Thread, 'native_id')
+
+    def refresh(self):
+        self.native_ids = dict((t.ident, getattr(t, 'native_id', None)) for t in threading.enumerate())
+
+    def is_running(self, ident):
+        if not self.enabled:
+            return True
+        tid = self.native_ids.get(ident)
+        if tid is None:
+            return True
+        try:
+            fd = self.fds.get(tid)
+            if fd is None:
+                fd = self.fds[tid] = os.open('/proc/self/task/{0}/stat'.format(tid), os.O_RDONLY)
+            os.lseek(fd, 0, os.SEEK_SET)
+            stat = os.read(fd, 512)
+        except OSError:
+            # the thread has exited
+            self.close(tid)
+            return False
+        # 'pid (comm) state ...', comm may contain spaces and parentheses
+        pos = stat.rfind(b')') + 2
+        return stat[pos:pos + 1] == b'R'
+
+    def close(self, tid=None):
+        for t in ([tid] if tid is not None else list(self.fds)):
+            fd = self.fds.pop(t, None)
+            if fd is not None:
+                os.close(fd)
+
+
+class SamplingProfiler:
+    """
+    On demand sampling profiler of all the plugin process threads.
+
+    Profiling is requested with SIGUSR1 or by touching the trigger file (its content is the number of seconds
+    to profile, optional). The request is picked up by the plugin main loop and the stacks of the threads are
+    sampled in a separate thread for 'seconds'. Nothing runs until a request, the trigger file is checked once
+    a second.
+
+    Samples are written in the collapsed stack format (one 'tag;frame;...;frame count' line per stack, flame graph
+    tools read it), the first frame is the 'module[job]' of the job the thread was running or the thread name.
+
+    A plugin process that runs the jobs in several processes forwards the signal to them, every process writes
+    its own profile.
+    """
+    def __init__(self):
+        self.log = PythonDLogger()
+        self.log.job_name = 'profiler'
+        self.name = ''
+        self.seconds = DEFAULT_SECONDS
+        self.frequency = DEFAULT_FREQUENCY
+        self.directory = None
+        self.trigger_file = None
+        self.trigger_mtime = None
+        self.children = list()
+        self.requested = None
+        self.thread = None
+
+    def configure(self, seconds=DEFAULT_SECONDS, frequency=DEFAULT_FREQUENCY, directory=None, trigger_file=None):
+        self.seconds = parse_seconds(seconds, DEFAULT_SECONDS)
+        self.frequency = max(float(frequency), 1)
+        self.directory = directory or default_dir()
+        self.trigger_file = default_trigger_file() if trigger_file is None else trigger_file
+        self.trigger_mtime = self.file_mtime()
+
+    def install(self):
+        """
+        Installs the SIGUSR1 handler, must be called from the main thread.
+        """
+        if hasattr(signal, 'SIGUSR1'):
+            signal.signal(signal.SIGUSR1, self.handle_signal)
+
+    def handle_signal(self, signum, frame):
+        # only a flag is set here, the handler may interrupt the main thread holding any lock
+        if self.children:
+            for pid in self.children:
+                try:
+                    os.kill(pid, signum)
+                except OSError:
+                    pass
+            return
+        self.requested = self.seconds
+
+    def file_mtime(self):
+        if not self.trigger_file:
+            return None
+        try:
+            return os.stat(self.trigger_file).st_mtime
+        except OSError:
+            return None
+
+    def poll(self):
+        """
+        Starts profiling if it was requested by a signal or the trigger file, called once a second.
+        """
+        seconds, self.requested = self.requested, None
+
+        mtime = self.file_mtime()
+        if mtime is not None and mtime != self.trigger_mtime:
+            seconds = self.read_trigger_file()
+        self.trigger_mtime = mtime
+
+        if seconds:
+            self.start(seconds)
+
+    def read_trigger_file(self):
+        try:
+            with open(self.trigger_file) as fp:
+                return parse_seconds(fp.read().strip(), self.seconds)
+        except (OSError, IOError):
+            return self.seconds
+
+    def is_running(self):
+        return self.thread is not None and self.thread.is_alive()
+
+    def start(self, seconds):
+        if self.is_running():
+            self.log.warning('profiling is already running, request ignored')
+            return
+        self.log.info('profiling all threads for {0} second(s) at {1:g} Hz'.format(seconds, self.frequency))
+        self.thread = threading.Thread(target=self.run, args=(seconds,))
+        self.thread.daemon = True
+        self.thread.start()
+
+    def run(self, seconds):
+        try:
+            stacks, samples, mode = self.sample(seconds)
+            path = self.write(stacks, mode)
+        except Exception as error:
+            self.log.error('profiling failed : {0}'.format(error))
+            return
+        self.report(path, stacks, samples)
+
+    def sample(self, seconds):
+        """
+        :return: <dict> (tag, code positions) : samples, <int> number of samples, <str> 'cpu' or 'wall'
+        """
+        own = threading.current_thread().ident
+        names = dict()
+        states = ThreadStates()
+        stacks = defaultdict(int)
+        interval = 1.0 / self.frequency
+        next_sample = monotonic()
+        deadline = next_sample + seconds
+        next_refresh = 0
+        samples = 0
+
+        try:
+            while True:
+                now = monotonic()
+                if now >= deadline:
+                    break
+                if now >= next_refresh:
+                    # threads come and go (executor workers, timed out checks)
+                    names = dict((t.ident, t.name) for t in threading.enumerate())
+                    states.refresh()
+                    next_refresh = now + 1
+
+                for ident, frame in sys._current_frames().items():
+                    if ident == own or not states.is_running(ident):
+                        continue
+                    tag = THREAD_TAGS.get(ident) or names.get(ident) or 'thread-{0}'.format(ident)
+                    positions = list()
+                    while frame is not None:
+                        positions.append((frame.f_code, frame.f_lineno))
+                        frame = frame.f_back
+                    positions.reverse()
+                    stacks[(tag, tuple(positions))] += 1
+                samples += 1
+                next_sample = max(next_sample + interval, monotonic())
+                time.sleep(max(next_sample - monotonic(), 0))
+        finally:
+            states.close()
+
+        return stacks, samples, 'cpu' if states.enabled else 'wall'
+
+    def write(self, stacks, mode):
+        names = dict()
+
+        def frame_name(position):
+            name = names.get(position)
+            if name is None:
+                code, lineno = position
+                name = names[position] = '{0} ({1}:{2})'.format(
+                    code.co_name, os.path.basename(code.co_filename), lineno)
+            return name
+
+        lines = sorted('{0};{1} {2}\n'.format(tag, ';'.join(frame_name(p) for p in positions), count)
+                       for (tag, positions), count in stacks.items())
+
+        path = os.path.join(self.directory, 'python.d.plugin{0}.{1}.{2}.{3}.collapsed'.format(
+            '.' + self.name if self.name else '',
+            os.getpid(),
+            time.strftime('%Y%m%d-%H%M%S'),
+            mode,
+        ))
+        with open(path, 'w') as fp:
+            fp.writelines(lines)
+        return path
+
+    def report(self, path, stacks, samples):
+        tags = defaultdict(int)
+        for (tag, _), count in stacks.items():
+            tags[tag] += count
+
+        top = sorted(tags.items(), key=lambda v: v[1], reverse=True)[:5]
+        # share of the samples the thread was running in, i.e. of one cpu core in the cpu mode
+        self.log.info('profile written to {0} ({1} samples), top : {2}'.format(
+            path,
+            samples,
+            ', '.join('{0} {1:.1f}%'.format(tag, count * 100.0 / max(samples, 1)) for tag, count in top) or '-',
+        ))
+
+
+PROFILER = SamplingProfiler()
@@ -0,0 +1,101 @@
+# -*- coding: utf-8 -*-
+# Description:
+# SPDX-License-Identifier: GPL-3.0-or-later
+
+from third_party.monotonic import monotonic
+
+# the first refreshes of the cached queries are spread over their intervals by the golden ratio sequence,
+# the phases of any number of queries stay well apart
+GOLDEN_RATIO = 0.6180339887498949
+
+
+class CachedResult:
+    __slots__ = ('result', 'next_run')
+
+    def __init__(self, result, next_run):
+        self.result = result
+        self.next_run = next_run
+
+
+class QueryCache:
+    """
+    Per query refresh intervals for database collectors.
+
+    A query with a refresh interval longer than update_every is run when it is due, its result is returned from
+    the cache on the updates in between. The other queries are run on every update.
+
+    Every query is run on its first use (check), then the refreshes are staggered: the first one comes after
+    a different fraction of the interval for every query, so the queries with the same interval are not due
+    on the same update.
+    """
+    def __init__(self, update_every, intervals, configured=None):
+        """
+        :param update_every: <int> job update_every
+        :param intervals: <dict> query name: refresh interval in seconds, the module defaults
+        :param configured: <dict> query name: refresh interval in seconds, from the job configuration ('refresh_every')
+        """
+        self.update_every = update_every
+        self.intervals = dict(intervals)
+        if isinstance(configured, dict):
+            self.intervals.update(configured)
+        self.cache = dict()
+        self.cached = 0
+
+    def interval(self, group):
+        try:
+            return float(self.intervals.get(group) or 0)
+        except (TypeError, ValueError):
+            return 0
+
+    def get(self, name):
+        """
+        :param name: <str> query name
+        :return: cached result, None if there is no result or the query is due
+        """
+        entry = self.cache.get(name)
+        # the update is late or early by a fraction of update_every
+        if entry is None or monotonic() >= entry.next_run - self.update_every / 2.0:
+            return None
+        return entry.result
+
+    def put(self, name, result, group=None):
+        """
+        :param name: <str> query name
+        :param result: the query result, None is not cached
+        :param group: <str> name of the refresh interval, the query name by default.
+         Ex.: a query run for every database, all of them have the interval of the query.
+        """
+        interval = self.interval(group or name)
+        if result is None or interval <= self.update_every:
+            self.cache.pop(name, None)
+            return
+
+        now = monotonic()
+        entry = self.cache.get(name)
+        if entry is None:
+            self.cached += 1
+            delay = interval * ((self.cached * GOLDEN_RATIO) % 1 or 1)
+            self.cache[name] = CachedResult(result, now + delay)
+            return
+
+        entry.result = result
+        entry.next_run += interval
+        if entry.next_run <= now:
+            entry.next_run = now + interval
+
+    def fetch(self, name, query, group=None):
+        """
+        :param name: <str> query name
+        :param query: <function> runs the query, returns the result
+        :param group: <str> see put()
+        :return: the cached result or the result of the query
+        """
+        result = self.get(name)
+        if result is not None:
+            return result
+        result = query()
+        self.put(name, result, group)
+        return result
+
+    def clear(self):
+        self.cache.clear()
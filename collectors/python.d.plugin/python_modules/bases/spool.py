@@ -0,0 +1,126 @@
+# -*- coding: utf-8 -*-
+# Description:
+# SPDX-License-Identifier: GPL-3.0-or-later
+
+import os
+import stat
+import time
+
+try:
+    from os import scandir
+except ImportError:
+    scandir = None
+
+# a directory changed less than this number of seconds before the scan may change again with the same mtime
+RACY_SECONDS = 1
+
+
+def is_readable_dir(path):
+    return os.path.isdir(path) and os.access(path, os.R_OK | os.X_OK)
+
+
+def dir_mtime(st):
+    return getattr(st, 'st_mtime_ns', st.st_mtime)
+
+
+class DirStats:
+    def __init__(self, mtime, count, size, subdirs):
+        self.mtime = mtime
+        self.count = count
+        self.size = size
+        self.subdirs = subdirs
+
+
+class SpoolScanner:
+    """
+    Counts the files and sums their sizes in a mail queue directory tree (hashed subdirectories included)
+    without running the MTA tools.
+
+    The totals of the files of every directory are cached with the directory mtime. A directory which entries have
+    not changed since the previous scan is not read again, only a stat() of it is done. Files are counted from
+    the directory entries, their sizes are read only in changed directories.
+    """
+    def __init__(self, path, suffix=None):
+        """
+        :param path: <str> queue directory
+        :param suffix: <str> only the files with names ending with it are counted, the sizes of all files are summed
+        """
+        self.path = path
+        self.suffix = suffix
+        self.cache = dict()
+
+    def scan(self):
+        """
+        :return: <int> number of files, <int> total size in bytes
+        """
+        cache = dict()
+        count = size = 0
+        now = time.time()
+        dirs = [self.path]
+        while dirs:
+            path = dirs.pop()
+            try:
+                st = os.stat(path)
+            except OSError:
+                if path == self.path:
+                    raise
+                # removed while scanning
+                continue
+            stats = self.cache.get(path)
+            if stats is None or stats.mtime is None or stats.mtime != dir_mtime(st):
+                try:
+                    stats = self.scan_dir(path, st, now)
+                except OSError:
+                    if path == self.path:
+                        raise
+                    continue
+            cache[path] = stats
+            count += stats.count
+            size += stats.size
+            dirs.extend(stats.subdirs)
+        # the removed directories are forgotten
+        self.cache = cache
+        return count, size
+
+    def scan_dir(self, path, st, now):
+        count = size = 0
+        subdirs = list()
+        # the entries changed while scanning, the next scan reads them again
+        racy = now - st.st_mtime < RACY_SECONDS
+        for name, is_dir, file_size in self.entries(path):
+            if is_dir:
+                subdirs.append(os.path.join(path, name))
+                continue
+            if file_size is None:
+                racy = True
+                continue
+            if self.suffix is None or name.endswith(self.suffix):
+                count += 1
+            size += file_size
+        return DirStats(None if racy else dir_mtime(st), count, size, subdirs)
+
+    def entries(self, path):
+        """
+        :return: <generator> of (<str> name, <bool> is a directory, <int> file size, None if the file is gone)
+        """
+        if scandir is not None:
+            for entry in scandir(path):
+                if entry.is_dir(follow_symlinks=False):
+                    yield entry.name, True, None
+                elif entry.is_file(follow_symlinks=False):
+                    try:
+                        yield entry.name, False, entry.stat(follow_symlinks=False).st_size
+                    except OSError:
+                        yield entry.name, False, None
+            return
+
+        for name in os.listdir(path):
+            try:
+                st = os.lstat(os.path.join(path, name))
+            except OSError:
+                yield name, False, None
+                continue
+            if stat.S_ISDIR(st.st_mode):
+                yield name, True, None
+            elif stat.S_ISREG(st.st_mode):
+                yield name, False, st.st_size
@@ -0,0 +1,134 @@
+# -*- coding: utf-8 -*-
+# Description:
+# SPDX-License-Identifier: GPL-3.0-or-later
+
+import threading
+
+from collections import deque
+
+from third_party.monotonic import monotonic
+
+from bases.forkserver import follow
+from bases.loggers import PythonDLogger
+
+DEFAULT_RECORDS_LIMIT = 16 << 20
+MIN_BACKOFF = 1
+MAX_BACKOFF = 60
+READ_SIZE = 65536
+
+
+class CommandStream(threading.Thread):
+    """
+    Keeps a long running command (a tool in its loop or follow mode) alive and splits its output into records,
+    a record ends with the delimiter. The command is restarted after it exits, the delay doubles on every restart
+    in a row (up to MAX_BACKOFF seconds) and is reset once the command runs longer than the delay.
+
+    Records not taken yet are kept up to 'limit' bytes, the oldest are dropped above it.
+    """
+    def __init__(self, command, delimiter, name, limit=DEFAULT_RECORDS_LIMIT):
+        threading.Thread.__init__(self, name=name)
+        self.daemon = True
+        self.log = PythonDLogger()
+        self.log.job_name = name
+        self.command = command
+        self.delimiter = delimiter
+        self.limit = limit
+        self.lock = threading.Lock()
+        self.stopped = threading.Event()
+        self.output = None
+        # <bytes> records not taken yet
+        self.records = deque()
+        self.size = 0
+        self.dropped = 0
+        self.latest = None
+        self.received = None
+        self.restarts = 0
+
+    def run(self):
+        backoff = MIN_BACKOFF
+        while not self.stopped.is_set():
+            started = monotonic()
+            try:
+                self.follow()
+            except (OSError, IOError) as error:
+                self.log.error("can't run {0} : {1}".format(self.command, error))
+            if self.stopped.is_set():
+                break
+            if monotonic() - started > backoff:
+                backoff = MIN_BACKOFF
+            self.restarts += 1
+            self.log.warning('{0} exited, restarting in {1} second(s)'.format(self.command, backoff))
+            self.stopped.wait(backoff)
+            backoff = min(backoff * 2, MAX_BACKOFF)
+
+    def follow(self):
+        # started by the forkserver, the plugin process is not forked on the restarts
+        self.output = output = follow(self.command)
+        delimiter = self.delimiter
+        data = b''
+        try:
+            while not self.stopped.is_set():
+                chunk = output.read(READ_SIZE)
+                if not chunk:
+                    break
+                # the delimiter may be split between the chunks
+                start = max(len(data) - len(delimiter) + 1, 0)
+                data += chunk
+                while True:
+                    end = data.find(delimiter, start)
+                    if end < 0:
+                        break
+                    end += len(delimiter)
+                    self.push(data[:end])
+                    data = data[end:]
+                    start = 0
+                if len(data) > self.limit:
+                    self.log.warning('no delimiter in {0} bytes of {1} output, dropped'.format(len(data), self.command))
+                    data = b''
+        finally:
+            output.close()
+            self.output = None
+
+    def push(self, record):
+        with self.lock:
+            self.records.append(record)
+            self.size += len(record)
+            self.latest = record
+            self.received = monotonic()
+            while self.size > self.limit and len(self.records) > 1:
+                dropped = self.records.popleft()
+                self.size -= len(dropped)
+                self.dropped += 1
+
+    def take(self):
+        """
+        :return: <list> of <bytes> records received since the last call
+        """
+        with self.lock:
+            records = list(self.records)
+            self.records.clear()
+            self.size = 0
+            if self.dropped:
+                self.log.warning('{0} record(s) of {1} were not taken in time, dropped'.format(
+                    self.dropped, self.command))
+                self.dropped = 0
+        return records
+
+    def take_latest(self, max_age=None):
+        """
+        :param max_age: <float> seconds, no record is returned if the latest one is older
+        :return: <bytes> the latest record, None if there is no record
+        """
+        with self.lock:
+            self.records.clear()
+            self.size = 0
+            self.dropped = 0
+            if self.latest is None or (max_age and monotonic() - self.received > max_age):
+                return None
+            return self.latest
+
+    def stop(self):
+        self.stopped.set()
+        output = self.output
+        if output is not None:
+            output.interrupt()
@@ -0,0 +1,556 @@
+# -*- coding: utf-8 -*-
+# Description:
+# SPDX-License-Identifier: GPL-3.0-or-later
+
+import errno
+import os
+import struct
+import threading
+import time
+
+from collections import deque
+
+try:
+    import ctypes
+    import ctypes.util
+except ImportError:
+    ctypes = None
+
+from third_party.monotonic import monotonic
+
+from bases.loggers import PythonDLogger
+
+DEFAULT_READ_LIMIT = 32 << 20
+# bytes read for a subscriber and not taken yet, the shared file is not read while a subscriber is above it
+PENDING_LIMIT_FACTOR = 4
+MAX_CHECKPOINTS = 3600
+
+IN_MODIFY = 0x00000002
+IN_ATTRIB = 0x00000004
+IN_MOVED_FROM = 0x00000040
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+IN_DELETE = 0x00000200
+IN_DELETE_SELF = 0x00000400
+IN_MOVE_SELF = 0x00000800
+IN_Q_OVERFLOW = 0x00004000
+IN_IGNORED = 0x00008000
+IN_CLOEXEC = 0o2000000
+IN_NONBLOCK = 0o4000
+
+WATCH_EVENTS = IN_MODIFY | IN_ATTRIB | IN_MOVED_FROM | IN_MOVED_TO | IN_CREATE | IN_DELETE | IN_DELETE_SELF | \
+               IN_MOVE_SELF
+
+# struct inotify_event: wd, mask, cookie, len, followed by the name
+INOTIFY_EVENT = struct.Struct('iIII')
+
+fs_decode = getattr(os, 'fsdecode', lambda name: name)
+fs_encode = getattr(os, 'fsencode', lambda name: name)
+
+
+def load_libc():
+    if ctypes is None:
+        return None
+    try:
+        libc = ctypes.CDLL(ctypes.util.find_library('c') or None, use_errno=True)
+        libc.inotify_init1.argtypes = [ctypes.c_int]
+        libc.inotify_add_watch.argtypes = [ctypes.c_int, ctypes.c_char_p, ctypes.c_uint32]
+    except (OSError, AttributeError):
+        return None
+    return libc
+
+
+class Inotify:
+    """
+    Linux directory change notifications, used to tell which tailed files have changed without a stat() of every
+    file on every update.
+    """
+    def __init__(self):
+        self.fd = None
+        self.libc = load_libc()
+        # wd: directory
+        self.watches = dict()
+        # directory: wd
+        self.dirs = dict()
+        if self.libc is not None:
+            fd = self.libc.inotify_init1(IN_NONBLOCK | IN_CLOEXEC)
+            if fd >= 0:
+                self.fd = fd
+
+    def is_available(self):
+        return self.fd is not None
+
+    def watch(self, directory):
+        """
+        :return: <bool> True if the directory changes are notified
+        """
+        if directory in self.dirs:
+            return True
+        wd = self.libc.inotify_add_watch(self.fd, fs_encode(directory), WATCH_EVENTS)
+        if wd < 0:
+            return False
+        self.watches[wd] = directory
+        self.dirs[directory] = wd
+        return True
+
+    def read(self):
+        """
+        :return: <set> changed paths and directories since the last call, None if events were lost
+        """
+        changed = set()
+        while True:
+            try:
+                data = os.read(self.fd, 65536)
+            except OSError as error:
+                if error.errno in (errno.EAGAIN, errno.EWOULDBLOCK):
+                    return changed
+                raise
+            if not data:
+                return changed
+
+            offset = 0
+            while offset < len(data):
+                wd, mask, _, size = INOTIFY_EVENT.unpack_from(data, offset)
+                offset += INOTIFY_EVENT.size
+                name = data[offset:offset + size].rstrip(b'\0')
+                offset += size
+
+                if mask & IN_Q_OVERFLOW:
+                    return None
+                directory = self.watches.get(wd)
+                if directory is None:
+                    continue
+                if mask & IN_IGNORED:
+                    # the directory is gone, it is watched again when a file in it is opened
+                    del self.watches[wd]
+                    self.dirs.pop(directory, None)
+                changed.add(os.path.join(directory, fs_decode(name)) if name else directory)
+
+
+class Subscription:
+    """
+    Lines of a tailed file read for one job and not taken by it yet.
+    """
+    def __init__(self, tailed, read_limit, lines_limit=0):
+        self.tailed = tailed
+        self.path = tailed.path
+        self.read_limit = max(int(read_limit), 1)
+        self.lines_limit = max(int(lines_limit), 0)
+        self.pending_limit = self.read_limit * PENDING_LIMIT_FACTOR
+        # [<bytes> lines, <float> time the oldest of them was seen in the file]
+        self.pending = deque()
+        self.size = 0
+        self.lines = 0
+        self.dropped = 0
+        # file offset the subscriber skips the lines to
+        self.skip_to = None
+
+    def push(self, data, seen):
+        self.pending.append([data, seen])
+        self.size += len(data)
+        if self.lines_limit:
+            self.lines += data.count(b'\n')
+
+    def take(self):
+        """
+        :return: <bytes> complete lines, no more than read_limit bytes (unless a single line is longer)
+        and lines_limit lines
+        """
+        parts = list()
+        left = self.read_limit
+        lines = self.lines_limit
+        while self.pending and left > 0:
+            item = self.pending[0]
+            data = item[0]
+            cut = len(data)
+            if cut > left:
+                cut = data.rfind(b'\n', 0, left) + 1
+                if not cut:
+                    if parts:
+                        break
+                    cut = data.find(b'\n') + 1 or len(data)
+            if lines:
+                count = data.count(b'\n', 0, cut)
+                if count >= lines:
+                    pos = -1
+                    for _ in range(lines):
+                        pos = data.find(b'\n', pos + 1)
+                    cut = pos + 1
+                    count = lines
+                lines -= count
+                self.lines -= count
+            if cut < len(data):
+                item[0] = data[cut:]
+                data = data[:cut]
+            else:
+                self.pending.popleft()
+            parts.append(data)
+            self.size -= len(data)
+            left -= len(data)
+            if self.lines_limit and not lines:
+                break
+        return b''.join(parts)
+
+    def is_full(self):
+        # the rest is left in the file until the pending lines are taken
+        return self.size >= self.read_limit or 0 < self.lines_limit <= self.lines
+
+    def read(self):
+        """
+        :return: <bytes> complete lines appended since the last read, None if the file can't be read
+        """
+        tailed = self.tailed
+        with tailed.lock:
+            # the lines not taken by a slower job stay in the file, the faster jobs wait for it
+            if not (self.is_full() or tailed.is_paused()) and not tailed.update(self.read_limit):
+                if not self.size:
+                    return None
+            return self.take()
+
+    def lag(self):
+        """
+        :return: <int> bytes not taken yet, <float> seconds since the oldest of them was seen in the file
+        """
+        tailed = self.tailed
+        with tailed.lock:
+            unread, seen = tailed.unread(self.skip_to)
+            if self.pending:
+                seen = self.pending[0][1]
+            size = self.size + unread
+        return size, monotonic() - seen if size and seen is not None else 0
+
+    def skip(self):
+        """
+        Drops the lines not taken yet, the next lines taken are the ones appended after the current end of the file.
+        """
+        tailed = self.tailed
+        with tailed.lock:
+            self.dropped += self.size
+            self.pending.clear()
+            self.size = 0
+            self.lines = 0
+            self.skip_to = tailed.size
+            tailed.skip()
+
+    def skipping(self, data, start):
+        """
+        :return: <bytes> part of the data published at the start offset after the skip offset
+        """
+        offset = self.skip_to - start
+        if offset <= 0:
+            self.skip_to = None
+            return data
+        # the first line after the offset, the offset may be in the middle of a line
+        cut = data.find(b'\n', offset - 1) + 1
+        if not cut:
+            self.dropped += len(data)
+            return None
+        self.skip_to = None
+        self.dropped += cut
+        return data[cut:] or None
+
+    def pop_dropped(self):
+        dropped, self.dropped = self.dropped, 0
+        return dropped
+
+    def close(self):
+        self.tailed.engine.unsubscribe(self)
+
+
+class TailedFile:
+    """
+    A file read once for all the subscribed jobs, the file is kept open and followed by its path:
+    the rest of a rotated file is read before the new file, a truncated file is read from the start.
+
+    The file size is remembered on every check when there is something to read, the lag of the lines is the time
+    since the file size passed them.
+    """
+    def __init__(self, engine, path):
+        self.engine = engine
+        self.path = path
+        self.lock = threading.Lock()
+        self.subscribers = list()
+        self.fd = None
+        self.ident = None
+        self.position = 0
+        self.size = 0
+        self.partial = b''
+        # skipped to the end in the middle of a line
+        self.resync = False
+        # (<int> file size, <float> time it was seen)
+        self.checkpoints = deque()
+        # set by the notifications, always set if the file is not watched
+        self.changed = True
+        self.watched = False
+
+    def open(self, from_end):
+        """
+        :return: <bool> True if the file is opened
+        """
+        try:
+            fd = os.open(self.path, os.O_RDONLY)
+        except OSError:
+            return False
+        stat = os.fstat(fd)
+        self.close()
+        self.fd = fd
+        self.ident = (stat.st_dev, stat.st_ino)
+        self.size = stat.st_size
+        self.position = stat.st_size if from_end else 0
+        self.partial = b''
+        self.resync = False
+        self.checkpoints.clear()
+        for subscription in self.subscribers:
+            subscription.skip_to = None
+        self.watched = self.engine.watch(self)
+        return True
+
+    def close(self):
+        if self.fd is not None:
+            os.close(self.fd)
+            self.fd = None
+
+    def update(self, limit):
+        """
+        Reads no more than limit bytes appended to the file and passes the complete lines to all the subscribers.
+
+        :return: <bool> False if the file can't be read
+        """
+        if self.watched:
+            self.engine.read_notifications()
+            # the directory may be gone, it is watched again when the file is opened again
+            self.watched = self.engine.is_watched(self)
+        if not self.changed and self.fd is not None:
+            return True
+        self.changed = not self.watched
+
+        try:
+            stat = os.stat(self.path)
+        except OSError:
+            # rotated and not created yet, the rest of the old file is read
+            stat = None
+
+        if self.fd is None:
+            return stat is not None and self.open(from_end=False) and self.read(limit) is not None
+
+        if stat is not None and (stat.st_dev, stat.st_ino) != self.ident:
+            if self.read(limit) == limit:
+                self.changed = True
+                return True
+            if self.partial:
+                self.publish(self.partial + b'\n', self.position - len(self.partial), monotonic())
+            return self.open(from_end=False) and self.read(limit) is not None
+
+        return self.read(limit) is not None
+
+    def read(self, limit):
+        """
+        :return: <int> number of bytes read, None on error
+        """
+        try:
+            stat = os.fstat(self.fd)
+            size = stat.st_size
+            if size < self.position:
+                # truncated
+                self.position = 0
+                self.partial = b''
+                self.checkpoints.clear()
+            self.size = size
+            size = min(size - self.position, limit)
+            if size <= 0:
+                return 0
+            os.lseek(self.fd, self.position, os.SEEK_SET)
+            data = os.read(self.fd, size)
+        except OSError as error:
+            self.engine.log.error('{0} : {1}'.format(self.path, error))
+            return None
+
+        checkpoints = self.checkpoints
+        self.checkpoint(stat.st_mtime)
+        seen = checkpoints[0][1]
+
+        start = self.position - len(self.partial)
+        size = len(data)
+        self.position += size
+        while checkpoints and checkpoints[0][0] <= self.position:
+            checkpoints.popleft()
+        if size == limit:
+            # there may be more, read on the next update
+            self.changed = True
+
+        if self.partial:
+            data = self.partial + data
+        if self.resync:
+            # the rest of the line the skip ended in
+            cut = data.find(b'\n') + 1
+            if not cut:
+                self.partial = b''
+                return size
+            self.resync = False
+            data = data[cut:]
+            start += cut
+        cut = data.rfind(b'\n') + 1
+        if not cut and len(data) >= limit:
+            # a line longer than the limit is passed in parts
+            cut = len(data)
+        self.partial = data[cut:]
+        if cut:
+            self.publish(data[:cut], start, seen)
+        return size
+
+    def checkpoint(self, mtime):
+        """
+        Remembers the time the file grew to its size, the modification time is the time of the last write
+        """
+        checkpoints = self.checkpoints
+        if (not checkpoints or checkpoints[-1][0] < self.size) and len(checkpoints) < MAX_CHECKPOINTS:
+            now = monotonic()
+            seen = now - min(max(time.time() - mtime, 0), now - checkpoints[-1][1] if checkpoints else now)
+            checkpoints.append((self.size, seen))
+
+    def unread(self, offset=None):
+        """
+        :param offset: <int> count from the offset instead of the read position
+        :return: <int> bytes of the file not read yet, <float> time the oldest of them was seen, None if not known
+        """
+        if self.fd is not None:
+            try:
+                stat = os.fstat(self.fd)
+            except OSError:
+                stat = None
+            # truncation is handled by the next read
+            if stat is not None and stat.st_size > self.size:
+                self.size = stat.st_size
+                self.checkpoint(stat.st_mtime)
+        if offset is None:
+            offset = self.position - len(self.partial)
+        for size, seen in self.checkpoints:
+            if size > offset:
+                return self.size - offset, seen
+        return max(self.size - offset, 0), None
+
+    def is_paused(self):
+        return any(subscription.size >= subscription.pending_limit for subscription in self.subscribers)
+
+    def skip(self):
+        """
+        Skips to the end of the file if all the subscribers skip.
+        """
+        if self.fd is None or any(subscription.skip_to is None for subscription in self.subscribers):
+            return
+        position = max(subscription.skip_to for subscription in self.subscribers)
+        skipped = max(position - self.position + len(self.partial), 0)
+        for subscription in self.subscribers:
+            subscription.dropped += skipped
+            subscription.skip_to = None
+        self.resync = position > 0 and self.byte_before(position) != b'\n'
+        self.position = position
+        self.partial = b''
+        while self.checkpoints and self.checkpoints[0][0] <= position:
+            self.checkpoints.popleft()
+
+    def byte_before(self, position):
+        try:
+            os.lseek(self.fd, position - 1, os.SEEK_SET)
+            return os.read(self.fd, 1)
+        except OSError:
+            return None
+
+    def publish(self, data, start, seen):
+        for subscription in self.subscribers:
+            if subscription.skip_to is None:
+                subscription.push(data, seen)
+                continue
+            rest = subscription.skipping(data, start)
+            if rest is not None:
+                subscription.push(rest, seen)
+
+
+class TailEngine:
+    """
+    Tails the log files of the LogService jobs of a plugin process.
+
+    A file tailed by several jobs is read once, new lines are passed to every subscribed job and are taken by the job
+    on its update, a job takes no more than its read limit per update. Files are read in large binary chunks from
+    a descriptor that is kept open. With inotify (Linux) a file is checked only after a change of its directory,
+    otherwise it is checked on every update.
+    """
+    def __init__(self):
+        self.log = PythonDLogger()
+        self.log.job_name = 'tail'
+        # lock order: lock (files), file lock, inotify_lock
+        self.lock = threading.Lock()
+        self.inotify_lock = threading.Lock()
+        self.pid = None
+        self.files = dict()
+        self.inotify = None
+
+    def setup(self):
+        # descriptors are shared with the parent after fork, a child process starts from scratch
+        if self.pid == os.getpid():
+            return
+        self.pid = os.getpid()
+        self.files = dict()
+        self.inotify = Inotify()
+        if not self.inotify.is_available():
+            self.log.debug('inotify is not available, files are checked on every update')
+
+    def subscribe(self, path, from_end=True, read_limit=DEFAULT_READ_LIMIT, lines_limit=0):
+        """
+        :param path: <str> file path
+        :param from_end: <bool> skip the lines written before, if the file is not tailed yet
+        :param read_limit: <int> max bytes taken by the subscriber per update
+        :param lines_limit: <int> max lines taken by the subscriber per update, 0 - no limit
+        :return: <Subscription>
+        """
+        path = os.path.abspath(path)
+        with self.lock:
+            self.setup()
+            tailed = self.files.get(path)
+            if tailed is None:
+                tailed = self.files[path] = TailedFile(self, path)
+            with tailed.lock:
+                if tailed.fd is None:
+                    tailed.open(from_end)
+                subscription = Subscription(tailed, read_limit, lines_limit)
+                tailed.subscribers.append(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription):
+        tailed = subscription.tailed
+        with self.lock:
+            with tailed.lock:
+                if subscription in tailed.subscribers:
+                    tailed.subscribers.remove(subscription)
+                if tailed.subscribers:
+                    return
+                tailed.close()
+            if self.files.get(tailed.path) is tailed:
+                del self.files[tailed.path]
+
+    def watch(self, tailed):
+        """
+        :return: <bool> True if the file changes are notified
+        """
+        if not self.inotify.is_available():
+            return False
+        # changes of a symlink target are notified in the target directory
+        if os.path.realpath(tailed.path) != tailed.path:
+            return False
+        with self.inotify_lock:
+            return self.inotify.watch(os.path.dirname(tailed.path))
+
+    def is_watched(self, tailed):
+        return os.path.dirname(tailed.path) in self.inotify.dirs
+
+    def read_notifications(self):
+        with self.inotify_lock:
+            changed = self.inotify.read()
+        if changed is not None and not changed:
+            return
+        for tailed in list(self.files.values()):
+            if changed is None or tailed.path in changed or os.path.dirname(tailed.path) in changed:
+                tailed.changed = True
+
+
+TAIL_ENGINE = TailEngine()
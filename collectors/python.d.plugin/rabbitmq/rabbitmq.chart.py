@@ -3,9 +3,8 @@
 # Author: ilyam8
 # SPDX-License-Identifier: GPL-3.0-or-later
 
-from json import loads
-
 from bases.FrameworkServices.UrlService import UrlService
+from bases.extractor import MetricExtractor
 
 API_NODE = 'api/nodes'
 API_OVERVIEW = 'api/overview'
@@ -33,6 +32,12 @@ OVERVIEW_STATS = [
     'message_stats.publish'
 ]
 
+NODE_EXTRACTOR = MetricExtractor(NODE_STATS)
+OVERVIEW_EXTRACTOR = MetricExtractor(OVERVIEW_STATS)
+
+# parts of the overview the module needs, the rest is skipped when 'stream_json' is enabled
+OVERVIEW_DOCUMENT = MetricExtractor(OVERVIEW_STATS + ['node'])
+
 ORDER = [
     'queued_messages',
     'message_rates',
@@ -145,41 +150,21 @@ class Service(UrlService):
     def get_overview_stats(self):
         url = '{0}/{1}'.format(self.url, API_OVERVIEW)
 
-        raw = self._get_raw_data(url)
+        data = self._get_json(url, extractor=OVERVIEW_DOCUMENT)
 
-        if not raw:
+        if not data:
             return None
 
-        data = loads(raw)
-
         self.node_name = data['node']
 
-        return fetch_data(raw_data=data, metrics=OVERVIEW_STATS)
+        return OVERVIEW_EXTRACTOR.extract(data)
 
     def get_nodes_stats(self):
         url = '{0}/{1}/{2}'.format(self.url, API_NODE, self.node_name)
 
-        raw = self._get_raw_data(url)
+        data = self._get_json(url, extractor=NODE_EXTRACTOR)
 
-        if not raw:
+        if not data:
             return None
 
-        data = loads(raw)
-
-        return fetch_data(raw_data=data, metrics=NODE_STATS)
-
-
-def fetch_data(raw_data, metrics):
-    data = dict()
-
-    for metric in metrics:
-        value = raw_data
-        metrics_list = metric.split('.')
-        try:
-            for m in metrics_list:
-                value = value[m]
-        except KeyError:
-            continue
-        data['_'.join(metrics_list)] = value
-
-    return data
+        return NODE_EXTRACTOR.extract(data)
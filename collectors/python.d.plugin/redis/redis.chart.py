@@ -236,21 +236,25 @@ class Service(SocketService):
 
         return True
 
-    def _check_raw_data(self, data):
+    def _check_received(self, data, start):
         """
         Check if all data has been gathered from socket.
         Parse first line containing message length and check against received message
-        :param data: str
+        :param data: bytearray
+        :param start: int
         :return: boolean
         """
-        length = len(data)
-        supposed = data.split('\n')[0][1:-1]
+        end = data.find(b'\n')
+        if end == -1:
+            self.debug('waiting more data from redis')
+            return False
+        supposed = bytes(data[1:end - 1])
         offset = len(supposed) + 4  # 1 dollar sing, 1 new line character + 1 ending sequence '\r\n'
         if not supposed.isdigit():
             return True
         supposed = int(supposed)
 
-        if length - offset >= supposed:
+        if len(data) - offset >= supposed:
             self.debug('received full response from redis')
             return True
 
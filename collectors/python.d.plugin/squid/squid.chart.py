@@ -90,15 +90,15 @@ class Service(SocketService):
             return None
         return data
 
-    def _check_raw_data(self, data):
+    def _check_received(self, data, start):
         header = data[:1024].lower()
 
-        if 'connection: keep-alive' in header:
+        if b'connection: keep-alive' in header:
             self._keep_alive = True
         else:
             self._keep_alive = False
 
-        if data[-7:] == '\r\n0\r\n\r\n' and 'transfer-encoding: chunked' in header:  # HTTP/1.1 response
+        if data[-7:] == b'\r\n0\r\n\r\n' and b'transfer-encoding: chunked' in header:  # HTTP/1.1 response
             self.debug('received full response from squid')
             return True
 
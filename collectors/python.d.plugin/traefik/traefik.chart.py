@@ -8,6 +8,7 @@ from collections import defaultdict
 from json import loads
 
 from bases.FrameworkServices.UrlService import UrlService
+from bases.extractor import MetricExtractor
 
 
 ORDER = [
@@ -89,6 +90,8 @@ HEALTH_STATS = [
     'total_status_code_count'
 ]
 
+HEALTH_EXTRACTOR = MetricExtractor(HEALTH_STATS)
+
 
 class Service(UrlService):
     def __init__(self, configuration=None, name=None):
@@ -127,7 +130,7 @@ class Service(UrlService):
 
         self.get_data_per_code(raw_data=data)
 
-        self.data.update(fetch_data_(raw_data=data, metrics=HEALTH_STATS))
+        self.data.update(HEALTH_EXTRACTOR.extract(data))
 
         self.data['average_response_time_sec'] *= 1000000
         self.data['total_response_time_sec'] *= 10000
@@ -182,19 +185,3 @@ class Service(UrlService):
                 if code not in self.data:
                     self.charts['detailed_response_codes'].add_dimension([code, code, 'incremental'])
                 self.data[code] = value
-
-
-def fetch_data_(raw_data, metrics):
-    data = dict()
-
-    for metric in metrics:
-        value = raw_data
-        metrics_list = metric.split('.')
-        try:
-            for m in metrics_list:
-                value = value[m]
-        except KeyError:
-            continue
-        data['_'.join(metrics_list)] = value
-
-    return data
@@ -269,7 +269,7 @@ class Service(SocketService):
         return result
 
     @staticmethod
-    def _check_raw_data(data):
+    def _check_received(data, start):
         # The server will close the connection when it's done sending
         # data, so just keep looping until that happens.
         return False
@@ -4,10 +4,15 @@
 # SPDX-License-Identifier: GPL-3.0-or-later
 
 import bisect
+import math
 import os
 import re
-from collections import namedtuple, defaultdict
+import socket
+import struct
+from binascii import hexlify
+from collections import namedtuple, defaultdict, Counter
 from copy import deepcopy
+from hashlib import md5
 
 try:
     from itertools import filterfalse
@@ -338,6 +343,33 @@ SQUID_CODES = {
 
 REQUEST_REGEX = re.compile(r'(?P<method>[A-Z]+) (?P<url>[^ ]+) [A-Z]+/(?P<http_version>\d(?:.\d)?)')
 
+# named groups used by the batch parser, other groups of the log format regex are not extracted
+WEB_FIELDS = [
+    'address',
+    'code',
+    'bytes_sent',
+    'resp_length',
+    'resp_time',
+    'resp_time_upstream',
+    'user_defined',
+    'request',
+    'method',
+    'url',
+    'http_version',
+    'port',
+    'vhost',
+]
+
+REQUEST_FIELDS = ['request', 'method', 'url', 'http_version', 'port', 'vhost']
+
+ALL_TIME_MODES = ['exact', 'approximate']
+
+# exact unique client addresses per ip proto, ~75 bytes per address
+ALL_TIME_MAX_EXACT = 200000
+
+# relative standard error of the approximate unique client addresses count, 0.01 is 16KiB per ip proto
+ALL_TIME_ERROR = 0.01
+
 MIME_TYPES = ['application', 'audio', 'example', 'font', 'image', 'message', 'model', 'multipart', 'text', 'video']
 
 
@@ -399,6 +431,7 @@ class Web:
         self.order = ORDER_WEB[:]
         self.definitions = deepcopy(CHARTS_WEB)
         self.pre_filter = check_patterns('filter', self.configuration.get('filter'))
+        self.batch_parsing = self.configuration.get('batch_parsing', True)
         self.storage = dict()
         self.data = {
             'bytes_sent': 0,
@@ -448,7 +481,12 @@ class Web:
             self.error(error)
             return False
 
-        self.storage['unique_all_time'] = list()
+        self.storage['unique_all_time'] = create_unique_clients(self.configuration)
+        if self.storage['unique_all_time'] is None:
+            self.error('bad all time mode {0}. Supported modes: {1}'.format(self.configuration.get('all_time_mode'),
+                                                                           ALL_TIME_MODES))
+            return False
+        self.storage['fields'] = [f for f in WEB_FIELDS if f in self.storage['regex'].groupindex]
         self.storage['url_pattern'] = check_patterns('url_pattern', self.configuration.get('categories'))
         self.storage['user_pattern'] = check_patterns('user_pattern', self.configuration.get('user_defined'))
 
@@ -539,10 +577,126 @@ class Web:
 
         filtered_data = filter_data(raw_data=raw_data, pre_filter=self.pre_filter)
 
+        if self.batch_parsing:
+            self.get_data_batch(filtered_data)
+        else:
+            self.get_data_per_line(filtered_data)
+
+        if self.configuration.get('all_time', True):
+            self.data['unique_tot_ipv4'] = self.storage['unique_all_time'].count('ipv4')
+            self.data['unique_tot_ipv6'] = self.storage['unique_all_time'].count('ipv6')
+
+        # histogram
+        if 'bucket_index' in self.storage:
+            buckets = self.storage['buckets']
+            upstream_buckets = self.storage['upstream_buckets']
+            for i in range(0, len(self.storage['bucket_index'])):
+                hist_key = 'response_time_hist_%d' % i
+                upstream_hist_key = 'response_time_upstream_hist_%d' % i
+                self.data[hist_key] = buckets[i]
+                self.data[upstream_hist_key] = upstream_buckets[i]
+
+        return self.data
+
+    def get_data_batch(self, lines):
+        """
+        :param lines: iterable of log lines
+        :return:
+        Matches all the lines first, extracting only the fields that are used, then aggregates every field
+        column at once. Helpers are called once per distinct value (code, request, address) with its count.
+        """
+        fields = self.storage['fields']
+        search = self.storage['regex'].search
+        rows = list()
+        unmatched = 0
+
+        for line in lines:
+            match = search(line)
+            if match:
+                rows.append(match.group(*fields))
+            else:
+                unmatched += 1
+
+        self.data['unmatched'] += unmatched
+        if not rows:
+            return
+
+        columns = dict(zip(fields, zip(*rows)))
+
+        # response codes, detailed response codes and response statuses
+        detailed = self.configuration.get('detailed_response_codes', True)
+        for code, count in Counter(columns['code']).items():
+            code_class = code[0] + 'xx'
+            self.data[code_class if code_class in self.data else '0xx'] += count
+            if detailed:
+                self.get_data_per_response_codes_detailed(code=code, count=count)
+            self.get_data_per_statuses(code=code, count=count)
+
+        # requests per user defined pattern
+        if self.storage['user_pattern'] and 'user_defined' in columns:
+            for row, count in Counter(columns['user_defined']).items():
+                self.get_data_per_pattern(row=row,
+                                          other='user_pattern_other',
+                                          pattern=self.storage['user_pattern'],
+                                          count=count)
+
+        # method, url, http version, port, vhost
+        request_fields = [f for f in REQUEST_FIELDS if f in columns]
+        if request_fields:
+            request_columns = [columns[f] for f in request_fields]
+            for values, count in Counter(zip(*request_columns)).items():
+                self.get_data_from_request_field(match_dict=dict(zip(request_fields, values)), count=count)
+
+        # bandwidth sent and received
+        self.data['bytes_sent'] += sum(int(v) for v in columns['bytes_sent'] if '-' not in v)
+        if 'resp_length' in columns:
+            self.data['resp_length'] += sum(int(v) for v in columns['resp_length'] if '-' not in v)
+
+        # request processing time
+        func_resp_time = self.storage['func_resp_time']
+        if 'resp_time' in columns:
+            times = [func_resp_time(float(v)) for v in columns['resp_time']]
+            self.get_data_timings('resp_time', times, self.storage.get('buckets'))
+        if 'resp_time_upstream' in columns:
+            times = [func_resp_time(float(v)) for v in columns['resp_time_upstream'] if v != '-']
+            if times:
+                self.get_data_timings('resp_time_upstream', times, self.storage.get('upstream_buckets'))
+
+        # requests per ip proto and unique clients ips
+        all_time = self.configuration.get('all_time', True)
+        for address, count in Counter(columns['address']).items():
+            proto = 'ipv6' if ':' in address else 'ipv4'
+            self.data['req_' + proto] += count
+            self.data['unique_cur_' + proto] += 1
+            if all_time:
+                self.storage['unique_all_time'].add(address, proto)
+
+    def get_data_timings(self, key, times, buckets):
+        """
+        :param key: str: 'resp_time' or 'resp_time_upstream'
+        :param times: list of response times (microseconds)
+        :param buckets: histogram buckets or None
+        :return:
+        """
+        self.data[key + '_min'] += min(times)
+        self.data[key + '_avg'] += sum(times) / len(times)
+        self.data[key + '_max'] += max(times)
+
+        if buckets is None:
+            return
+        times_ms = sorted(t / 1000 for t in times)
+        for i, le in enumerate(self.storage['bucket_index']):
+            buckets[i] += bisect.bisect_right(times_ms, le)
+
+    def get_data_per_line(self, lines):
+        """
+        :param lines: iterable of log lines
+        :return:
+        """
         unique_current = set()
         timings = defaultdict(lambda: dict(minimum=None, maximum=0, summary=0, count=0))
 
-        for line in filtered_data:
+        for line in lines:
             match = self.storage['regex'].search(line)
             if match:
                 match_dict = match.groupdict()
@@ -579,16 +733,14 @@ class Web:
                     resp_time_upstream = self.storage['func_resp_time'](float(match_dict['resp_time_upstream']))
                     get_timings(timings=timings['resp_time_upstream'], time=resp_time_upstream)
                     if 'bucket_index' in self.storage:
-                        get_hist(self.storage['bucket_index'], self.storage['upstream_buckets'], resp_time / 1000)
+                        get_hist(self.storage['bucket_index'], self.storage['upstream_buckets'],
+                                 resp_time_upstream / 1000)
                 # requests per ip proto
                 proto = 'ipv6' if ':' in match_dict['address'] else 'ipv4'
                 self.data['req_' + proto] += 1
                 # unique clients ips
                 if self.configuration.get('all_time', True):
-                    if address_not_in_pool(pool=self.storage['unique_all_time'],
-                                           address=match_dict['address'],
-                                           pool_size=self.data['unique_tot_ipv4'] + self.data['unique_tot_ipv6']):
-                        self.data['unique_tot_' + proto] += 1
+                    self.storage['unique_all_time'].add(match_dict['address'], proto)
                 if match_dict['address'] not in unique_current:
                     self.data['unique_cur_' + proto] += 1
                     unique_current.add(match_dict['address'])
@@ -601,18 +753,6 @@ class Web:
             self.data[elem + '_avg'] += timings[elem]['summary'] / timings[elem]['count']
             self.data[elem + '_max'] += timings[elem]['maximum']
 
-        # histogram
-        if 'bucket_index' in self.storage:
-            buckets = self.storage['buckets']
-            upstream_buckets = self.storage['upstream_buckets']
-            for i in range(0, len(self.storage['bucket_index'])):
-                hist_key = 'response_time_hist_%d' % i
-                upstream_hist_key = 'response_time_upstream_hist_%d' % i
-                self.data[hist_key] = buckets[i]
-                self.data[upstream_hist_key] = upstream_buckets[i]
-
-        return self.data
-
     def find_regex(self, last_line):
         """
         :param last_line: str: literally last line from log file
@@ -779,7 +919,7 @@ class Web:
         self.storage['regex'] = regex
         return find_regex_return(match_dict=match_dict)
 
-    def get_data_from_request_field(self, match_dict):
+    def get_data_from_request_field(self, match_dict, count=1):
         if match_dict.get('request'):
             match_dict = REQUEST_REGEX.search(match_dict['request'])
             if match_dict:
@@ -790,7 +930,8 @@ class Web:
         if match_dict.get('url') and self.storage['url_pattern']:
             self.get_data_per_pattern(row=match_dict['url'],
                                       other='url_pattern_other',
-                                      pattern=self.storage['url_pattern'])
+                                      pattern=self.storage['url_pattern'],
+                                      count=count)
         # requests per http method
         if match_dict.get('method'):
             if match_dict['method'] not in self.data:
@@ -798,7 +939,7 @@ class Web:
                                                           match_dict['method'],
                                                           'incremental'])
                 self.data[match_dict['method']] = 0
-            self.data[match_dict['method']] += 1
+            self.data[match_dict['method']] += count
         # requests per http version
         if match_dict.get('http_version'):
             dim_id = match_dict['http_version'].replace('.', '_')
@@ -807,7 +948,7 @@ class Web:
                                                            match_dict['http_version'],
                                                            'incremental'])
                 self.data[dim_id] = 0
-            self.data[dim_id] += 1
+            self.data[dim_id] += count
         # requests per port number
         if match_dict.get('port'):
             if match_dict['port'] not in self.data:
@@ -815,7 +956,7 @@ class Web:
                                                    match_dict['port'],
                                                    'incremental'])
                 self.data[match_dict['port']] = 0
-            self.data[match_dict['port']] += 1
+            self.data[match_dict['port']] += count
         # requests per vhost
         if match_dict.get('vhost'):
             dim_id = match_dict['vhost'].replace('.', '_')
@@ -824,11 +965,12 @@ class Web:
                                                    match_dict['vhost'],
                                                    'incremental'])
                 self.data[dim_id] = 0
-            self.data[dim_id] += 1
+            self.data[dim_id] += count
 
-    def get_data_per_response_codes_detailed(self, code):
+    def get_data_per_response_codes_detailed(self, code, count=1):
         """
         :param code: str: CODE from parsed line. Ex.: '202, '499'
+        :param count: int: number of lines with the CODE
         :return:
         Calls add_new_dimension method If the value is found for the first time
         """
@@ -841,13 +983,14 @@ class Web:
                 chart_key = 'detailed_response_codes' + DET_RESP_AGGR[code_index]
                 self.charts[chart_key].add_dimension([code, code, 'incremental'])
                 self.data[code] = 0
-        self.data[code] += 1
+        self.data[code] += count
 
-    def get_data_per_pattern(self, row, other, pattern):
+    def get_data_per_pattern(self, row, other, pattern, count=1):
         """
         :param row: str:
         :param other: str:
         :param pattern: named tuple: (['pattern_description', 'regular expression'])
+        :param count: int: number of lines with the row
         :return:
         Scan through string looking for the first location where patterns produce a match for all user
         defined patterns
@@ -855,28 +998,29 @@ class Web:
         match = None
         for elem in pattern:
             if elem.func(row):
-                self.data[elem.description] += 1
+                self.data[elem.description] += count
                 match = True
                 break
         if not match:
-            self.data[other] += 1
+            self.data[other] += count
 
-    def get_data_per_statuses(self, code):
+    def get_data_per_statuses(self, code, count=1):
         """
         :param code: str: response status code. Ex.: '202', '499'
+        :param count: int: number of lines with the code
         :return:
         """
         code_class = code[0]
         if code_class == '2' or code == '304' or code_class == '1':
-            self.data['successful_requests'] += 1
+            self.data['successful_requests'] += count
         elif code_class == '3':
-            self.data['redirects'] += 1
+            self.data['redirects'] += count
         elif code_class == '4':
-            self.data['bad_requests'] += 1
+            self.data['bad_requests'] += count
         elif code_class == '5':
-            self.data['server_errors'] += 1
+            self.data['server_errors'] += count
         else:
-            self.data['other_requests'] += 1
+            self.data['other_requests'] += count
 
 
 class ApacheCache:
@@ -943,7 +1087,11 @@ class Squid:
         last_line = read_last_line(self.log_path)
         if not last_line:
             return False
-        self.storage['unique_all_time'] = list()
+        self.storage['unique_all_time'] = create_unique_clients(self.configuration)
+        if self.storage['unique_all_time'] is None:
+            self.error('bad all time mode {0}. Supported modes: {1}'.format(self.configuration.get('all_time_mode'),
+                                                                           ALL_TIME_MODES))
+            return False
         self.storage['regex'] = re.compile(r'[0-9.]+\s+(?P<duration>[0-9]+)'
                                            r' (?P<client_address>[\da-f.:]+)'
                                            r' (?P<squid_code>[A-Z_]+)/'
@@ -1014,10 +1162,7 @@ class Squid:
                 proto = 'ipv4' if '.' in match['client_address'] else 'ipv6'
                 # unique clients ips
                 if self.configuration.get('all_time', True):
-                    if address_not_in_pool(pool=self.storage['unique_all_time'],
-                                           address=match['client_address'],
-                                           pool_size=self.data['unique_tot_ipv4'] + self.data['unique_tot_ipv6']):
-                        self.data['unique_tot_' + proto] += 1
+                    self.storage['unique_all_time'].add(match['client_address'], proto)
 
                 if match['client_address'] not in unique_ip:
                     self.data['unique_' + proto] += 1
@@ -1041,6 +1186,10 @@ class Squid:
             self.data[elem + '_min'] += timings[elem]['minimum']
             self.data[elem + '_avg'] += timings[elem]['summary'] / timings[elem]['count']
             self.data[elem + '_max'] += timings[elem]['maximum']
+
+        if self.configuration.get('all_time', True):
+            self.data['unique_tot_ipv4'] = self.storage['unique_all_time'].count('ipv4')
+            self.data['unique_tot_ipv6'] = self.storage['unique_all_time'].count('ipv6')
         return self.data
 
     def get_data_per_statuses(self, code):
@@ -1112,21 +1261,102 @@ def get_hist(index, buckets, time):
             break
 
 
-def address_not_in_pool(pool, address, pool_size):
+def pack_address(address):
     """
-    :param pool: list of ip addresses
-    :param address: ip address
-    :param pool_size: current pool size
-    :return: True if address not in pool. False otherwise.
+    :param address: str: ip address. Ex.: '127.0.0.1', '::1'
+    :return: int: packed address OR the address if it can not be packed. Ex.: 'localhost'
     """
-    index = bisect.bisect_left(pool, address)
-    if index < pool_size:
-        if pool[index] == address:
-            return False
-        bisect.insort_left(pool, address)
-        return True
-    bisect.insort_left(pool, address)
-    return True
+    try:
+        if ':' in address:
+            return int(hexlify(socket.inet_pton(socket.AF_INET6, address)), 16)
+        return int(hexlify(socket.inet_pton(socket.AF_INET, address)), 16)
+    except (socket.error, ValueError):
+        return address
+
+
+def create_unique_clients(configuration):
+    """
+    :param configuration: dict: job configuration
+    :return: UniqueClients OR None if "all_time_mode" is not supported
+    """
+    mode = configuration.get('all_time_mode', 'exact')
+    if mode not in ALL_TIME_MODES:
+        return None
+    return UniqueClients(approximate=mode == 'approximate',
+                         max_exact=configuration.get('all_time_max_exact', ALL_TIME_MAX_EXACT),
+                         error=configuration.get('all_time_error', ALL_TIME_ERROR))
+
+
+class HyperLogLog:
+    """
+    Approximate count of distinct keys in constant memory (2 ** precision bytes).
+    """
+    def __init__(self, error):
+        """
+        :param error: float: relative standard error, precision is chosen to match it (4..18 bits)
+        """
+        precision = int(math.ceil(math.log((1.04 / error) ** 2, 2)))
+        self.precision = min(max(precision, 4), 18)
+        self.size = 1 << self.precision
+        self.registers = bytearray(self.size)
+        self.alpha = 0.7213 / (1 + 1.079 / self.size)
+        # kept up to date on every register change, so counting does not need to scan the registers
+        self.zeros = self.size
+        self.inverse_sum = float(self.size)
+
+    def add(self, key):
+        value = struct.unpack('<Q', md5(str(key).encode()).digest()[:8])[0]
+        index = value >> (64 - self.precision)
+        rank = 64 - self.precision - (value & ((1 << (64 - self.precision)) - 1)).bit_length() + 1
+        old = self.registers[index]
+        if rank > old:
+            if not old:
+                self.zeros -= 1
+            self.inverse_sum += 2.0 ** -rank - 2.0 ** -old
+            self.registers[index] = rank
+
+    def __len__(self):
+        estimate = self.alpha * self.size * self.size / self.inverse_sum
+        if estimate <= 2.5 * self.size and self.zeros:
+            estimate = self.size * math.log(float(self.size) / self.zeros)
+        return int(round(estimate))
+
+
+class UniqueClients:
+    """
+    All time unique client addresses per ip proto.
+
+    Addresses are packed into integers and kept in a set until there are more than "max_exact" of them,
+    then the set is replaced with a HyperLogLog estimator. In approximate mode the estimator is used from the start.
+    """
+    def __init__(self, approximate=False, max_exact=ALL_TIME_MAX_EXACT, error=ALL_TIME_ERROR):
+        """
+        :param approximate: bool
+        :param max_exact: int: 0 - no limit
+        :param error: float: relative standard error of the estimator
+        """
+        self.max_exact = max_exact
+        self.error = error
+        self.stores = dict()
+        for proto in ('ipv4', 'ipv6'):
+            self.stores[proto] = HyperLogLog(error) if approximate else set()
+
+    def add(self, address, proto):
+        """
+        :param address: str: ip address
+        :param proto: str: 'ipv4' or 'ipv6'
+        :return:
+        """
+        store = self.stores[proto]
+        store.add(pack_address(address))
+        if isinstance(store, set) and self.max_exact and len(store) > self.max_exact:
+            estimator = HyperLogLog(self.error)
+            for key in store:
+                estimator.add(key)
+            self.stores[proto] = estimator
+
+    def count(self, proto):
+        return len(self.stores[proto])
 
 
 def find_regex_return(match_dict=None, msg='Generic error message'):
@@ -0,0 +1,134 @@
+#!/usr/bin/env python3
+# SPDX-License-Identifier: GPL-3.0-or-later
+#
+# Compares the python.d isc_dhcpd incremental leases parser and pool index with parsing the whole leases file
+# and checking every lease against every pool, on the first read and after dhcpd appended a few leases.
+#
+# Usage: ./benchmark-dhcpd-leases.py [leases] [pools]
+
+import ipaddress
+import os
+import random
+import sys
+import tempfile
+import time
+
+from collections import defaultdict
+
+PLUGIN_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), '../../collectors/python.d.plugin')
+
+sys.path.append(os.path.join(PLUGIN_DIR, 'python_modules'))
+
+if sys.version_info[:2] > (3, 1):
+    from importlib.machinery import SourceFileLoader
+else:
+    from imp import load_source as SourceFileLoader
+
+isc_dhcpd = SourceFileLoader('isc_dhcpd', os.path.join(PLUGIN_DIR, 'isc_dhcpd/isc_dhcpd.chart.py')).load_module()
+
+LEASE = '''lease {address} {{
+  starts 3 2019/01/02 10:00:00;
+  ends {ends};
+  cltt 3 2019/01/02 10:00:00;
+  binding state {state};
+  next binding state free;
+  rewind binding state free;
+  hardware ethernet 00:11:22:33:44:55;
+  client-hostname "host";
+}}
+'''
+
+
+def old_parse(path):
+    with open(path) as leases:
+        result = defaultdict(dict)
+        for row in leases:
+            row = row.strip()
+            if row.startswith('lease'):
+                address = row[6:-2]
+            elif row.startswith('ends'):
+                result[address]['ends'] = row[5:-1]
+            elif row.startswith('binding state'):
+                result[address]['state'] = row[14:-1]
+        return dict((k, v) for k, v in result.items() if len(v) == 2)
+
+
+def old_counts(path, networks):
+    """
+    what the module did before on every leases file change
+    """
+    current_time = time.mktime(time.gmtime())
+    active = list()
+    for address, lease in old_parse(path).items():
+        ends = time.mktime(time.strptime(lease['ends'], '%w %Y/%m/%d %H:%M:%S'))
+        if ends - current_time > 0 and lease['state'] == 'active':
+            active.append(ipaddress.ip_address(address))
+    return [len([ip for ip in active if ip in network]) for network in networks]
+
+
+def new_counts(leases_file, pools, addresses):
+    current_time = time.time()
+    active = defaultdict(list)
+    for address, (ends, state) in leases_file.get_data().items():
+        if state != 'active' or ends is None or ends <= current_time:
+            continue
+        if address not in addresses:
+            addresses[address] = isc_dhcpd.lease_address(address)
+        version, value = addresses[address]
+        active[version].append(value)
+    for values in active.values():
+        values.sort()
+    return [pool.count(active[pool.version]) for pool in pools]
+
+
+def lease(address):
+    # far enough from now to not depend on the local time zone
+    ends = time.strftime('%w %Y/%m/%d %H:%M:%S', time.gmtime(time.time() + random.choice([-3, 3]) * 86400))
+    return LEASE.format(address=address, ends=ends, state=random.choice(['active', 'active', 'free']))
+
+
+def bench(name, func):
+    started = time.perf_counter()
+    result = func()
+    print('{0:<40} {1:10.2f} ms'.format(name, (time.perf_counter() - started) * 1e3))
+    return result
+
+
+def main():
+    leases = int(sys.argv[1]) if len(sys.argv) > 1 else 100000
+    pools = int(sys.argv[2]) if len(sys.argv) > 2 else 300
+
+    random.seed(1)
+    networks = [ipaddress.ip_network(u'10.{0}.{1}.0/24'.format(i // 256, i % 256)) for i in range(pools)]
+    hosts = [str(network[random.randint(1, 254)]) for network in networks for _ in range(leases // pools)]
+
+    fd, path = tempfile.mkstemp(prefix='dhcpd.leases.')
+    with os.fdopen(fd, 'w') as fp:
+        for address in hosts:
+            fp.write(lease(address))
+    print('{0:.2f} MiB, {1} leases, {2} pools'.format(os.path.getsize(path) / float(1 << 20), len(hosts), pools))
+
+    leases_file = isc_dhcpd.DhcpdLeasesFile(path)
+    index = [isc_dhcpd.Pool(str(network), str(network)) for network in networks]
+    addresses = dict()
+
+    try:
+        old = bench('old: whole file, every lease and pool', lambda: old_counts(path, networks))
+        new = bench('new: first read', lambda: new_counts(leases_file, index, addresses))
+        if old != new:
+            sys.exit('pools counts differ')
+
+        with open(path, 'a') as fp:
+            for address in random.sample(hosts, 100):
+                fp.write(lease(address))
+
+        old = bench('old: 100 leases appended', lambda: old_counts(path, networks))
+        new = bench('new: 100 leases appended', lambda: new_counts(leases_file, index, addresses))
+        if old != new:
+            sys.exit('pools counts differ')
+    finally:
+        os.remove(path)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,81 @@
+#!/usr/bin/env python3
+# SPDX-License-Identifier: GPL-3.0-or-later
+#
+# Compares running a command from a large python.d plugin process (forking the whole process on every command)
+# with running it in the python.d forkserver helper started while the process was small.
+#
+# Python 3.10+ spawns commands with vfork() on Linux, the 'fork' argument makes it fork like the older versions do.
+#
+# Usage: ./benchmark-forkserver.py [plugin heap MiB] [commands] [fork]
+
+import os
+import subprocess
+import sys
+import threading
+import time
+
+PLUGIN_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), '../../collectors/python.d.plugin')
+
+sys.path.append(os.path.join(PLUGIN_DIR, 'python_modules'))
+
+from bases.forkserver import FORKSERVER, execute
+
+COMMAND = ['/bin/true']
+
+
+def old_run():
+    """
+    what ExecutableService did before on every update
+    """
+    process = subprocess.Popen(COMMAND, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+    for _ in process.stdout:
+        pass
+    process.wait()
+
+
+def new_run():
+    execute(COMMAND)
+
+
+def bench(name, func, commands):
+    timings = list()
+    for _ in range(commands):
+        started = time.perf_counter()
+        func()
+        timings.append(time.perf_counter() - started)
+    timings.sort()
+    print('{0:<12} mean {1:8.2f} ms, p99 {2:8.2f} ms'.format(
+        name,
+        sum(timings) / len(timings) * 1e3,
+        timings[int(len(timings) * 0.99)] * 1e3,
+    ))
+
+
+def main():
+    heap = int(sys.argv[1]) if len(sys.argv) > 1 else 1024
+    commands = int(sys.argv[2]) if len(sys.argv) > 2 else 200
+    if len(sys.argv) > 3 and sys.argv[3] == 'fork':
+        subprocess._USE_VFORK = False
+
+    FORKSERVER.start()
+
+    # the plugin after the modules are loaded and the jobs are running
+    ballast = [bytearray(1 << 20) for _ in range(heap)]
+    for chunk in ballast:
+        chunk[::4096] = b'x' * len(chunk[::4096])
+    stop = threading.Event()
+    threads = [threading.Thread(target=stop.wait) for _ in range(20)]
+    for thread in threads:
+        thread.start()
+
+    print('{0} MiB heap, {1} threads, {2} commands'.format(heap, len(threads) + 1, commands))
+    try:
+        bench('popen', old_run, commands)
+        bench('forkserver', new_run, commands)
+    finally:
+        stop.set()
+        FORKSERVER.stop()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,125 @@
+#!/usr/bin/env python3
+# SPDX-License-Identifier: GPL-3.0-or-later
+#
+# Compares the python.d compiled metric paths extractor with walking every dotted metric path on every update
+# and with flattening the whole document.
+#
+# Usage: ./benchmark-json-metric-paths.py [iterations]
+
+import os
+import random
+import sys
+import time
+
+PLUGIN_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), '../../collectors/python.d.plugin')
+
+sys.path.append(os.path.join(PLUGIN_DIR, 'python_modules'))
+
+from bases.extractor import MetricExtractor
+
+
+def fetch_data(raw_data, metrics):
+    """
+    the per path lookup the modules used before
+    """
+    data = dict()
+    for metric in metrics:
+        value = raw_data
+        metrics_list = metric.split('.')
+        try:
+            for m in metrics_list:
+                value = value[m]
+        except KeyError:
+            continue
+        data['_'.join(metrics_list)] = value
+    return data
+
+
+def flatten(d, top='', sep='.'):
+    items = []
+    for key, val in d.items():
+        nkey = top + sep + key if top else key
+        if isinstance(val, dict):
+            items.extend(flatten(val, nkey, sep=sep).items())
+        else:
+            items.append((nkey, val))
+    return dict(items)
+
+
+def generate_document(depth, width):
+    """
+    node stats like document, width ** depth leaves
+    """
+    if not depth:
+        return random.randint(0, 1 << 32)
+    return dict(('key{0}'.format(i), generate_document(depth - 1, width)) for i in range(width))
+
+
+def leaf_paths(document, top=''):
+    paths = list()
+    for key, value in document.items():
+        path = top + '.' + key if top else key
+        if isinstance(value, dict):
+            paths.extend(leaf_paths(value, path))
+        else:
+            paths.append(path)
+    return paths
+
+
+def bench(name, func, iterations, repeat=5):
+    best = None
+    for _ in range(repeat):
+        started = time.perf_counter()
+        for _ in range(iterations):
+            result = func()
+        elapsed = time.perf_counter() - started
+        best = elapsed if best is None else min(best, elapsed)
+    print('{0:<40} {1:10.2f} us/op'.format(name, best / iterations * 1e6))
+    return result
+
+
+def main():
+    iterations = int(sys.argv[1]) if len(sys.argv) > 1 else 2000
+
+    random.seed(1)
+    document = generate_document(4, 7)
+    # metrics share path prefixes, like the node stats ones do
+    paths = [p for p in leaf_paths(document) if p.startswith(('key0.key1.', 'key3.key3.key0.'))]
+    extractor = MetricExtractor(paths)
+
+    print('{0} leaves, {1} metrics'.format(len(leaf_paths(document)), len(paths)))
+    old = bench('split and walk every path', lambda: fetch_data(document, paths), iterations)
+    new = bench('compiled extractor', lambda: extractor.extract(document), iterations)
+    if old != new:
+        sys.exit('extracted data differs')
+
+    dotted = MetricExtractor(paths, key_sep='.')
+    def flattened():
+        flat = flatten(document)
+        return dict((p, flat[p]) for p in paths)
+
+    old = bench('flatten the document (go_expvar)', flattened, iterations)
+    new = bench('compiled extractor (dotted keys)', lambda: dotted.extract(document), iterations)
+    if old != new:
+        sys.exit('extracted data differs')
+
+    # per node maps
+    nodes = dict(('node{0}'.format(i), generate_document(3, 6)) for i in range(20))
+    node_paths = random.sample(leaf_paths(nodes['node0']), 30)
+    wildcard = MetricExtractor(['nodes.*.' + p for p in node_paths])
+
+    def per_node():
+        data = dict()
+        for node, stats in nodes.items():
+            for key, value in fetch_data(stats, node_paths).items():
+                data['nodes_{0}_{1}'.format(node, key)] = value
+        return data
+
+    old = bench('split and walk every path, per node', per_node, iterations)
+    new = bench('compiled extractor, wildcard', lambda: wildcard.extract({'nodes': nodes}), iterations)
+    if old != new:
+        sys.exit('extracted data differs')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,123 @@
+#!/usr/bin/env python3
+# SPDX-License-Identifier: GPL-3.0-or-later
+#
+# Compares the python.d streaming JSON decoding of the wanted subtrees with decoding the whole response,
+# peak memory and time.
+#
+# Usage: ./benchmark-json-streaming.py [indices] [nodes]
+
+import json
+import os
+import random
+import sys
+import time
+import tracemalloc
+
+PLUGIN_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), '../../collectors/python.d.plugin')
+
+sys.path.append(os.path.join(PLUGIN_DIR, 'python_modules'))
+
+from bases.extractor import MetricExtractor
+
+CHUNK_SIZE = 65536
+
+STATS = [
+    'docs.count',
+    'docs.deleted',
+    'store.size_in_bytes',
+    'indexing.index_total',
+    'indexing.index_time_in_millis',
+    'search.query_total',
+    'search.query_time_in_millis',
+    'search.fetch_total',
+    'merges.total',
+    'refresh.total',
+    'flush.total',
+]
+
+
+def generate_index():
+    return dict((section, dict((key, random.randint(0, 1 << 40)) for key in keys)) for section, keys in [
+        ('docs', ['count', 'deleted']),
+        ('store', ['size_in_bytes', 'reserved_in_bytes']),
+        ('indexing', ['index_total', 'index_time_in_millis', 'index_current', 'delete_total', 'noop_update_total']),
+        ('search', ['query_total', 'query_time_in_millis', 'fetch_total', 'fetch_time_in_millis', 'scroll_total']),
+        ('merges', ['current', 'total', 'total_time_in_millis', 'total_docs', 'total_size_in_bytes']),
+        ('refresh', ['total', 'total_time_in_millis', 'listeners']),
+        ('flush', ['total', 'periodic', 'total_time_in_millis']),
+        ('segments', ['count', 'memory_in_bytes', 'terms_memory_in_bytes', 'stored_fields_memory_in_bytes']),
+    ])
+
+
+def generate_response(indices):
+    """
+    node stats like response with per index stats, the module needs only the node totals
+    """
+    node = {
+        'name': 'node-1',
+        'indices': generate_index(),
+        'shards': dict(('index-{0:05d}'.format(i), [generate_index()]) for i in range(indices)),
+    }
+    return json.dumps({'cluster_name': 'bench', 'nodes': {'node-id': node}}).encode()
+
+
+def generate_cluster_response(nodes):
+    """
+    node stats like response of a large cluster, the module needs a few stats of every node
+    """
+    return json.dumps({'cluster_name': 'bench', 'nodes': dict(
+        ('node-{0:05d}'.format(i), {'name': 'node-{0}'.format(i), 'host': '10.0.0.1', 'indices': generate_index()})
+        for i in range(nodes)
+    )}).encode()
+
+
+def chunks(body):
+    for offset in range(0, len(body), CHUNK_SIZE):
+        yield body[offset:offset + CHUNK_SIZE]
+
+
+def full(body, extractor):
+    # what UrlService does without streaming: joined body, decoded text, decoded document
+    data = b''.join(chunks(body)).decode()
+    return extractor.extract(json.loads(data))
+
+
+def streaming(body, extractor):
+    return extractor.extract(extractor.load(chunks(body)))
+
+
+def measure(name, func, body, extractor):
+    # timed without tracing, it slows down the python code more than the C decoder
+    started = time.perf_counter()
+    result = func(body, extractor)
+    elapsed = time.perf_counter() - started
+    tracemalloc.start()
+    func(body, extractor)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    print('{0:<10} {1:8.3f} s, peak {2:8.2f} MiB'.format(name, elapsed, peak / float(1 << 20)))
+    return result
+
+
+def compare(body, extractor):
+    print('response {0:.2f} MiB'.format(len(body) / float(1 << 20)))
+    old = measure('full', full, body, extractor)
+    new = measure('streaming', streaming, body, extractor)
+    if old != new:
+        sys.exit('extracted data differs')
+
+
+def main():
+    indices = int(sys.argv[1]) if len(sys.argv) > 1 else 5000
+    nodes = int(sys.argv[2]) if len(sys.argv) > 2 else 2000
+
+    random.seed(1)
+    extractor = MetricExtractor(['nodes.*.indices.' + stat for stat in STATS])
+    print('one node, {0} indices'.format(indices))
+    compare(generate_response(indices), extractor)
+    print('{0} nodes'.format(nodes))
+    compare(generate_cluster_response(nodes), extractor)
+
+
+if __name__ == '__main__':
+    main()
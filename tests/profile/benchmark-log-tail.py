@@ -0,0 +1,90 @@
+#!/usr/bin/env python3
+# SPDX-License-Identifier: GPL-3.0-or-later
+#
+# Compares the python.d shared log tail engine with every job opening and reading the log file on its own,
+# for several jobs tailing the same log.
+#
+# Usage: ./benchmark-log-tail.py [jobs] [lines per update] [updates]
+
+import os
+import sys
+import tempfile
+import time
+
+PLUGIN_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), '../../collectors/python.d.plugin')
+
+sys.path.append(os.path.join(PLUGIN_DIR, 'python_modules'))
+
+from bases.FrameworkServices.LogService import split_lines
+from bases.tail import TAIL_ENGINE
+
+LINE = '10.0.0.1 - - [22/Mar/2017:11:41:53 +0300] "GET /api/v1/data?chart=system.cpu HTTP/1.1" 200 1234 321 0.1 0.0 ' \
+       '"-" "curl/7.52.1"\n'
+
+
+class OldTail:
+    """
+    what LogService did before on every update
+    """
+    def __init__(self, path):
+        self.path = path
+        self.position = os.path.getsize(path)
+
+    def read(self):
+        lines = list()
+        size = os.path.getsize(self.path)
+        if size == self.position:
+            return lines
+        elif size < self.position:
+            self.position = 0
+        with open(self.path, errors='replace') as fp:
+            fp.seek(self.position)
+            for line in fp:
+                lines.append(line)
+            self.position = fp.tell()
+        return lines
+
+
+class NewTail:
+    def __init__(self, path):
+        self.subscription = TAIL_ENGINE.subscribe(path)
+
+    def read(self):
+        return split_lines(self.subscription.read())
+
+
+def bench(name, tail_cls, path, jobs, lines, updates):
+    tails = [tail_cls(path) for _ in range(jobs)]
+    chunk = LINE * lines
+    elapsed = 0
+    read = 0
+    for _ in range(updates):
+        with open(path, 'a') as fp:
+            fp.write(chunk)
+        started = time.perf_counter()
+        for tail in tails:
+            read += len(tail.read())
+        elapsed += time.perf_counter() - started
+    print('{0:<10} {1:10.1f} us/update, {2} lines read'.format(name, elapsed / updates * 1e6, read))
+    return read
+
+
+def main():
+    jobs = int(sys.argv[1]) if len(sys.argv) > 1 else 4
+    lines = int(sys.argv[2]) if len(sys.argv) > 2 else 1000
+    updates = int(sys.argv[3]) if len(sys.argv) > 3 else 200
+
+    fd, path = tempfile.mkstemp(prefix='access.log.')
+    os.close(fd)
+    print('{0} jobs, {1} lines per update'.format(jobs, lines))
+    try:
+        old = bench('old', OldTail, path, jobs, lines, updates)
+        new = bench('shared', NewTail, path, jobs, lines, updates)
+        if old != new:
+            sys.exit('read lines differ')
+    finally:
+        os.remove(path)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,120 @@
+#!/usr/bin/env python3
+# SPDX-License-Identifier: GPL-3.0-or-later
+#
+# Compares the batch and the per line parsers of the python.d web_log module.
+#
+# Usage: ./benchmark-web-log-parsing.py [lines per iteration] [iterations]
+
+import importlib.util
+import os
+import random
+import sys
+import tempfile
+import time
+from collections import defaultdict
+
+PLUGIN_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), '../../collectors/python.d.plugin')
+
+sys.path.append(os.path.join(PLUGIN_DIR, 'python_modules'))
+
+spec = importlib.util.spec_from_file_location('web_log', os.path.join(PLUGIN_DIR, 'web_log/web_log.chart.py'))
+web_log = importlib.util.module_from_spec(spec)
+spec.loader.exec_module(web_log)
+
+METHODS = ['GET'] * 8 + ['POST', 'HEAD']
+CODES = ['200'] * 20 + ['304'] * 3 + ['301', '302', '404', '404', '499', '500', '502']
+URLS = ['/', '/index.html', '/api/v1/items', '/api/v1/users', '/static/app.js', '/static/app.css', '/login']
+
+
+class Chart:
+    def add_dimension(self, dimension):
+        pass
+
+
+class Service:
+    def __init__(self, log_path, configuration):
+        self.log_path = log_path
+        self.configuration = configuration
+        self.charts = defaultdict(Chart)
+
+    def info(self, *args):
+        pass
+
+    def error(self, *args):
+        print(*args)
+
+
+def generate_lines(count, clients):
+    """
+    nginx log format with request time and upstream response time
+    """
+    lines = list()
+    for _ in range(count):
+        address = clients[random.randint(0, len(clients) - 1)]
+        request = '{0} {1}?id={2} HTTP/1.1'.format(
+            random.choice(METHODS), random.choice(URLS), random.randint(0, 1000))
+        lines.append('{0} - - [22/Mar/2017:11:41:53 +0300] "{1}" {2} {3} {4} {5:.3f} {6:.3f} "-" "curl"\n'.format(
+            address,
+            request,
+            random.choice(CODES),
+            random.randint(100, 100000),
+            random.randint(100, 1000),
+            random.random(),
+            random.random(),
+        ))
+    return lines
+
+
+def create_job(log_path, batch_parsing):
+    configuration = {
+        'path': log_path,
+        'batch_parsing': batch_parsing,
+        'histogram': [1, 3, 10, 30, 100, 300, 1000],
+        'categories': {'api': '^/api/', 'static': '^/static/'},
+    }
+    job = web_log.Web(Service(log_path, configuration))
+    if not job.check():
+        sys.exit('check failed')
+    return job
+
+
+def run(job, chunks):
+    started = time.perf_counter()
+    for chunk in chunks:
+        job.get_data(chunk)
+    return time.perf_counter() - started
+
+
+def main():
+    lines = int(sys.argv[1]) if len(sys.argv) > 1 else 20000
+    iterations = int(sys.argv[2]) if len(sys.argv) > 2 else 10
+
+    random.seed(1)
+    clients = ['10.0.{0}.{1}'.format(i // 256, i % 256) for i in range(2000)]
+    clients += ['2001:db8::{0:x}'.format(i) for i in range(500)]
+    chunks = [generate_lines(lines, clients) for _ in range(iterations)]
+
+    with tempfile.NamedTemporaryFile('w', suffix='.log') as fp:
+        fp.writelines(chunks[0][-1:])
+        fp.flush()
+
+        per_line = create_job(fp.name, False)
+        batch = create_job(fp.name, True)
+
+        per_line_time = run(per_line, chunks)
+        batch_time = run(batch, chunks)
+
+    if per_line.data != batch.data:
+        diff = dict((k, (per_line.data.get(k), batch.data.get(k)))
+                    for k in set(per_line.data) | set(batch.data) if per_line.data.get(k) != batch.data.get(k))
+        sys.exit('collected data differs (per line, batch): {0}'.format(diff))
+
+    total = lines * iterations
+    print('{0} lines, {1} iterations'.format(lines, iterations))
+    print('per line: {0:8.3f} s, {1:10.0f} lines/s'.format(per_line_time, total / per_line_time))
+    print('batch   : {0:8.3f} s, {1:10.0f} lines/s'.format(batch_time, total / batch_time))
+    print('speedup : {0:8.2f}x'.format(per_line_time / batch_time))
+
+
+if __name__ == '__main__':
+    main()